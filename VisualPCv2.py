@@ -1,34 +1,20 @@
-import open3d as o3d
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
-def get_pcd(filename_list):
-    x,y,z = [],[],[]
-    # 读取点云文件
-    for filename in filename_list:
-        point_cloud = o3d.io.read_point_cloud(filename)
+from pointcloud_view import load_points, decimate, DEFAULT_POINT_BUDGET
 
-        # 获取点云的点坐标
-        points = np.asarray(point_cloud.points)
+def get_pcd(filename_list, max_x=5):
+    # 读取点云文件，向量化地去掉 NaN 点和 x 轴大于 max_x 的点，合并为一个 (N, 3) 数组
+    points = load_points(filename_list, x_range=(None, max_x))
+    print(f"Number of valid points: {len(points)}")
+    return points[:, 0], points[:, 1], points[:, 2]
 
-        # 打印每个点的坐标
-        for i, point in enumerate(points):
-            # 不等于nan的点
-            if np.isnan(point).any():
-                continue
-            if point[0] >5:
-                continue
-            print(f"Point {i}: x={point[0]}, y={point[1]}, z={point[2]}")
-            x.append(point[0])
-            y.append(point[1])
-            z.append(point[2])
-    return x,y,z
 
 
 
-
-def plot_point_cloud(x, y, z, color='r', marker='o',s=1, xlabel='X Axis', ylabel='Y Axis', zlabel='Z Axis'):
+def plot_point_cloud(x, y, z, color='r', marker='o',s=1, xlabel='X Axis', ylabel='Y Axis', zlabel='Z Axis',
+                     max_points=DEFAULT_POINT_BUDGET, voxel_size=None):
     """
     Plots a 3D point cloud.
 
@@ -38,9 +24,12 @@ def plot_point_cloud(x, y, z, color='r', marker='o',s=1, xlabel='X Axis', ylabel
     z (list or array-like): Z coordinates of the points.
     color (str): Color of the points. Default is 'r' (red).
     marker (str): Marker style for the points. Default is 'o'.
+    s (float): Marker size. Default is 1.
     xlabel (str): Label for the X axis. Default is 'X Axis'.
     ylabel (str): Label for the Y axis. Default is 'Y Axis'.
     zlabel (str): Label for the Z axis. Default is 'Z Axis'.
+    max_points (int): Point budget; larger clouds are decimated before plotting. None disables it.
+    voxel_size (float): Voxel size for voxel downsampling before the random subsample. Default is None.
 
     Returns:
     None
@@ -49,8 +38,11 @@ def plot_point_cloud(x, y, z, color='r', marker='o',s=1, xlabel='X Axis', ylabel
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
 
+    # Level-of-detail: decimate to the point budget so large frames stay interactive
+    points = decimate(np.column_stack([x, y, z]), max_points, voxel_size)
+
     # Plot the points
-    ax.scatter(x, y, z, c=color, marker=marker)
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2], c=color, marker=marker, s=s)
 
     # Labels for axes
     ax.set_xlabel(xlabel)
@@ -68,8 +60,9 @@ def plot_point_cloud(x, y, z, color='r', marker='o',s=1, xlabel='X Axis', ylabel
 
 
 # 使用示例
-pcd_filename = 'pointcloud_27.pcd'  # 替换为实际保存的文件名
-pcd_filename_list = ['./pointclouds/pointcloud_1_16.pcd','./pointclouds/pointcloud_2_28.pcd','./pointclouds/pointcloud_3_17.pcd']
-x,y,z = get_pcd(pcd_filename_list)
-plot_point_cloud(x, y, z,  s=1)
+if __name__ == '__main__':
+    pcd_filename = 'pointcloud_27.pcd'  # 替换为实际保存的文件名
+    pcd_filename_list = ['./pointclouds/pointcloud_1_16.pcd','./pointclouds/pointcloud_2_28.pcd','./pointclouds/pointcloud_3_17.pcd']
+    x,y,z = get_pcd(pcd_filename_list)
+    plot_point_cloud(x, y, z,  s=1)
 
@@ -0,0 +1,83 @@
+# 输出文件的原子写入：先写到同目录下的临时文件，写完后再 os.replace 成目标文件名。
+# 导出中途被打断（崩溃、Ctrl+C、kill）时只会留下 *.tmp，不会出现写了一半的 PCD/PNG。
+# 临时文件名里带着写入进程的 pid：清理时只删除写入进程已经退出、或者很久没有修改过的临时文件，
+# 同时往同一个目录导出的其他进程（或进程池中的其他任务）正在写的临时文件不会被误删。
+import os
+import re
+import time
+from contextlib import contextmanager
+
+TMP_SUFFIX = '.tmp'
+# 临时文件超过这个时间（秒）没有修改，即使 pid 仍然存在（可能已被其他进程复用）也视为残留
+STALE_TMP_SECONDS = 3600
+
+_TMP_PATTERN = re.compile(r'.+\.(\d+)' + re.escape(TMP_SUFFIX) + '$')
+
+
+def temp_path(filename):
+    # 带上进程号，多个进程同时写同一个目录时临时文件不会冲突
+    return f"{filename}.{os.getpid()}{TMP_SUFFIX}"
+
+
+@contextmanager
+def atomic_write(filename, mode='wb'):
+    """
+    以原子方式写文件：with 块正常结束后临时文件才会替换成 filename，出错时删除临时文件。
+    参数:
+        filename: 目标文件名
+        mode: 'wb' 或 'w'
+    """
+    tmp_file = temp_path(filename)
+    try:
+        with open(tmp_file, mode) as f:
+            yield f
+        os.replace(tmp_file, filename)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def write_bytes(filename, data):
+    """
+    原子地写出一段字节（bytes / memoryview）。
+    """
+    with atomic_write(filename) as f:
+        f.write(data)
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # Windows 上 os.kill 会结束进程，不能用来探测，只按修改时间判断
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_stale_tmp(directory, max_age=STALE_TMP_SECONDS):
+    """
+    删除目录中上次被打断时留下的临时文件（temp_path 生成的 xxx.<pid>.tmp），返回删除的个数。
+    只删除写入进程已经不存在、或者超过 max_age 秒没有修改的临时文件；其他 *.tmp 文件不动。
+    """
+    count = 0
+    if not os.path.isdir(directory):
+        return count
+    now = time.time()
+    for entry in os.scandir(directory):
+        match = _TMP_PATTERN.match(entry.name)
+        if match is None or not entry.is_file():
+            continue
+        if _pid_alive(int(match.group(1))) and now - entry.stat().st_mtime < max_age:
+            continue
+        try:
+            os.remove(entry.path)
+            count += 1
+        except FileNotFoundError:
+            # 写入进程刚好完成改名
+            pass
+    return count
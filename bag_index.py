@@ -0,0 +1,116 @@
+# 每个 .db3 旁边的缓存索引文件（xxx.db3.index.npz）。
+# 保存每个 topic 按时间排序的时间戳、行号(rowid)和消息大小，用文件大小和修改时间判断数据包是否变化，
+# 同一个数据包反复导出（调整阈值、间隔）时不需要再扫描 messages 表，毫秒级即可加载。
+import os
+import numpy as np
+
+import bag_reader
+from atomic_io import atomic_write
+
+INDEX_SUFFIX = '.index.npz'
+INDEX_VERSION = 1
+
+
+def index_path(db3_file):
+    return db3_file + INDEX_SUFFIX
+
+
+def _source_key(db3_file):
+    stat = os.stat(db3_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _scan_bag(db3_file, table_name='messages'):
+    size, mtime_ns = _source_key(db3_file)
+    conn = bag_reader.connect_readonly(db3_file)
+    try:
+        topics = conn.execute("SELECT id, name, type FROM topics ORDER BY id;").fetchall()
+        cursor = conn.execute(f"SELECT topic_id, timestamp, id, length(data) FROM {table_name} "
+                              f"ORDER BY topic_id, timestamp, id;")
+        rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 4)
+    finally:
+        conn.close()
+
+    topic_ids = np.array([topic[0] for topic in topics], dtype=np.int64)
+    return {
+        'version': np.array(INDEX_VERSION),
+        'source_size': np.array(size, dtype=np.int64),
+        'source_mtime_ns': np.array(mtime_ns, dtype=np.int64),
+        'topic_ids': topic_ids,
+        'topic_names': np.array([topic[1] for topic in topics], dtype=str),
+        'topic_types': np.array([topic[2] for topic in topics], dtype=str),
+        # 每个 topic 在排序后数组中的起止位置
+        'topic_starts': np.searchsorted(rows[:, 0], topic_ids, side='left'),
+        'topic_ends': np.searchsorted(rows[:, 0], topic_ids, side='right'),
+        'timestamps': np.ascontiguousarray(rows[:, 1]),
+        'rowids': np.ascontiguousarray(rows[:, 2]),
+        'sizes': np.ascontiguousarray(rows[:, 3]),
+    }
+
+
+def build_bag_index(db3_file, table_name='messages'):
+    """
+    扫描一次 messages 表（不读取消息数据，只取 length(data)），生成并保存索引文件。
+    目录不可写时只返回扫描结果，不保存。
+    """
+    data = _scan_bag(db3_file, table_name)
+    try:
+        # 临时文件名带进程号（见 atomic_io.py），多个进程同时为同一个数据包建索引时不会互相覆盖
+        with atomic_write(index_path(db3_file)) as f:
+            np.savez(f, **data)
+    except OSError as e:
+        print(f"无法保存索引文件 {index_path(db3_file)}（{e}），本次只在内存中使用")
+    return data
+
+
+def _is_current(data, size, mtime_ns):
+    return (int(data.get('version', -1)) == INDEX_VERSION
+            and int(data.get('source_size', -1)) == size
+            and int(data.get('source_mtime_ns', -1)) == mtime_ns)
+
+
+def _read_index(path):
+    with np.load(path) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def load_bag_index(db3_file, table_name='messages'):
+    """
+    加载 .db3 的缓存索引，不存在或数据包已变化（大小/修改时间不同）时重新生成。
+    返回:
+        dict: {'topics': {topic_name: {'id', 'type', 'timestamps', 'rowids', 'sizes'}},
+               'names': {topic_id: topic_name}}
+        timestamps / rowids / sizes 都是按时间排序的 int64 数组
+    """
+    path = index_path(db3_file)
+    size, mtime_ns = _source_key(db3_file)
+    data = None
+    if os.path.exists(path):
+        try:
+            data = _read_index(path)
+        except (OSError, ValueError):
+            data = None
+    if data is None or not _is_current(data, size, mtime_ns):
+        data = build_bag_index(db3_file, table_name)
+
+    topics = {}
+    names = {}
+    for i, topic_id in enumerate(data['topic_ids'].tolist()):
+        name = str(data['topic_names'][i])
+        start, end = int(data['topic_starts'][i]), int(data['topic_ends'][i])
+        topics[name] = {
+            'id': topic_id,
+            'type': str(data['topic_types'][i]),
+            'timestamps': data['timestamps'][start:end],
+            'rowids': data['rowids'][start:end],
+            'sizes': data['sizes'][start:end],
+        }
+        names[topic_id] = name
+    return {'topics': topics, 'names': names}
+
+
+def topic_entry(bag_index, topic_id):
+    """
+    按 topic_id 取出索引中的一项。
+    """
+    return bag_index['topics'][bag_index['names'][topic_id]]
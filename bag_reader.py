@@ -0,0 +1,519 @@
+# rosbag2 (.db3) 的读取工具。
+# 按 id（或时间戳）做键集分页：每一页都从上一页最后一条记录之后开始，
+# 而不是 LIMIT/OFFSET —— 后者每一页都要重新走一遍被跳过的行，总开销随 topic 长度平方增长。
+#
+# 较长的录制会被 rosbag2 切分成 xxx_0.db3, xxx_1.db3, ...，并在 metadata.yaml 中列出。
+# BagReader 把这些分片当成一个整体：按名字查找各分片中的 topic_id（不同分片的 id 可能不同），
+# 并对外提供按时间排序的统一视图。
+#
+# 每页的记录数可以按字节数自适应（max_batch_bytes）：根据已经读到的消息平均大小决定下一页读多少条，
+# 点云和图像这样的大消息每页只读少量几条，一页的内存占用不会随消息大小失控。
+#
+# 时间范围（start / end）和抽帧间隔（min_interval）都在查询中完成：时间范围是 (topic_id, timestamp) 索引上的范围扫描，
+# 抽帧按时间桶分组、每个桶只取第一条，只返回 id 和时间戳；被跳过的消息数据不会离开 SQLite。
+#
+# 项目里的查询都是 WHERE topic_id = X [AND timestamp = Y] 的形式，而 rosbag2 的 messages 表通常没有覆盖它的索引，
+# ensure_topic_timestamp_index 可以建立 (topic_id, timestamp) 索引：默认建在旁边的副本里，不修改原始数据包；
+# 只有显式传入 index_mode='inplace' 才会在原文件上建索引（会改变原文件和它的修改时间，缓存索引也会因此重建）。
+# 按 id 读取消息（导出、按缓存索引中的 rowid 取帧）不需要这个索引，BagReader 默认不建索引。
+import os
+import shutil
+import sqlite3
+import threading
+import numpy as np
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import bag_index
+
+
+# 只读连接的 SQLite 参数：内存映射读取、较大的页缓存、临时数据放内存
+SQLITE_PRAGMAS = {
+    'mmap_size': 1 << 30,     # 1 GiB
+    'cache_size': -262144,    # 负数表示 KiB，即 256 MiB
+    'temp_store': 'MEMORY',
+}
+
+TOPIC_TIMESTAMP_INDEX = 'idx_messages_topic_id_timestamp'
+INDEX_MODES = ('inplace', 'sidecar', 'none')
+SIDECAR_SUFFIX = '.indexed.db3'
+
+
+def connect_readonly(db3_file):
+    """
+    以只读方式（URI mode=ro）打开 .db3 文件并设置读取相关的 PRAGMA。每个线程/进程都应该使用自己的连接。
+    """
+    uri = Path(db3_file).resolve().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True)
+    for name, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    return conn
+
+
+def has_topic_timestamp_index(conn, table_name='messages'):
+    """
+    判断 messages 表上是否已经有以 (topic_id, timestamp) 开头的索引。
+    """
+    for index in conn.execute(f"PRAGMA index_list({table_name});").fetchall():
+        columns = [row[2] for row in conn.execute(f"PRAGMA index_info({index[1]});").fetchall()]
+        if columns[:2] == ['topic_id', 'timestamp']:
+            return True
+    return False
+
+
+def _create_topic_timestamp_index(db3_file, table_name='messages'):
+    conn = sqlite3.connect(db3_file)
+    try:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {TOPIC_TIMESTAMP_INDEX} ON {table_name} (topic_id, timestamp);")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def ensure_topic_timestamp_index(db3_file, index_mode='sidecar', table_name='messages'):
+    """
+    确保 (topic_id, timestamp) 索引存在，返回之后应该打开的 .db3 路径。
+    参数:
+        index_mode: 'sidecar' 不修改原文件，在旁边的副本（xxx.db3.indexed.db3）上建索引并复用；
+                    'inplace' 直接在原文件上建索引（需要显式指定，文件不可写时退回 'sidecar'）；
+                    'none' 不建索引
+    """
+    if index_mode not in INDEX_MODES:
+        raise ValueError(f"index_mode 只能是 {INDEX_MODES}，实际为 {index_mode}")
+    if index_mode == 'none':
+        return db3_file
+
+    conn = connect_readonly(db3_file)
+    try:
+        if has_topic_timestamp_index(conn, table_name):
+            return db3_file
+    finally:
+        conn.close()
+
+    if index_mode == 'inplace' and os.access(db3_file, os.W_OK) and os.access(os.path.dirname(os.path.abspath(db3_file)), os.W_OK):
+        try:
+            _create_topic_timestamp_index(db3_file, table_name)
+            return db3_file
+        except sqlite3.OperationalError as e:
+            print(f"无法在 {db3_file} 上建立索引（{e}），改为使用副本")
+
+    sidecar = db3_file + SIDECAR_SUFFIX
+    if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(db3_file):
+        conn = connect_readonly(sidecar)
+        try:
+            if has_topic_timestamp_index(conn, table_name):
+                return sidecar
+        finally:
+            conn.close()
+
+    # 先写到临时文件，建好索引后再改名，中途被打断也不会留下不完整的副本
+    tmp_file = sidecar + '.tmp'
+    shutil.copyfile(db3_file, tmp_file)
+    _create_topic_timestamp_index(tmp_file, table_name)
+    os.replace(tmp_file, sidecar)
+    return sidecar
+
+
+def adaptive_batch_size(batch_size, max_batch_bytes, rows_seen, bytes_seen):
+    """
+    按已经读到的消息平均大小计算下一批读取的条数：不超过 batch_size，总字节数大约不超过 max_batch_bytes。
+    还没有读到消息时只读 1 条，用来估计消息大小。
+    """
+    if max_batch_bytes is None:
+        return batch_size
+    if rows_seen == 0:
+        return 1
+    average = max(1, bytes_seen // rows_seen)
+    return int(max(1, min(batch_size, max_batch_bytes // average)))
+
+
+def iter_messages(conn, topic_id, table_name='messages', column_name='data', column_stamp='timestamp',
+                  batch_size=1000, order_by='id', min_id=None, max_id=None, start=None, end=None, max_batch_bytes=None):
+    """
+    流式读取某个 topic 的全部消息，每一页的查询开销恒定。
+    参数:
+        conn: sqlite3 连接
+        topic_id: topic 的 id
+        batch_size: 每页读取的记录数上限
+        order_by: 'id' 按行号分页，'timestamp' 按时间戳分页（时间戳相同时再按 id）
+        min_id, max_id: 只读取 id 在 [min_id, max_id] 区间内的消息（可选）
+        start, end: 只读取时间戳在 [start, end] 区间内的消息（纳秒，可选）
+        max_batch_bytes: 每页数据的目标字节数，给定时按已读消息的平均大小自适应调整每页条数（见 adaptive_batch_size）
+    返回:
+        生成器，依次产生 (rowid, timestamp, memoryview(data))
+    """
+    if order_by not in ('id', 'timestamp'):
+        raise ValueError(f"order_by 只能是 'id' 或 'timestamp'，实际为 {order_by}")
+
+    conditions, params = _time_conditions(topic_id, start, end, column_stamp)
+    if min_id is not None:
+        conditions.append('id >= ?')
+        params.append(min_id)
+    if max_id is not None:
+        conditions.append('id <= ?')
+        params.append(max_id)
+    select = f"SELECT id, {column_stamp}, {column_name} FROM {table_name} WHERE {' AND '.join(conditions)}"
+
+    cursor = conn.cursor()
+    last_id = None
+    last_stamp = None
+    rows_seen = bytes_seen = 0
+    try:
+        while True:
+            limit = adaptive_batch_size(batch_size, max_batch_bytes, rows_seen, bytes_seen)
+            if last_id is None:
+                order = 'id' if order_by == 'id' else f'{column_stamp}, id'
+                cursor.execute(f"{select} ORDER BY {order} LIMIT ?;", (*params, limit))
+            elif order_by == 'id':
+                cursor.execute(f"{select} AND id > ? ORDER BY id LIMIT ?;", (*params, last_id, limit))
+            else:
+                cursor.execute(f"{select} AND ({column_stamp} > ? OR ({column_stamp} = ? AND id > ?)) "
+                               f"ORDER BY {column_stamp}, id LIMIT ?;",
+                               (*params, last_stamp, last_stamp, last_id, limit))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id, last_stamp = rows[-1][0], rows[-1][1]
+            rows_seen += len(rows)
+            bytes_seen += sum(len(row[2]) for row in rows)
+
+            for record_id, timestamp, data in rows:
+                yield record_id, timestamp, memoryview(data)
+            if len(rows) < limit:
+                break
+    finally:
+        cursor.close()
+
+
+def iter_messages_by_id(conn, rowids, table_name='messages', column_name='data', column_stamp='timestamp',
+                        batch_size=500, max_batch_bytes=None):
+    """
+    按给定的 id 列表读取消息（例如 select_messages 选出的消息），每次用 WHERE id IN (...) 读取一批。
+    max_batch_bytes 给定时每批的条数按已读消息的平均大小自适应调整（见 adaptive_batch_size）。
+    返回:
+        生成器，按 rowids 的顺序依次产生 (rowid, timestamp, memoryview(data))
+    """
+    rowids = [int(rowid) for rowid in rowids]
+    cursor = conn.cursor()
+    rows_seen = bytes_seen = 0
+    i = 0
+    try:
+        while i < len(rowids):
+            batch = rowids[i:i + adaptive_batch_size(batch_size, max_batch_bytes, rows_seen, bytes_seen)]
+            i += len(batch)
+            cursor.execute(f"SELECT id, {column_stamp}, {column_name} FROM {table_name} "
+                           f"WHERE id IN ({','.join('?' * len(batch))});", batch)
+            rows = {row[0]: row for row in cursor.fetchall()}
+            rows_seen += len(rows)
+            bytes_seen += sum(len(row[2]) for row in rows.values())
+            for rowid in batch:
+                if rowid in rows:
+                    record_id, timestamp, data = rows[rowid]
+                    yield record_id, timestamp, memoryview(data)
+    finally:
+        cursor.close()
+
+
+def _time_conditions(topic_id, start=None, end=None, column_stamp='timestamp'):
+    conditions = ['topic_id = ?']
+    params = [topic_id]
+    if start is not None:
+        conditions.append(f'{column_stamp} >= ?')
+        params.append(int(start))
+    if end is not None:
+        conditions.append(f'{column_stamp} <= ?')
+        params.append(int(end))
+    return conditions, params
+
+
+def interval_mask(timestamps, min_interval, origin=None):
+    """
+    抽帧：从 origin（默认第一条）起按 min_interval（秒）划分时间桶，每个桶只保留第一条。
+    参数:
+        timestamps: 按时间排序的纳秒时间戳数组
+    返回:
+        bool 数组，True 表示保留
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    keep = np.ones(timestamps.shape, dtype=bool)
+    if not min_interval or timestamps.size == 0:
+        return keep
+    origin = timestamps[0] if origin is None else origin
+    buckets = (timestamps - np.int64(origin)) // np.int64(round(min_interval * 1e9))
+    keep[1:] = buckets[1:] != buckets[:-1]
+    return keep
+
+
+def spacing_indices(timestamps, min_interval):
+    """
+    按最小间隔贪心抽帧：保留第一条，之后每次保留与上一条保留的时间差不小于 min_interval（秒）的第一条。
+    与 interval_mask 的固定时间桶不同，保留下来的任意两条之间的间隔都不小于 min_interval。
+    每保留一条做一次二分查找，开销只和保留的条数有关。
+    参数:
+        timestamps: 按时间排序的纳秒时间戳数组
+    返回:
+        被保留的下标（int64 数组）
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not min_interval or timestamps.size == 0:
+        return np.arange(timestamps.size, dtype=np.int64)
+    step = int(np.ceil(min_interval * 1e9))
+    kept = []
+    i = 0
+    while i < timestamps.size:
+        kept.append(i)
+        i = int(np.searchsorted(timestamps, timestamps[i] + step, side='left'))
+    return np.array(kept, dtype=np.int64)
+
+
+def select_timestamps(timestamps, start=None, end=None, min_interval=None):
+    """
+    在缓存索引的时间戳数组上做与 select_messages 相同的筛选：二分查找 [start, end] 范围，再按 min_interval 抽帧。
+    返回:
+        被选中消息在 timestamps 中的下标（int64 数组）
+    """
+    lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+    hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+    indices = np.arange(lo, max(lo, hi), dtype=np.int64)
+    return indices[interval_mask(timestamps[lo:hi], min_interval, start)]
+
+
+def find_closest_indices(target_timestamps, timestamps, threshold):
+    """
+    对一组目标时间戳，在已排序的 timestamps 中一次性（向量化）查找最接近的时间戳。
+    参数:
+        target_timestamps: 目标时间戳数组
+        timestamps: 已排序的 int64 时间戳数组
+        threshold: 允许的最大时间差（纳秒，包含等于）
+    返回:
+        (indices, within_threshold)：每个目标对应的最近时间戳在 timestamps 中的下标，以及是否在阈值范围内
+    """
+    targets = np.asarray(target_timestamps, dtype=np.int64)
+    if timestamps.size == 0:
+        return np.zeros(targets.shape, dtype=np.intp), np.zeros(targets.shape, dtype=bool)
+
+    idx = np.searchsorted(timestamps, targets)
+    left_idx = np.clip(idx - 1, 0, timestamps.size - 1)
+    right_idx = np.clip(idx, 0, timestamps.size - 1)
+    left_diff = np.abs(targets - timestamps[left_idx])
+    right_diff = np.abs(timestamps[right_idx] - targets)
+    # 距离相同时取较早的时间戳
+    use_left = left_diff <= right_diff
+    indices = np.where(use_left, left_idx, right_idx)
+    min_diff = np.where(use_left, left_diff, right_diff)
+    return indices, min_diff <= threshold
+
+
+def select_messages(conn, topic_id, start=None, end=None, min_interval=None, table_name='messages',
+                    column_stamp='timestamp'):
+    """
+    在 SQLite 中按时间范围和抽帧间隔选出消息，只返回 id 和时间戳，不读取消息数据。
+    时间桶的起点为 start（没有 start 时为范围内的第一条），与 select_timestamps 的规则相同。
+    返回:
+        (rowids, timestamps)，按时间排序的 int64 数组
+    """
+    conditions, params = _time_conditions(topic_id, start, end, column_stamp)
+    where = ' AND '.join(conditions)
+    if min_interval:
+        origin = start
+        if origin is None:
+            origin = conn.execute(f"SELECT MIN({column_stamp}) FROM {table_name} WHERE {where};", params).fetchone()[0]
+        # 聚合查询中 MIN() 之外的列取自时间戳最小的那一行，即每个时间桶的第一条消息
+        cursor = conn.execute(f"SELECT id, MIN({column_stamp}) FROM {table_name} WHERE {where} "
+                              f"GROUP BY ({column_stamp} - ?) / ? ORDER BY 2, 1;",
+                              (*params, origin or 0, int(round(min_interval * 1e9))))
+    else:
+        cursor = conn.execute(f"SELECT id, {column_stamp} FROM {table_name} WHERE {where} "
+                              f"ORDER BY {column_stamp}, id;", params)
+    rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    return np.ascontiguousarray(rows[:, 0]), np.ascontiguousarray(rows[:, 1])
+
+
+def plan_byte_chunks(db3_file, topic_id, chunk_bytes, start=None, end=None, min_interval=None):
+    """
+    按缓存索引中每条消息的大小（length(data)）把某个 topic 切分成字节数大致相等的若干段，不读取消息数据。
+    参数:
+        chunk_bytes: 每段的目标字节数（单条消息超过它时独占一段）
+        start, end, min_interval: 时间范围和抽帧间隔，见 select_timestamps
+    返回:
+        [(min_id, max_id, rowids, nbytes), ...]：不筛选时 rowids 为 None，每段是按 id 连续的区间 [min_id, max_id]；
+        有筛选时 rowids 是这一段要读取的 id 列表
+    """
+    entry = bag_index.topic_entry(bag_index.load_bag_index(db3_file), topic_id)
+    filtered = start is not None or end is not None or bool(min_interval)
+    if filtered:
+        selected = select_timestamps(entry['timestamps'], start, end, min_interval)
+    else:
+        selected = np.argsort(entry['rowids'], kind='stable')
+    rowids = entry['rowids'][selected]
+    sizes = entry['sizes'][selected]
+    if rowids.size == 0:
+        return []
+
+    # 每条消息按它之前的累计字节数归入第 k 段
+    chunk_index = (np.cumsum(sizes) - sizes) // max(1, int(chunk_bytes))
+    bounds = np.flatnonzero(np.diff(chunk_index)) + 1
+    chunks = []
+    for chunk_rowids, chunk_sizes in zip(np.split(rowids, bounds), np.split(sizes, bounds)):
+        chunks.append((int(chunk_rowids.min()), int(chunk_rowids.max()),
+                       chunk_rowids.tolist() if filtered else None, int(chunk_sizes.sum())))
+    return chunks
+
+
+def get_topic_ids(conn, topic_name_list):
+    """
+    在一个 .db3 中查找 topic 名字对应的 id，不存在的 topic 不会出现在结果中。
+    """
+    results_dict = {}
+    cursor = conn.cursor()
+    for topic_name in topic_name_list:
+        cursor.execute("SELECT id FROM topics WHERE name = ?;", (topic_name,))
+        result = cursor.fetchone()
+        if result:
+            results_dict[topic_name] = result[0]
+    cursor.close()
+    return results_dict
+
+
+def read_timestamps(conn, topic_id, table_name='messages', column_stamp='timestamp', start=None, end=None):
+    """
+    读取某个 topic 的时间戳（可选只读 [start, end] 范围内的），返回排序后的 int64 数组。
+    """
+    conditions, params = _time_conditions(topic_id, start, end, column_stamp)
+    cursor = conn.execute(f"SELECT {column_stamp} FROM {table_name} WHERE {' AND '.join(conditions)};", params)
+    timestamps = np.fromiter((row[0] for row in cursor), dtype=np.int64)
+    timestamps.sort()
+    return timestamps
+
+
+class BagReader:
+    """
+    rosbag2 数据包（可能包含多个 .db3 分片）的读取器。
+
+    参数:
+        bag_path: 数据包目录（包含 metadata.yaml）、metadata.yaml 文件本身，或者单个 .db3 文件
+        index_mode: (topic_id, timestamp) 索引的建立方式，见 ensure_topic_timestamp_index；
+                    默认 'none'，不建索引也不修改原始数据包
+        use_index: 是否使用每个分片旁边的缓存索引文件（见 bag_index.py）读取 topic 和时间戳
+    """
+
+    def __init__(self, bag_path, index_mode='none', use_index=True):
+        bag_path = Path(bag_path)
+        if bag_path.is_dir():
+            bag_path = bag_path / 'metadata.yaml'
+
+        if bag_path.suffix == '.db3':
+            self.metadata = None
+            self.split_files = [str(bag_path)]
+        else:
+            with open(bag_path, 'r') as f:
+                self.metadata = yaml.safe_load(f)['rosbag2_bagfile_information']
+            if self.metadata.get('storage_identifier', 'sqlite3') != 'sqlite3':
+                raise ValueError(f"只支持 sqlite3 存储的数据包: {self.metadata.get('storage_identifier')}")
+            if self.metadata.get('compression_mode'):
+                raise ValueError(f"不支持压缩的数据包: {self.metadata.get('compression_mode')}")
+            self.split_files = [str(bag_path.parent / name) for name in self.metadata['relative_file_paths']]
+
+        # 建有索引的分片路径（sidecar 模式下是旁边的副本）
+        self.split_files = [ensure_topic_timestamp_index(db3_file, index_mode) for db3_file in self.split_files]
+
+        self.use_index = use_index
+        self._topic_ids = [None] * len(self.split_files)
+        self._indexes = [None] * len(self.split_files)
+        self._local = threading.local()  # 每个线程自己的只读连接 {split_index: conn}
+
+    def split_index(self, split_index):
+        """
+        返回某个分片的缓存索引（见 bag_index.load_bag_index），第一次访问时加载或生成。
+        """
+        if self._indexes[split_index] is None:
+            self._indexes[split_index] = bag_index.load_bag_index(self.split_files[split_index])
+        return self._indexes[split_index]
+
+    def connection(self, split_index):
+        """
+        返回某个分片的只读连接。连接按线程缓存：每个线程第一次访问时打开自己的连接，之后在这个线程中复用，
+        不同线程之间不会共用同一个 sqlite3 连接。
+        """
+        conns = self._thread_conns()
+        if split_index not in conns:
+            conns[split_index] = connect_readonly(self.split_files[split_index])
+        return conns[split_index]
+
+    def _thread_conns(self):
+        if not hasattr(self._local, 'conns'):
+            self._local.conns = {}
+        return self._local.conns
+
+    def close(self):
+        """
+        关闭当前线程打开的连接（sqlite3 连接只能在打开它的线程中关闭，用过 connection() 的每个线程都应该各自调用）。
+        """
+        conns = self._thread_conns()
+        for conn in conns.values():
+            conn.close()
+        conns.clear()
+
+    def split_topic_ids(self, topic_name_list):
+        """
+        返回每个分片中 topic 名字到 id 的映射：[(db3_file, {topic_name: topic_id}), ...]。
+        """
+        topic_name_list = list(topic_name_list)
+        for i, db3_file in enumerate(self.split_files):
+            known = self._topic_ids[i] or {}
+            missing = [name for name in topic_name_list if name not in known]
+            if missing and self.use_index:
+                topics = self.split_index(i)['topics']
+                known.update({name: topics[name]['id'] for name in missing if name in topics})
+            elif missing:
+                known.update(get_topic_ids(self.connection(i), missing))
+            self._topic_ids[i] = known
+
+        found = set()
+        for ids in self._topic_ids:
+            found.update(ids)
+        not_found = [name for name in topic_name_list if name not in found]
+        if not_found:
+            raise ValueError(f"无法找到指定的topic_name: {not_found}")
+        return [(db3_file, {name: ids[name] for name in topic_name_list if name in ids})
+                for db3_file, ids in zip(self.split_files, self._topic_ids)]
+
+    def topic_id(self, topic_name, split_index):
+        return self.split_topic_ids([topic_name])[split_index][1].get(topic_name)
+
+    def load_timestamps(self, topic_name_list, max_workers=None, start=None, end=None):
+        """
+        并行读取所有分片中各 topic 的时间戳，合并为一个按时间排序的视图。
+        start, end 给定时只取 [start, end] 范围内的时间戳（缓存索引上二分查找，或者 SQL 范围查询）。
+        返回:
+            {topic_name: (timestamps, split_indices)}，两者都是按时间排序的数组，
+            split_indices[i] 表示 timestamps[i] 这条消息所在的分片
+        """
+        split_ids = self.split_topic_ids(topic_name_list)
+
+        def load_split(split_index):
+            db3_file, topic_id_dict = split_ids[split_index]
+            if self.use_index:
+                topics = self.split_index(split_index)['topics']
+                return {name: topics[name]['timestamps'][select_timestamps(topics[name]['timestamps'], start, end)]
+                        for name in topic_id_dict}
+            conn = connect_readonly(db3_file)
+            try:
+                return {name: read_timestamps(conn, topic_id, start=start, end=end)
+                        for name, topic_id in topic_id_dict.items()}
+            finally:
+                conn.close()
+
+        with ThreadPoolExecutor(max_workers=max_workers or min(len(self.split_files), os.cpu_count())) as executor:
+            per_split = list(executor.map(load_split, range(len(self.split_files))))
+
+        merged = {}
+        for topic_name in topic_name_list:
+            parts = [(split_stamps[topic_name], i) for i, split_stamps in enumerate(per_split) if topic_name in split_stamps]
+            timestamps = np.concatenate([stamps for stamps, _ in parts])
+            split_indices = np.concatenate([np.full(stamps.shape, i, dtype=np.int32) for stamps, i in parts])
+            # 各分片内部已经有序，稳定排序可以把它们合并成全局有序
+            order = np.argsort(timestamps, kind='stable')
+            merged[topic_name] = (timestamps[order], split_indices[order])
+        return merged
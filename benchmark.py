@@ -0,0 +1,414 @@
+# 基准测试：用 synthetic_bag.py 生成（或指定）一个数据包，分别测量各个阶段的耗时，
+# 以 JSON 输出每个阶段的 帧/秒 和 MB/秒，替代以前手工记录、无法复现的 time.txt。
+#
+#   python benchmark.py --output benchmark_results.json
+#   python benchmark.py --bag ./004 --skip end_to_end
+#
+# 阶段：
+#   parse_pointcloud2  struct（原来逐点 struct.unpack）、numba（原来的 JIT 循环，需要安装 numba）、vectorized（pointcloud2.py）
+#   save_pcd           pcd_io 的每种输出格式
+#   image              decode（CDR 解析 + JPEG 解码）、png（解码后保存 PNG）、jpg（直通）
+#   sync               bag_index 生成 / 加载，以及所有 topic 的向量化最近邻匹配
+#   end_to_end         export_bag（线程池 / 进程池）和 process_sensor_data
+#   can                can_decoder.iter_can_messages 和原来 ORDER BY timestamp 的查询，在大的合成 CAN topic 上测量速度，
+#                      并在子进程中测量峰值内存的增长（peak_rss_growth_bytes），检查它不随 topic 的数据量增长
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import argparse
+import platform
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from bag_reader import SQLITE_PRAGMAS, BagReader, connect_readonly, iter_messages, find_closest_indices
+from bag_index import build_bag_index, load_bag_index
+from pointcloud2 import parse_pointcloud2_header, pointcloud2_to_xyzi
+from pcd_io import OUTPUT_FORMATS, save_pointcloud, lzf
+from image_io import decode_image, save_compressed_image
+from export_workers import export_bag
+from get_same_frame_data import process_sensor_data
+from can_decoder import iter_can_messages
+from instrumentation import peak_rss
+from synthetic_bag import LIDAR_NAMES, write_synthetic_bag, write_synthetic_can
+
+STAGES = ('parse_pointcloud2', 'save_pcd', 'image', 'sync', 'end_to_end', 'can')
+
+
+def parse_pointcloud2_struct(data):
+    # 原来的实现：逐点 struct.unpack_from（偏移改为从消息头部读取，只比较解析循环本身的速度）
+    header = parse_pointcloud2_header(data)
+    point_step = header['point_step']
+    points = []
+    for i in range(header['width'] * header['height']):
+        offset = header['data_offset'] + i * point_step
+        x, y, z, intensity = struct.unpack_from('<ffff', data, offset)
+        points.append([x, y, z, intensity])
+    return np.array(points)
+
+
+def make_numba_parser():
+    """
+    返回原来 numba JIT 版本的逐点解析函数，没有安装 numba 时返回 None。
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+
+    @njit(cache=False)
+    def _parse(raw, data_offset, num_points, point_step):
+        points = np.empty((num_points, 4), dtype=np.float32)
+        for i in range(num_points):
+            offset = data_offset + i * point_step
+            for j in range(4):
+                points[i, j] = raw[offset + 4 * j:offset + 4 * j + 4].view(np.float32)[0]
+        return points
+
+    def parse(data):
+        header = parse_pointcloud2_header(data)
+        raw = np.frombuffer(data, dtype=np.uint8)
+        return _parse(raw, header['data_offset'], header['width'] * header['height'], header['point_step'])
+
+    return parse
+
+
+def measure(results, stage, variant, fn, frames, nbytes, repeat=1):
+    """
+    执行 fn（repeat 次取最快的一次），把耗时、帧/秒、MB/秒追加到 results。
+    frames / nbytes 可以是数字，也可以是以 fn 的返回值为参数的函数（用于统计实际写出的帧数和字节数）。
+    """
+    best = None
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    frames = frames(value) if callable(frames) else frames
+    nbytes = nbytes(value) if callable(nbytes) else nbytes
+    result = {
+        'stage': stage,
+        'variant': variant,
+        'seconds': round(best, 6),
+        'frames': frames,
+        'frames_per_s': round(frames / best, 3) if best > 0 else None,
+        'bytes': nbytes,
+        'mb_per_s': round(nbytes / best / 1e6, 3) if best > 0 else None,
+    }
+    results.append(result)
+    print(f"{stage:<18} {variant:<22} {best:9.4f} s {result['frames_per_s'] or 0:10.1f} 帧/s "
+          f"{result['mb_per_s'] or 0:9.1f} MB/s", file=sys.stderr)
+    return value
+
+
+def load_samples(bag, topic_name, count):
+    """
+    从第一个包含该 topic 的分片中读取前 count 条消息的数据（bytes）。
+    """
+    for db3_file, topic_id_dict in bag.split_topic_ids([topic_name]):
+        if topic_name not in topic_id_dict:
+            continue
+        conn = connect_readonly(db3_file)
+        try:
+            samples = []
+            for _, _, data in iter_messages(conn, topic_id_dict[topic_name]):
+                samples.append(bytes(data))
+                if len(samples) >= count:
+                    break
+            return samples
+        finally:
+            conn.close()
+    return []
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def bench_parse(results, lidar_samples, struct_frames, repeat):
+    nbytes = sum(len(data) for data in lidar_samples)
+    subset = lidar_samples[:struct_frames]
+    measure(results, 'parse_pointcloud2', 'struct', lambda: [parse_pointcloud2_struct(d) for d in subset],
+            len(subset), sum(len(data) for data in subset))
+
+    numba_parse = make_numba_parser()
+    if numba_parse is None:
+        results.append({'stage': 'parse_pointcloud2', 'variant': 'numba', 'skipped': 'numba 未安装'})
+    else:
+        numba_parse(lidar_samples[0])  # 预先编译，不计入耗时
+        measure(results, 'parse_pointcloud2', 'numba', lambda: [numba_parse(d) for d in lidar_samples],
+                len(lidar_samples), nbytes, repeat)
+
+    measure(results, 'parse_pointcloud2', 'vectorized', lambda: [pointcloud2_to_xyzi(d) for d in lidar_samples],
+            len(lidar_samples), nbytes, repeat)
+
+
+def bench_save(results, lidar_samples, work_dir, repeat):
+    clouds = [pointcloud2_to_xyzi(data) for data in lidar_samples]
+    for output_format in OUTPUT_FORMATS:
+        if output_format == 'binary_compressed' and lzf is None:
+            results.append({'stage': 'save_pcd', 'variant': output_format, 'skipped': 'python-lzf 未安装'})
+            continue
+        out_dir = os.path.join(work_dir, 'save_pcd', output_format)
+        os.makedirs(out_dir, exist_ok=True)
+
+        def save_all():
+            return [save_pointcloud(cloud, os.path.join(out_dir, str(i)), output_format) for i, cloud in enumerate(clouds)]
+
+        measure(results, 'save_pcd', output_format, save_all, len(clouds),
+                lambda filenames: sum(os.path.getsize(name) for name in filenames), repeat)
+
+
+def bench_image(results, camera_samples, work_dir, repeat):
+    nbytes = sum(len(data) for data in camera_samples)
+    measure(results, 'image', 'decode', lambda: [decode_image(d) for d in camera_samples],
+            len(camera_samples), nbytes, repeat)
+    for image_format in ('png', 'jpg'):
+        out_dir = os.path.join(work_dir, 'image', image_format)
+        os.makedirs(out_dir, exist_ok=True)
+
+        def save_all():
+            return [save_compressed_image(d, os.path.join(out_dir, str(i)), image_format)
+                    for i, d in enumerate(camera_samples)]
+
+        measure(results, 'image', image_format, save_all, len(camera_samples),
+                lambda filenames: sum(os.path.getsize(name) for name in filenames), repeat)
+
+
+def bench_sync(results, bag, topics, repeat):
+    split_bytes = sum(os.path.getsize(db3_file) for db3_file in bag.split_files)
+    index = measure(results, 'sync', 'bag_index_build', lambda: [build_bag_index(f) for f in bag.split_files],
+                    lambda index: sum(len(data['timestamps']) for data in index), split_bytes)
+    messages = sum(len(data['timestamps']) for data in index)
+    measure(results, 'sync', 'bag_index_load', lambda: [load_bag_index(f) for f in bag.split_files],
+            messages, split_bytes, repeat)
+
+    timestamps_by_topic = bag.load_timestamps(topics)
+    reference = topics[0]
+    top_timestamps = timestamps_by_topic[reference][0]
+
+    def match_all():
+        return [find_closest_indices(top_timestamps, timestamps, 30000000)
+                for name, (timestamps, _) in timestamps_by_topic.items() if name != reference]
+
+    measure(results, 'sync', 'find_closest_indices', match_all, len(top_timestamps) * (len(topics) - 1),
+            top_timestamps.nbytes * (len(topics) - 1), repeat)
+
+
+def _frame_count(out_dir):
+    # 每帧一个目录，导出清单 export_manifest.db 等文件不算
+    if not os.path.isdir(out_dir):
+        return 0
+    with os.scandir(out_dir) as entries:
+        return sum(entry.is_dir() for entry in entries)
+
+
+def bench_end_to_end(results, bag_path, topics, message_bytes, message_count, work_dir, max_workers):
+    for executor_type in ('thread', 'process'):
+        out_dir = os.path.join(work_dir, 'export_bag', executor_type)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        with contextlib.redirect_stdout(sys.stderr):
+            measure(results, 'end_to_end', f'export_bag_{executor_type}',
+                    lambda: export_bag(bag_path, topics, os.path.join(out_dir, 'images'), os.path.join(out_dir, 'pointclouds'),
+                                       executor_type=executor_type, max_workers=max_workers, resume=False),
+                    message_count, message_bytes)
+
+    out_dir = os.path.join(work_dir, 'process_sensor_data')
+    shutil.rmtree(out_dir, ignore_errors=True)
+    # process_sensor_data 只保存按 save_interval 选中的帧：帧数和字节数按实际写出的文件统计
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        measure(results, 'end_to_end', 'process_sensor_data',
+                lambda: process_sensor_data(bag_path, topics, out_dir, time_threshold=30000000, resume=False),
+                lambda _: _frame_count(out_dir), lambda _: _dir_bytes(out_dir))
+
+
+def iter_can_sorted(db3_file, topic_id, batch_size=100000):
+    # 原来的实现：由 SQLite 按时间排序，整个 topic 的消息数据都要先进入排序器（合成的 CAN 消息都是定长的）
+    conn = connect_readonly(db3_file)
+    try:
+        cursor = conn.execute('SELECT timestamp, data FROM messages WHERE topic_id = ? ORDER BY timestamp, id;',
+                              (topic_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            timestamps = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            yield timestamps, np.frombuffer(b''.join(row[1] for row in rows), dtype=np.uint8).reshape(len(rows), -1)
+    finally:
+        conn.close()
+
+
+CAN_VARIANTS = {'sqlite_order_by': iter_can_sorted, 'iter_can_messages': iter_can_messages}
+
+
+def _process_peak_rss():
+    # Linux 上 ru_maxrss 在 fork + exec 之后会保留父进程的值，子进程自己的峰值从 /proc/self/status 的 VmHWM 读取
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return peak_rss()
+
+
+def _can_peak_rss_growth(variant, db3_file, topic_id):
+    # 在单独的子进程中运行，峰值内存的增长只来自这一种实现。mmap 映射的文件页和 SQLite 页缓存也计入 RSS，
+    # 它们的上限是固定的（见 SQLITE_PRAGMAS），与 topic 大小无关：这里关掉 mmap 并缩小页缓存，只测量排序和分块读取本身
+    SQLITE_PRAGMAS.update({'mmap_size': 0, 'cache_size': -2048})
+    baseline = _process_peak_rss()
+    frames = sum(len(timestamps) for timestamps, _ in CAN_VARIANTS[variant](db3_file, topic_id))
+    return frames, _process_peak_rss() - baseline
+
+
+def bench_can(results, work_dir, can_messages, repeat):
+    db3_file = os.path.join(work_dir, 'can.db3')
+    # 不建 timestamp_idx：这时原来的 ORDER BY timestamp 要在排序器中排序整个 topic（旧版本录制的数据包就是这样）
+    info = write_synthetic_can(db3_file, can_messages, timestamp_index=False)
+    build_bag_index(db3_file)
+    payload_bytes = info['total_bytes']
+
+    growth = {}
+    if _process_peak_rss() is not None:
+        context = multiprocessing.get_context('spawn')
+        for variant in CAN_VARIANTS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                _, growth[variant] = pool.submit(_can_peak_rss_growth, variant, db3_file, 1).result()
+
+    for variant, fn in CAN_VARIANTS.items():
+        measure(results, 'can', variant, lambda: sum(len(timestamps) for timestamps, _ in fn(db3_file, 1)),
+                lambda frames: frames, payload_bytes, repeat)
+        results[-1]['peak_rss_growth_bytes'] = growth.get(variant)
+        print(f"{'can':<18} {variant:<22} 峰值内存增长 {growth.get(variant, 0) / 1e6:9.1f} MB"
+              f"（数据 {payload_bytes / 1e6:.1f} MB）", file=sys.stderr)
+
+    # 分块读取时只有缓存索引随消息数增长（load_bag_index 载入的时间戳、id、大小三个 int64 数组），
+    # 其余只有一块的数据；原来的查询要把整个 topic 的数据放进排序器
+    index_bytes = 3 * 8 * info['message_count']
+    if 'iter_can_messages' in growth and growth['iter_can_messages'] > index_bytes + payload_bytes // 2:
+        raise RuntimeError(f"iter_can_messages 的峰值内存增长 {growth['iter_can_messages']} 字节，"
+                           f"超过索引 {index_bytes} 字节加 CAN 数据量 {payload_bytes} 字节的一半")
+
+
+def run_benchmark(bag_path=None, work_dir=None, stages=STAGES, samples=20, struct_frames=3, repeat=3,
+                  max_workers=None, can_messages=4000000, **bag_options):
+    """
+    运行基准测试，返回可以直接 json.dump 的结果。
+    参数:
+        bag_path: 已有的数据包；为 None 时在 work_dir 中用 synthetic_bag 生成，bag_options 传给 write_synthetic_bag
+        work_dir: 输出文件的临时目录，为 None 时使用系统临时目录并在结束后删除
+        stages: 要测量的阶段，见 STAGES
+        samples: 单项测试（解析、保存、图像）使用的消息条数
+        struct_frames: 逐点 struct 解析很慢，只用前几帧测量
+        repeat: 单项测试重复次数，取最快的一次
+        can_messages: can 阶段合成的 CAN 报文条数
+    """
+    # extrinsics.yaml 中只有 LIDAR_NAMES 这几个雷达的外参，更多的雷达（/rslidar_points_lidarN）在 end_to_end 合并点云时会报错
+    num_lidars = bag_options.get('num_lidars', len(LIDAR_NAMES))
+    if bag_path is None and num_lidars > len(LIDAR_NAMES):
+        raise ValueError(f"合成数据包最多 {len(LIDAR_NAMES)} 个激光雷达（extrinsics.yaml 中有外参的雷达），实际为 {num_lidars}")
+    cleanup = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='bench_ros2bag_')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        bag_info = {'bag_dir': bag_path}
+        if bag_path is None:
+            bag_path = os.path.join(work_dir, 'synthetic')
+            start = time.perf_counter()
+            bag_info = write_synthetic_bag(bag_path, **bag_options)
+            bag_info['generate_seconds'] = round(time.perf_counter() - start, 3)
+
+        bag = BagReader(bag_path)
+        try:
+            names = set()
+            for i in range(len(bag.split_files)):
+                names.update(bag.split_index(i)['topics'])
+            lidars = sorted(name for name in names if 'rslidar' in name)
+            cameras = sorted(name for name in names if 'image' in name)
+            # /rslidar_points_top 是同步时的参考帧，放在第一个
+            lidars.sort(key=lambda name: name != '/rslidar_points_top')
+            topics = lidars + cameras
+
+            message_count = 0
+            message_bytes = 0
+            for i in range(len(bag.split_files)):
+                for name, topic in bag.split_index(i)['topics'].items():
+                    if name in topics:
+                        message_count += len(topic['sizes'])
+                        message_bytes += int(topic['sizes'].sum())
+            bag_info.update({'topics': topics, 'message_count': message_count, 'message_bytes': message_bytes})
+
+            results = []
+            if 'parse_pointcloud2' in stages or 'save_pcd' in stages:
+                lidar_samples = load_samples(bag, lidars[0], samples) if lidars else []
+                if lidar_samples and 'parse_pointcloud2' in stages:
+                    bench_parse(results, lidar_samples, struct_frames, repeat)
+                if lidar_samples and 'save_pcd' in stages:
+                    bench_save(results, lidar_samples, work_dir, repeat)
+            if 'image' in stages and cameras:
+                bench_image(results, load_samples(bag, cameras[0], samples), work_dir, repeat)
+            if 'sync' in stages and lidars:
+                bench_sync(results, bag, topics, repeat)
+        finally:
+            bag.close()
+
+        if 'end_to_end' in stages and lidars:
+            bench_end_to_end(results, bag_path, topics, message_bytes, message_count, work_dir, max_workers)
+        if 'can' in stages:
+            bench_can(results, work_dir, can_messages, repeat)
+
+        return {
+            'environment': {
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'bag': bag_info,
+            'results': results,
+        }
+    finally:
+        if cleanup:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='rosbag2 导出流程的基准测试，结果以 JSON 输出')
+    parser.add_argument('--bag', help='使用已有的数据包（目录、metadata.yaml 或 .db3），默认生成合成数据包')
+    parser.add_argument('--work-dir', help='输出文件的目录，默认使用临时目录并在结束后删除')
+    parser.add_argument('--output', help='结果 JSON 文件，默认打印到标准输出')
+    parser.add_argument('--skip', nargs='*', default=[], choices=STAGES, help='跳过的阶段')
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--lidars', type=int, default=len(LIDAR_NAMES), help=f'激光雷达个数，最多 {len(LIDAR_NAMES)} 个')
+    parser.add_argument('--points', type=int, default=57600)
+    parser.add_argument('--cameras', type=int, default=7)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--image-size', type=int, nargs=2, default=(1920, 1080), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--can-messages', type=int, default=4000000, help='can 阶段合成的 CAN 报文条数')
+    args = parser.parse_args()
+
+    bag_options = {}
+    if args.bag is None:
+        bag_options = {'num_lidars': args.lidars, 'points_per_sweep': args.points, 'num_cameras': args.cameras,
+                       'duration': args.duration, 'image_size': tuple(args.image_size), 'seed': args.seed}
+    report = run_benchmark(args.bag, args.work_dir, [stage for stage in STAGES if stage not in args.skip],
+                           args.samples, repeat=args.repeat, max_workers=args.workers,
+                           can_messages=args.can_messages, **bag_options)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
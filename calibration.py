@@ -0,0 +1,206 @@
+# 标定相关的坐标变换工具：
+#   - 旋转矩阵 <-> 欧拉角，支持批量输入 (N, 3, 3) / (N, 3)，在 N 上向量化，可选 ZYX 或 XYZ 顺序；
+#   - 4x4 齐次变换的构建、批量组合和求逆；
+#   - TransformTree：记录各传感器之间的外参，缓存组合后的 传感器 -> 车体（或任意两个坐标系之间）的变换。
+# 雷达-相机标定调参时要扫描成千上万组候选外参，逐个矩阵调用标量函数太慢，这里全部按数组批量计算。
+#
+# 欧拉角统一按 (roll, pitch, yaw) 排列，分别是绕 X、Y、Z 轴的转角：
+#   'ZYX'：R = Rz(yaw) @ Ry(pitch) @ Rx(roll)（get_R.py 使用的顺序）
+#   'XYZ'：R = Rx(roll) @ Ry(pitch) @ Rz(yaw)
+import numpy as np
+
+EULER_ORDERS = ('ZYX', 'XYZ')
+
+# 判断万向锁（pitch 接近 ±90°）的阈值
+SINGULAR_EPSILON = 1e-6
+
+
+def _check_order(order):
+    if order not in EULER_ORDERS:
+        raise ValueError(f"欧拉角顺序只能是 {EULER_ORDERS}，实际为 {order}")
+
+
+def euler_to_rotation_matrix(angles, order='ZYX', degrees=False):
+    """
+    欧拉角转旋转矩阵。
+    参数:
+        angles: (3,) 或 (N, 3) 的 (roll, pitch, yaw)
+        order: 'ZYX' 或 'XYZ'
+        degrees: 为 True 时输入单位为度，否则为弧度
+    返回:
+        (3, 3) 或 (N, 3, 3) 的旋转矩阵
+    """
+    _check_order(order)
+    angles = np.asarray(angles, dtype=np.float64)
+    if angles.shape[-1] != 3:
+        raise ValueError(f"欧拉角数组的最后一维应为 3，实际形状为 {angles.shape}")
+    if degrees:
+        angles = np.deg2rad(angles)
+    cr, cp, cy = np.cos(angles[..., 0]), np.cos(angles[..., 1]), np.cos(angles[..., 2])
+    sr, sp, sy = np.sin(angles[..., 0]), np.sin(angles[..., 1]), np.sin(angles[..., 2])
+
+    R = np.empty(angles.shape[:-1] + (3, 3))
+    if order == 'ZYX':
+        R[..., 0, 0] = cy * cp
+        R[..., 0, 1] = cy * sp * sr - sy * cr
+        R[..., 0, 2] = cy * sp * cr + sy * sr
+        R[..., 1, 0] = sy * cp
+        R[..., 1, 1] = sy * sp * sr + cy * cr
+        R[..., 1, 2] = sy * sp * cr - cy * sr
+        R[..., 2, 0] = -sp
+        R[..., 2, 1] = cp * sr
+        R[..., 2, 2] = cp * cr
+    else:
+        R[..., 0, 0] = cp * cy
+        R[..., 0, 1] = -cp * sy
+        R[..., 0, 2] = sp
+        R[..., 1, 0] = cr * sy + sr * sp * cy
+        R[..., 1, 1] = cr * cy - sr * sp * sy
+        R[..., 1, 2] = -sr * cp
+        R[..., 2, 0] = sr * sy - cr * sp * cy
+        R[..., 2, 1] = sr * cy + cr * sp * sy
+        R[..., 2, 2] = cr * cp
+    return R
+
+
+def rotation_matrix_to_euler_angles(R, order='ZYX', degrees=False):
+    """
+    旋转矩阵转欧拉角。万向锁时 yaw 取 0，转角全部归到 roll 上。
+    参数:
+        R: (3, 3) 或 (N, 3, 3) 的旋转矩阵
+        order: 'ZYX' 或 'XYZ'
+        degrees: 为 True 时返回角度，否则为弧度
+    返回:
+        (3,) 或 (N, 3) 的 (roll, pitch, yaw)
+    """
+    _check_order(order)
+    R = np.asarray(R, dtype=np.float64)
+    if R.shape[-2:] != (3, 3):
+        raise ValueError(f"旋转矩阵数组的最后两维应为 (3, 3)，实际形状为 {R.shape}")
+
+    if order == 'ZYX':
+        cos_pitch = np.hypot(R[..., 0, 0], R[..., 1, 0])
+        singular = cos_pitch < SINGULAR_EPSILON
+        pitch = np.arctan2(-R[..., 2, 0], cos_pitch)
+        roll = np.where(singular, np.arctan2(-R[..., 1, 2], R[..., 1, 1]), np.arctan2(R[..., 2, 1], R[..., 2, 2]))
+        yaw = np.where(singular, 0.0, np.arctan2(R[..., 1, 0], R[..., 0, 0]))
+    else:
+        cos_pitch = np.hypot(R[..., 0, 0], R[..., 0, 1])
+        singular = cos_pitch < SINGULAR_EPSILON
+        pitch = np.arctan2(R[..., 0, 2], cos_pitch)
+        roll = np.where(singular, np.arctan2(R[..., 2, 1], R[..., 1, 1]), np.arctan2(-R[..., 1, 2], R[..., 2, 2]))
+        yaw = np.where(singular, 0.0, np.arctan2(-R[..., 0, 1], R[..., 0, 0]))
+
+    angles = np.stack([roll, pitch, yaw], axis=-1)
+    return np.rad2deg(angles) if degrees else angles
+
+
+def make_transforms(rotations, translations):
+    """
+    由旋转矩阵 (..., 3, 3) 和平移向量 (..., 3) 批量构建 4x4 齐次变换 (..., 4, 4)。
+    """
+    rotations = np.asarray(rotations, dtype=np.float64)
+    translations = np.asarray(translations, dtype=np.float64)
+    shape = np.broadcast_shapes(rotations.shape[:-2], translations.shape[:-1])
+    T = np.zeros(shape + (4, 4))
+    T[..., :3, :3] = rotations
+    T[..., :3, 3] = translations
+    T[..., 3, 3] = 1.0
+    return T
+
+
+def euler_to_transforms(angles, translations, order='ZYX', degrees=False):
+    """
+    由欧拉角 (..., 3) 和平移 (..., 3) 批量构建 4x4 变换，适合一次生成大量候选外参。
+    """
+    return make_transforms(euler_to_rotation_matrix(angles, order, degrees), translations)
+
+
+def invert_transforms(T):
+    """
+    批量求刚体变换 (..., 4, 4) 的逆：[R t]^-1 = [R^T  -R^T t]。
+    """
+    T = np.asarray(T, dtype=np.float64)
+    rotation_t = np.swapaxes(T[..., :3, :3], -1, -2)
+    return make_transforms(rotation_t, -np.einsum('...ij,...j->...i', rotation_t, T[..., :3, 3]))
+
+
+def compose_transforms(*transforms):
+    """
+    依次组合多个变换（支持广播）：compose_transforms(A, B, C) = A @ B @ C，
+    即先应用 C，再应用 B，最后应用 A。
+    """
+    result = np.asarray(transforms[0], dtype=np.float64)
+    for T in transforms[1:]:
+        result = np.matmul(result, T)
+    return result
+
+
+def transform_points(T, points):
+    """
+    用 4x4 变换 T 变换 (N, 3) 的点（也可以是 (N, k)，只使用前三列），返回 (N, 3)。
+    """
+    T = np.asarray(T)
+    points = np.asarray(points)
+    return points[:, :3] @ T[:3, :3].T + T[:3, 3]
+
+
+class TransformTree:
+    """
+    坐标系树：每个坐标系记录到父坐标系的变换（p_parent = T @ p_child），
+    lookup 查询任意两个坐标系之间的组合变换，并缓存结果；修改任何外参后缓存会被清空。
+
+    参数:
+        root: 根坐标系名字（一般是 'vehicle' 或参考雷达）
+    """
+
+    def __init__(self, root='vehicle'):
+        self.root = root
+        self._parents = {}
+        self._cache = {}
+
+    def set_transform(self, child, parent, T):
+        """
+        设置 child -> parent 的变换（4x4）。
+        """
+        if child == self.root:
+            raise ValueError(f"根坐标系 {self.root} 不能有父坐标系")
+        T = np.asarray(T, dtype=np.float64)
+        if T.shape != (4, 4):
+            raise ValueError(f"变换矩阵应为 4x4，实际形状为 {T.shape}")
+        self._parents[child] = (parent, T)
+        self._cache.clear()
+
+    def frames(self):
+        return [self.root] + list(self._parents)
+
+    def to_root(self, frame):
+        """
+        返回 frame -> 根坐标系 的组合变换（缓存）。
+        """
+        key = (frame, self.root)
+        if key not in self._cache:
+            T = np.eye(4)
+            visited = set()
+            current = frame
+            while current != self.root:
+                if current not in self._parents:
+                    raise KeyError(f"坐标系 {current} 没有连接到根坐标系 {self.root}")
+                if current in visited:
+                    raise ValueError(f"坐标系之间存在环: {current}")
+                visited.add(current)
+                parent, T_parent = self._parents[current]
+                T = T_parent @ T
+                current = parent
+            self._cache[key] = T
+        return self._cache[key]
+
+    def lookup(self, source, target=None):
+        """
+        返回 source -> target 的变换（p_target = T @ p_source），target 默认为根坐标系。结果会被缓存。
+        """
+        target = self.root if target is None else target
+        key = (source, target)
+        if key not in self._cache:
+            self._cache[key] = invert_transforms(self.to_root(target)) @ self.to_root(source)
+        return self._cache[key]
@@ -0,0 +1,195 @@
+# CAN 报文的批量解码：按时间顺序分块读出某个 topic 的消息，把定长的原始字节看作 (N, L) 的 uint8 数组，
+# 按配置的偏移量切出 arbitration id、dlc 和 8 字节数据，得到结构化数组；信号（起始位、位长、字节序、符号、
+# 缩放和偏移）在 64 位整数上用移位和掩码向量化解码。
+# 以前 getCan.py 逐字节拼十六进制字符串再由 make_csv.py 按空格切分，长时间的 canOnly 数据包要跑几分钟。
+# 时间顺序取自缓存索引（见 bag_index.py）或只读 id 和时间戳的查询，消息数据再按 id 分块读取：
+# 如果直接 SELECT data ... ORDER BY timestamp，SQLite 要先把整个 topic 的数据放进排序器（temp_store=MEMORY 时全在内存里）。
+import numpy as np
+
+import bag_index
+from bag_reader import connect_readonly, iter_messages_by_id, select_messages
+
+# 报文在序列化消息中的位置（字节偏移）。默认值对应 make_csv.py 中使用的位置：
+# 第 16 字节是报文 id，第 51~58 字节是 8 字节数据；没有 dlc 字段时 dlc 记为 data_length。
+DEFAULT_CAN_LAYOUT = {
+    'id_offset': 16,
+    'id_size': 1,        # 1、2 或 4 字节
+    'id_byteorder': '<',
+    'dlc_offset': None,
+    'data_offset': 51,
+    'data_length': 8,
+}
+
+CAN_DTYPE = np.dtype([('timestamp', '<i8'), ('can_id', '<u4'), ('dlc', 'u1'), ('data', 'u1', (8,))])
+
+
+def _blobs_to_array(blobs):
+    lengths = np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs))
+    width = int(lengths.max()) if len(blobs) else 0
+    if (lengths == width).all():
+        # 定长消息（通常的情况）：拼接后直接重新解释为 (N, L)
+        return np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(len(blobs), width)
+    raw = np.zeros((len(blobs), width), dtype=np.uint8)
+    for i, blob in enumerate(blobs):
+        raw[i, :len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+    return raw
+
+
+def _read_rowid_range(conn, rowids, topic_id, table_name, fetch_size=10000):
+    # 一块的 id 通常是连续的一段：按 id 范围顺序扫描，再按 rowids 的顺序（即时间顺序）重新排列。
+    # 每次只取 fetch_size 行转成数组，只保留消息数据本身，不同时持有整块的行元组
+    order = np.argsort(rowids, kind='stable')
+    sorted_ids = rowids[order]
+    cursor = conn.execute(f"SELECT id, timestamp, data FROM {table_name} WHERE id BETWEEN ? AND ? AND topic_id = ?;",
+                          (int(sorted_ids[0]), int(sorted_ids[-1]), topic_id))
+    id_parts, stamp_parts, blobs = [], [], []
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        ids, stamps, data = zip(*rows)
+        id_parts.append(np.array(ids, dtype=np.int64))
+        stamp_parts.append(np.array(stamps, dtype=np.int64))
+        blobs.extend(data)
+        del rows, ids, stamps, data
+    ids = np.concatenate(id_parts) if id_parts else np.empty(0, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    keep = np.flatnonzero(sorted_ids[positions] == ids)
+    dest = order[positions[keep]]
+    timestamps = np.empty(len(keep), dtype=np.int64)
+    if stamp_parts:
+        timestamps[dest] = np.concatenate(stamp_parts)[keep]
+    fetched = _blobs_to_array(blobs if len(keep) == len(blobs) else [blobs[i] for i in keep.tolist()])
+    del blobs
+    raw = np.empty_like(fetched)
+    raw[dest] = fetched
+    return timestamps, raw
+
+
+def iter_can_messages(db3_file, topic_id, table_name='messages', batch_size=100000):
+    """
+    按时间顺序分块读出某个 topic 的消息，每块最多 batch_size 条，消息数据占用的内存与数据包长度无关
+    （只有按时间排序的 id 和时间戳数组随消息数增长）。
+    返回:
+        生成器，依次产生 (timestamps, raw)：int64 时间戳数组和 (n, L) 的 uint8 数组
+        （L 为这一块中最长消息的长度，较短的消息末尾补 0）
+    """
+    conn = connect_readonly(db3_file)
+    try:
+        if table_name == 'messages':
+            entry = bag_index.topic_entry(bag_index.load_bag_index(db3_file), topic_id)
+            rowids = entry['rowids']
+        else:
+            rowids, _ = select_messages(conn, topic_id, table_name=table_name)
+        for start in range(0, len(rowids), batch_size):
+            chunk = rowids[start:start + batch_size]
+            # id 范围不超过这一块条数的两倍时按范围读取（读出的行数有上限），
+            # 否则（写入顺序和时间顺序相差很大，或者和其它 topic 交错写入）按 id 读取
+            if int(chunk.max()) - int(chunk.min()) < 2 * len(chunk):
+                yield _read_rowid_range(conn, chunk, topic_id, table_name)
+                continue
+            rows = list(iter_messages_by_id(conn, chunk, table_name))
+            timestamps = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+            yield timestamps, _blobs_to_array([row[2] for row in rows])
+    finally:
+        conn.close()
+
+
+def _read_uint(raw, offset, size, byteorder='<'):
+    if size not in (1, 2, 4):
+        raise ValueError(f"整数字段的长度只能是 1、2 或 4 字节，实际为 {size}")
+    if offset + size > raw.shape[1]:
+        raise ValueError(f"字段 [{offset}, {offset + size}) 超出了消息长度 {raw.shape[1]}")
+    return np.ascontiguousarray(raw[:, offset:offset + size]).view(f'{byteorder}u{size}')[:, 0]
+
+
+def decode_can_frames(timestamps, raw, layout=None):
+    """
+    按 layout 从原始字节中切出 CAN 报文。
+    参数:
+        timestamps: iter_can_messages 产生的时间戳
+        raw: iter_can_messages 产生的 (N, L) 数组
+        layout: 偏移配置，缺省的项使用 DEFAULT_CAN_LAYOUT
+    返回:
+        CAN_DTYPE 的结构化数组（timestamp, can_id, dlc, data[8]）
+    """
+    layout = {**DEFAULT_CAN_LAYOUT, **(layout or {})}
+    data_length = layout['data_length']
+    if not 0 < data_length <= 8:
+        raise ValueError(f"data_length 应在 1~8 之间，实际为 {data_length}")
+
+    frames = np.zeros(len(timestamps), dtype=CAN_DTYPE)
+    frames['timestamp'] = timestamps
+    if len(timestamps) == 0:
+        return frames
+    frames['can_id'] = _read_uint(raw, layout['id_offset'], layout['id_size'], layout['id_byteorder'])
+    if layout['dlc_offset'] is None:
+        frames['dlc'] = data_length
+    else:
+        frames['dlc'] = _read_uint(raw, layout['dlc_offset'], 1)
+    data_offset = layout['data_offset']
+    if data_offset + data_length > raw.shape[1]:
+        raise ValueError(f"数据字段 [{data_offset}, {data_offset + data_length}) 超出了消息长度 {raw.shape[1]}")
+    frames['data'][:, :data_length] = raw[:, data_offset:data_offset + data_length]
+    return frames
+
+
+def iter_can_frames(db3_file, topic_id, layout=None, table_name='messages', batch_size=100000):
+    """
+    分块读出并解码 CAN 报文，依次产生 CAN_DTYPE 的结构化数组（按时间排序）。
+    """
+    for timestamps, raw in iter_can_messages(db3_file, topic_id, table_name, batch_size):
+        yield decode_can_frames(timestamps, raw, layout)
+
+
+def read_can_frames(db3_file, topic_id, layout=None, table_name='messages'):
+    """
+    读出并解码某个 topic 的全部 CAN 报文，返回 CAN_DTYPE 的结构化数组。
+    """
+    chunks = list(iter_can_frames(db3_file, topic_id, layout, table_name))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=CAN_DTYPE)
+
+
+def decode_signals(frames, signals):
+    """
+    向量化解码信号。
+    参数:
+        frames: decode_can_frames 的结果
+        signals: {信号名: 定义}，定义中的项：
+            start_bit: 起始位（按 byteorder 把 8 字节数据读成 64 位整数后，信号最低位所在的位）
+            length: 位长（1~64）
+            byteorder: 'little'（Intel，默认）或 'big'（Motorola，8 字节按大端读成整数）
+            signed: 是否为有符号数（补码），默认 False
+            scale, offset: 物理值 = 原始值 * scale + offset，默认 1 和 0
+            can_id: 只在该 id 的报文上解码，其余报文为 NaN（可选）
+    返回:
+        结构化数组：timestamp、can_id，以及每个信号一列 float64
+    """
+    dtype = [('timestamp', '<i8'), ('can_id', '<u4')] + [(name, '<f8') for name in signals]
+    out = np.empty(frames.shape[0], dtype=np.dtype(dtype))
+    out['timestamp'] = frames['timestamp']
+    out['can_id'] = frames['can_id']
+
+    data = np.ascontiguousarray(frames['data'])
+    words = {'little': data.view('<u8')[:, 0], 'big': data.view('>u8')[:, 0]}
+    for name, signal in signals.items():
+        start_bit = signal['start_bit']
+        length = signal['length']
+        byteorder = signal.get('byteorder', 'little')
+        if byteorder not in words:
+            raise ValueError(f"信号 {name} 的 byteorder 只能是 'little' 或 'big'")
+        if not 0 < length <= 64 or start_bit < 0 or start_bit + length > 64:
+            raise ValueError(f"信号 {name} 的位置无效: start_bit={start_bit}, length={length}")
+
+        mask = np.uint64((1 << length) - 1)
+        value = (words[byteorder] >> np.uint64(start_bit)) & mask
+        if signal.get('signed', False):
+            value = value.astype(np.int64)
+            if length < 64:
+                sign_bit = np.int64(1 << (length - 1))
+                value = (value ^ sign_bit) - sign_bit
+        physical = value.astype(np.float64) * signal.get('scale', 1.0) + signal.get('offset', 0.0)
+        if 'can_id' in signal:
+            physical[frames['can_id'] != signal['can_id']] = np.nan
+        out[name] = physical
+    return out
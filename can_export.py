@@ -0,0 +1,108 @@
+# CAN 日志的流式导出：按时间顺序分块读出并解码报文（见 can_decoder.py），每块作为一个 row group 写入 Parquet
+# （或 Arrow IPC 文件）。列都是定型的（int64 时间戳、uint32 id、uint8 数据字节、float64 信号），
+# Parquet 的每个 row group 带有 min/max 统计信息，下游按时间范围读取时可以跳过无关的 row group，不需要全表扫描。
+# 内存占用只取决于 row_group_size，与日志长度无关；也不再受 Excel 约 100 万行的限制。
+import numpy as np
+
+from can_decoder import iter_can_frames, decode_signals
+from atomic_io import atomic_write
+
+try:
+    import pyarrow as pa  # 需要 pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CAN_EXPORT_FORMATS = ('parquet', 'arrow')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("导出 Parquet / Arrow 需要安装 pyarrow：pip install pyarrow")
+
+
+def can_schema(signal_names=()):
+    """
+    导出文件的列：timestamp（纳秒）, can_id, dlc, data_0 ~ data_7，以及每个信号一列 float64。
+    """
+    _require_pyarrow()
+    fields = [pa.field('timestamp', pa.int64()), pa.field('can_id', pa.uint32()), pa.field('dlc', pa.uint8())]
+    fields += [pa.field(f'data_{i}', pa.uint8()) for i in range(8)]
+    fields += [pa.field(name, pa.float64()) for name in signal_names]
+    return pa.schema(fields)
+
+
+def frames_to_table(frames, signals=None, schema=None):
+    """
+    把一块 CAN_DTYPE 的结构化数组（以及解码出的信号）转换为 pyarrow.Table。
+    """
+    signals = signals or {}
+    schema = schema or can_schema(list(signals))
+    data = np.ascontiguousarray(frames['data'])
+    columns = [frames['timestamp'], frames['can_id'], frames['dlc']]
+    columns += [np.ascontiguousarray(data[:, i]) for i in range(8)]
+    if signals:
+        decoded = decode_signals(frames, signals)
+        columns += [decoded[name] for name in signals]
+    return pa.Table.from_arrays([pa.array(np.ascontiguousarray(column)) for column in columns], schema=schema)
+
+
+def export_can_log(db3_file, topic_id, out_file, layout=None, signals=None, output_format='parquet',
+                   row_group_size=1000000, compression='zstd', table_name='messages'):
+    """
+    流式导出某个 topic 的全部 CAN 报文。
+    参数:
+        db3_file: .db3 文件
+        topic_id: CAN topic 的 id
+        out_file: 输出文件（先写临时文件，完成后再改名）
+        layout: 报文偏移配置，见 can_decoder.DEFAULT_CAN_LAYOUT
+        signals: 需要解码的信号，见 can_decoder.decode_signals
+        output_format: 'parquet' 或 'arrow'（Arrow IPC 文件）
+        row_group_size: 每次从数据库读取并写出的行数，也就是 Parquet 每个 row group 的行数
+        compression: Parquet 的压缩方式
+    返回:
+        写出的行数
+    """
+    _require_pyarrow()
+    if output_format not in CAN_EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {output_format}，可选 {CAN_EXPORT_FORMATS}")
+    signals = signals or {}
+    schema = can_schema(list(signals))
+
+    rows = 0
+    with atomic_write(out_file) as f:
+        if output_format == 'parquet':
+            options = {'compression': compression, 'write_statistics': True}
+            if hasattr(pq, 'SortingColumn'):
+                # 记录数据按 timestamp 升序排列（pyarrow >= 13）
+                options['sorting_columns'] = [pq.SortingColumn(0)]
+            writer = pq.ParquetWriter(f, schema, **options)
+        else:
+            writer = pa.ipc.new_file(f, schema)
+        try:
+            # 查询按 timestamp 排序，分块写出后整个文件也是有序的
+            for frames in iter_can_frames(db3_file, topic_id, layout, table_name, batch_size=row_group_size):
+                table = frames_to_table(frames, signals, schema)
+                if output_format == 'parquet':
+                    writer.write_table(table, row_group_size=row_group_size)
+                else:
+                    writer.write_table(table, max_chunksize=row_group_size)
+                rows += table.num_rows
+        finally:
+            writer.close()
+    return rows
+
+
+def read_can_log(parquet_file, start=None, end=None, columns=None):
+    """
+    读取导出的 Parquet 文件中 [start, end] 时间范围内的报文，利用 row group 统计信息跳过无关的部分。
+    返回:
+        pyarrow.Table
+    """
+    _require_pyarrow()
+    filters = []
+    if start is not None:
+        filters.append(('timestamp', '>=', int(start)))
+    if end is not None:
+        filters.append(('timestamp', '<=', int(end)))
+    return pq.read_table(parquet_file, columns=columns, filters=filters or None)
@@ -0,0 +1,143 @@
+# rosbag2 (sqlite3 存储) 中每条消息的 data 字段都是 CDR 序列化的字节流。
+# 这里实现一个最小的 CDR 读取器，只支持解析消息头部需要用到的基础类型，
+# 大块的数组数据（点云、图像）不做拷贝，只返回它们在原始字节中的偏移和长度。
+# CdrWriter 是对应的写入器，用来生成测试/基准测试用的消息（见 synthetic_bag.py）。
+import struct
+
+# CDR 封装头（前4个字节）的第二个字节表示字节序：0x00 大端，0x01 小端
+CDR_BE = 0x00
+CDR_LE = 0x01
+ENCAPSULATION_SIZE = 4
+
+
+class CdrReader:
+    """
+    顺序读取 CDR 字节流的简单游标。
+
+    参数:
+        data: bytes / bytearray / memoryview，完整的消息数据（包含4字节封装头）
+    """
+
+    def __init__(self, data):
+        self.data = memoryview(data).cast('B')
+        if len(self.data) < ENCAPSULATION_SIZE:
+            raise ValueError(f"CDR数据长度不足: {len(self.data)} 字节")
+        kind = self.data[1]
+        if kind not in (CDR_BE, CDR_LE):
+            raise ValueError(f"不支持的CDR封装类型: {kind:#04x}")
+        self.little_endian = kind == CDR_LE
+        self._prefix = '<' if self.little_endian else '>'
+        # 对齐是相对于封装头之后的位置计算的
+        self.offset = ENCAPSULATION_SIZE
+
+    def align(self, size):
+        pad = (self.offset - ENCAPSULATION_SIZE) % size
+        if pad:
+            self.offset += size - pad
+
+    def _check(self, size):
+        if self.offset + size > len(self.data):
+            raise ValueError(f"CDR数据越界: 偏移 {self.offset} + 长度 {size} > {len(self.data)}")
+
+    def _unpack(self, fmt, size):
+        self.align(size)
+        self._check(size)
+        value = struct.unpack_from(self._prefix + fmt, self.data, self.offset)[0]
+        self.offset += size
+        return value
+
+    def uint8(self):
+        self._check(1)
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def bool(self):
+        return self.uint8() != 0
+
+    def int32(self):
+        return self._unpack('i', 4)
+
+    def uint32(self):
+        return self._unpack('I', 4)
+
+    def string(self):
+        # 字符串：uint32 长度（包含结尾的 '\0'）+ 字符内容
+        length = self.uint32()
+        self._check(length)
+        raw = bytes(self.data[self.offset:self.offset + length])
+        self.offset += length
+        return raw.rstrip(b'\x00').decode('utf-8', errors='replace')
+
+    def stamp(self):
+        # builtin_interfaces/Time: int32 sec + uint32 nanosec
+        sec = self.int32()
+        nanosec = self.uint32()
+        return sec * 1000000000 + nanosec
+
+    def header(self):
+        # std_msgs/Header: stamp + frame_id，返回 (纳秒时间戳, frame_id)
+        stamp = self.stamp()
+        frame_id = self.string()
+        return stamp, frame_id
+
+    def byte_sequence(self):
+        """
+        读取 uint8[] 序列，返回 (起始偏移, 长度)，不拷贝数据。
+        """
+        length = self.uint32()
+        self._check(length)
+        start = self.offset
+        self.offset += length
+        return start, length
+
+
+class CdrWriter:
+    """
+    按 CDR（小端）顺序写入基础类型，getvalue() 返回包含4字节封装头的完整消息数据。
+    """
+
+    def __init__(self):
+        self.buffer = bytearray(bytes([0x00, CDR_LE, 0x00, 0x00]))
+
+    def align(self, size):
+        pad = (len(self.buffer) - ENCAPSULATION_SIZE) % size
+        if pad:
+            self.buffer += bytes(size - pad)
+
+    def _pack(self, fmt, size, value):
+        self.align(size)
+        self.buffer += struct.pack('<' + fmt, value)
+
+    def uint8(self, value):
+        self.buffer.append(value)
+
+    def bool(self, value):
+        self.uint8(1 if value else 0)
+
+    def int32(self, value):
+        self._pack('i', 4, value)
+
+    def uint32(self, value):
+        self._pack('I', 4, value)
+
+    def string(self, value):
+        raw = value.encode('utf-8') + b'\x00'
+        self.uint32(len(raw))
+        self.buffer += raw
+
+    def stamp(self, stamp):
+        self.int32(stamp // 1000000000)
+        self.uint32(stamp % 1000000000)
+
+    def header(self, stamp, frame_id):
+        self.stamp(stamp)
+        self.string(frame_id)
+
+    def byte_sequence(self, data):
+        data = memoryview(data).cast('B')
+        self.uint32(len(data))
+        self.buffer += data
+
+    def getvalue(self):
+        return bytes(self.buffer)
@@ -0,0 +1,71 @@
+# 导出清单（断点续传）：在输出目录下用一个小的 SQLite 文件（export_manifest.db）记录已经完成的输出。
+# 每个输出文件在改名成功（见 atomic_io.py）之后才写入一条 (topic, timestamp) 记录，并立即提交，
+# 所以导出被打断后重新运行时，清单里有记录且文件仍然存在的输出会被跳过，只重做没有完成的部分。
+# SQLite 自带跨进程的锁，进程池中的多个任务可以同时写同一个清单；同一进程内的多个线程共用一个连接，用锁串行访问。
+import os
+import sqlite3
+import threading
+
+MANIFEST_NAME = 'export_manifest.db'
+
+
+def manifest_path(out_dir):
+    return os.path.join(out_dir, MANIFEST_NAME)
+
+
+class ExportManifest:
+    """
+    记录已完成输出的清单。每个进程都应该打开自己的 ExportManifest，同一进程内的线程（例如流水线的读取和写出线程）可以共用。
+
+    参数:
+        out_dir: 输出目录，清单文件保存在 out_dir/export_manifest.db
+    """
+
+    def __init__(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.conn = sqlite3.connect(manifest_path(out_dir), timeout=60, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode = WAL;")
+        self.conn.execute("PRAGMA synchronous = NORMAL;")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS done ("
+                          "topic TEXT NOT NULL, timestamp INTEGER NOT NULL, filename TEXT NOT NULL, "
+                          "PRIMARY KEY (topic, timestamp));")
+        self.conn.commit()
+
+    def is_done(self, topic, timestamp):
+        """
+        (topic, timestamp) 已经记录为完成、并且对应的文件仍然存在时返回 True。
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT filename FROM done WHERE topic = ? AND timestamp = ?;",
+                                    (topic, int(timestamp))).fetchone()
+        return row is not None and os.path.exists(os.path.join(self.out_dir, row[0]))
+
+    def mark_done(self, topic, timestamp, filename):
+        """
+        记录一个已经完整写出的输出文件（filename 按相对于输出目录的路径保存）。
+        """
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO done (topic, timestamp, filename) VALUES (?, ?, ?);",
+                              (topic, int(timestamp), os.path.relpath(filename, self.out_dir)))
+            self.conn.commit()
+
+    def mark_done_many(self, rows):
+        """
+        一次记录多个输出，rows 为 [(topic, timestamp, filename), ...]，只提交一次（例如一个分片写完时，见 shard_io.py）。
+        """
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO done (topic, timestamp, filename) VALUES (?, ?, ?);",
+                                  [(topic, int(timestamp), os.path.relpath(filename, self.out_dir))
+                                   for topic, timestamp, filename in rows])
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,272 @@
+# 导出任务：每个任务处理某个 topic 中的一段消息 id 区间，并在任务内部打开自己的只读 SQLite 连接。
+# 任务按消息大小（缓存索引中的 length(data)）切分成字节数大致相等的块，按字节数从大到小提交到同一个池中，
+# 空闲的工作线程/进程从共享队列中取下一个块，不会出现某个 topic 的尾巴拖住整个池的情况；进度条按字节计数。
+# 任务函数都定义在模块顶层，既可以交给线程池，也可以交给进程池——解析点云和写文件是受 GIL 限制的，
+# 进程池可以在多核机器上近似线性加速。
+# 每个任务内部是一条 读取 → 解码 → 写出 流水线（见 pipeline.py），SQLite 读取、解析和写盘同时进行。
+# 给定 start / end / min_interval 时先在缓存索引中选出要导出的消息 id（见 bag_reader.plan_byte_chunks），
+# 任务只按 id 读取这些消息，被跳过的消息数据不会被读出。
+# resume=True 时每个输出目录下有一个导出清单（见 export_manifest.py），重新运行时跳过已经完成的消息。
+# 每个任务的流水线有一个内存预算（读取、解码、写出三个阶段中同时存在的数据字节数，见 pipeline.MemoryBudget），
+# 读取阶段每页取多少条也根据已经读到的消息平均大小调整（见 bag_reader.adaptive_batch_size），
+# 无论一条消息是几 KB 的图像还是几十 MB 的合并点云，峰值内存都不会超过预算太多。
+# 传入 recorder（见 instrumentation.py）时记录 SQLite 读取、解析/解码、写出各阶段的统计；进程池中的任务在子进程里
+# 单独记录，完成后由主进程合并。
+import os
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+
+from bag_reader import (BagReader, connect_readonly, ensure_topic_timestamp_index, iter_messages, iter_messages_by_id,
+                        plan_byte_chunks)
+from pointcloud2 import pointcloud2_to_xyzi
+from pcd_io import save_pointcloud
+from image_io import prepare_image, write_image
+from pipeline import run_pipeline, DEFAULT_MEMORY_BUDGET
+from export_manifest import ExportManifest
+from atomic_io import remove_stale_tmp
+from instrumentation import Recorder, NULL_RECORDER
+
+EXECUTOR_TYPES = ('thread', 'process')
+
+# 每个导出任务的目标数据量
+DEFAULT_CHUNK_BYTES = 32 << 20  # 32 MiB
+
+
+def sensor_output_dir(out_file, topic_name):
+    sensor_name = topic_name.split("/")[-1]
+    output_file = os.path.join(out_file, sensor_name)
+    os.makedirs(output_file, exist_ok=True)
+    return sensor_name, output_file
+
+
+def _pending_messages(db3_file, topic_id, topic_name, manifest, skipped, min_id, max_id,
+                      table_name, column_name, column_stamp, batch_size, rowids=None, max_batch_bytes=None):
+    # 读取阶段（在流水线的读取线程中执行，连接也在这个线程中打开）：已经完成的消息直接跳过，不进入解码阶段
+    conn = connect_readonly(db3_file)
+    try:
+        if rowids is not None:
+            messages = iter_messages_by_id(conn, rowids, table_name, column_name, column_stamp,
+                                           max_batch_bytes=max_batch_bytes)
+        else:
+            messages = iter_messages(conn, topic_id, table_name, column_name, column_stamp, batch_size,
+                                     min_id=min_id, max_id=max_id, max_batch_bytes=max_batch_bytes)
+        for record_id, timestamp, data in messages:
+            if manifest is not None and manifest.is_done(topic_name, timestamp):
+                skipped[0] += 1
+                continue
+            yield timestamp, data
+    finally:
+        conn.close()
+
+
+def export_range(db3_file, topic_id, topic_name, out_file, decode, save, min_id=None, max_id=None,
+                 table_name='messages', column_name='data', column_stamp='timestamp', batch_size=1000, resume=True,
+                 decode_workers=1, write_workers=2, desc=None, total=None, rowids=None, recorder=None,
+                 stage_names=('sqlite_fetch', 'decode', 'write'), memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    用 读取 → 解码 → 写出 流水线（见 pipeline.py）导出一段 id 区间内的消息。
+    参数:
+        decode: decode(data) -> 要保存的数据，返回 None 表示跳过这条消息
+        save: save(payload, filename_stem) -> 实际写出的文件名（失败时返回 None）
+        decode_workers, write_workers: 解码 / 写出线程数。放进进程池时每个任务用少量线程即可，单进程导出时可以设成 CPU 核数
+        desc, total: 进度条的说明和消息总数（可选）
+        rowids: 只导出这些 id 的消息（见 bag_reader.plan_byte_chunks），给定时忽略 min_id / max_id
+        recorder, stage_names: 分阶段统计（见 instrumentation.py）和三个阶段的名字
+        memory_budget: 流水线中同时存在的数据字节数上限（见 pipeline.MemoryBudget），None 表示只按队列条数限制
+    返回:
+        (写出的文件数, 因为已经完成而跳过的消息数)
+    """
+    sensor_name, output_file = sensor_output_dir(out_file, topic_name)
+    manifest = ExportManifest(out_file) if resume else None
+    skipped = [0]
+
+    def decode_message(item):
+        timestamp, data = item
+        payload = decode(data)
+        return [] if payload is None else [(timestamp, payload)]
+
+    def write(task):
+        timestamp, payload = task
+        filename = save(payload, os.path.join(output_file, f'{sensor_name}_{timestamp}'))
+        if filename and manifest is not None:
+            manifest.mark_done(topic_name, timestamp, filename)
+        return filename
+
+    source = _pending_messages(db3_file, topic_id, topic_name, manifest, skipped, min_id, max_id,
+                               table_name, column_name, column_stamp, batch_size, rowids,
+                               # 读取阶段每页最多读取预算的 1/4
+                               memory_budget // 4 if memory_budget else None)
+    try:
+        written = run_pipeline(source, decode_message, write, decode_workers, write_workers, desc=desc, total=total,
+                               recorder=recorder, stage_names=stage_names, memory_budget=memory_budget)
+    finally:
+        if manifest is not None:
+            manifest.close()
+    return len(written), skipped[0]
+
+
+def _decode_lidar(data):
+    points = pointcloud2_to_xyzi(data)
+    return points if points.size > 0 else None
+
+
+def export_lidar_range(db3_file, topic_id, lidar_name, out_file, output_format='binary', min_id=None, max_id=None,
+                       table_name='messages', column_name='data', column_stamp='timestamp', batch_size=1000, resume=True,
+                       decode_workers=1, write_workers=2, desc=None, total=None, rowids=None, recorder=None,
+                       memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    导出一段 id 区间内（或 rowids 指定）的点云消息。
+    返回:
+        (写出的文件数, 因为已经完成而跳过的消息数)
+    """
+    return export_range(db3_file, topic_id, lidar_name, out_file, _decode_lidar,
+                        partial(save_pointcloud, output_format=output_format), min_id, max_id,
+                        table_name, column_name, column_stamp, batch_size, resume,
+                        decode_workers, write_workers, desc, total, rowids, recorder,
+                        ('sqlite_fetch', 'parse_pointcloud', 'write_pointcloud'), memory_budget)
+
+
+def export_camera_range(db3_file, topic_id, carm_name, out_file, image_format='png', min_id=None, max_id=None,
+                        table_name='messages', column_name='data', column_stamp='timestamp', batch_size=1000, resume=True,
+                        decode_workers=1, write_workers=2, desc=None, total=None, rowids=None, recorder=None,
+                        memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    导出一段 id 区间内（或 rowids 指定）的图像消息。image_format 为 'jpg' 时直接写出压缩数据，不解码。
+    返回:
+        (写出的文件数, 因为已经完成而跳过的消息数)
+    """
+    return export_range(db3_file, topic_id, carm_name, out_file, partial(prepare_image, image_format=image_format),
+                        write_image, min_id, max_id, table_name, column_name, column_stamp, batch_size, resume,
+                        decode_workers, write_workers, desc, total, rowids, recorder,
+                        ('sqlite_fetch', 'decode_image', 'write_image'), memory_budget)
+
+
+def _run_instrumented(export_fn, args, kwargs, profile_stage=None):
+    # 进程池中的任务：在子进程里单独记录统计，和导出结果一起返回（snapshot 可以 pickle）
+    recorder = Recorder(profile_stage=profile_stage)
+    result = export_fn(*args, recorder=recorder, **kwargs)
+    return result, recorder.snapshot()
+
+
+def export_topics(db3_file, topic_id_dict, image_out, pointcloud_out, executor_type='process', max_workers=None,
+                  chunk_bytes=DEFAULT_CHUNK_BYTES, output_format='binary', image_format='png', index_mode='none', resume=True,
+                  start=None, end=None, min_interval=None, recorder=None, memory_budget=None):
+    """
+    将单个 .db3 中的多个 topic 按字节数切分成任务并行导出，最后汇总每个 topic 写出的文件数。
+    参数:
+        topic_id_dict: {topic_name: topic_id}，名字里带 'image' 的按图像导出，其余按点云导出
+        image_out, pointcloud_out: 图像 / 点云的输出根目录
+        executor_type: 'thread' 线程池，'process' 进程池
+        max_workers: 并行的工作线程/进程数，默认等于 CPU 核数
+        chunk_bytes: 每个任务处理的消息数据量（字节），按缓存索引中的消息大小切分
+        output_format: 点云输出格式，见 pcd_io.OUTPUT_FORMATS
+        image_format: 图像输出格式，'jpg' 为直通模式（不解码），'png' 为解码后保存
+        index_mode: (topic_id, timestamp) 索引的建立方式，见 bag_reader.ensure_topic_timestamp_index；
+                    导出按消息 id 读取，默认 'none' 不建索引，原始数据包保持不变
+        resume: 为 True 时根据输出目录中的导出清单跳过已经完成的消息（断点续传），为 False 时全部重新导出
+        start, end: 只导出时间戳在 [start, end] 范围内的消息（纳秒），None 表示不限制
+        min_interval: 抽帧间隔（秒）：每个 topic 按这个长度划分时间桶，每个桶只导出第一条，见 bag_reader.select_timestamps
+        recorder: instrumentation.Recorder，记录各阶段的耗时、字节数、队列深度和峰值内存（可选）
+        memory_budget: 所有并行任务合计的内存预算（字节），平均分给 max_workers 个任务；
+                       None 表示每个任务使用 DEFAULT_MEMORY_BUDGET
+    返回:
+        {topic_name: 写出的文件数}
+    """
+    db3_file = ensure_topic_timestamp_index(db3_file, index_mode)
+    return export_splits([(db3_file, topic_id_dict)], image_out, pointcloud_out, executor_type, max_workers,
+                         chunk_bytes, output_format, image_format, resume, start, end, min_interval, recorder,
+                         memory_budget)
+
+
+def export_bag(bag_path, topic_name_list, image_out, pointcloud_out, executor_type='process', max_workers=None,
+               chunk_bytes=DEFAULT_CHUNK_BYTES, output_format='binary', image_format='png', index_mode='none', resume=True,
+               start=None, end=None, min_interval=None, recorder=None, memory_budget=None):
+    """
+    导出整个 rosbag2 数据包（metadata.yaml 中列出的所有分片），各分片的任务放进同一个池中并行处理。
+    """
+    bag = BagReader(bag_path, index_mode)
+    try:
+        split_topic_ids = bag.split_topic_ids(topic_name_list)
+    finally:
+        bag.close()
+    return export_splits(split_topic_ids, image_out, pointcloud_out, executor_type, max_workers,
+                         chunk_bytes, output_format, image_format, resume, start, end, min_interval, recorder,
+                         memory_budget)
+
+
+def export_splits(split_topic_ids, image_out, pointcloud_out, executor_type='process', max_workers=None,
+                  chunk_bytes=DEFAULT_CHUNK_BYTES, output_format='binary', image_format='png', resume=True,
+                  start=None, end=None, min_interval=None, recorder=None, memory_budget=None):
+    """
+    参数:
+        split_topic_ids: [(db3_file, {topic_name: topic_id}), ...]，同一个 topic 在不同分片中的 id 可以不同
+        start, end, min_interval: 见 export_topics；抽帧在每个分片内分别进行
+        recorder, memory_budget: 见 export_topics
+    返回:
+        {topic_name: 所有分片合计写出的文件数（不包括跳过的已完成消息）}
+    """
+    if executor_type not in EXECUTOR_TYPES:
+        raise ValueError(f"executor_type 只能是 {EXECUTOR_TYPES}，实际为 {executor_type}")
+    max_workers = max_workers or os.cpu_count()
+    executor_cls = ProcessPoolExecutor if executor_type == 'process' else ThreadPoolExecutor
+    task_budget = memory_budget // max_workers if memory_budget else DEFAULT_MEMORY_BUDGET
+
+    # 输出目录提前创建好，避免多个任务同时创建；同时清理上次被打断时留下的临时文件
+    for _, topic_id_dict in split_topic_ids:
+        for topic_name in topic_id_dict:
+            _, output_file = sensor_output_dir(image_out if 'image' in topic_name else pointcloud_out, topic_name)
+            remove_stale_tmp(output_file)
+    if resume:
+        # 先在主进程里建好清单表，避免多个任务同时建表
+        for out_dir in (image_out, pointcloud_out):
+            ExportManifest(out_dir).close()
+
+    # 按消息大小切块（只读缓存索引，不读取消息数据），有时间范围或抽帧时每个块只读取分给它的 id
+    tasks = []
+    with (recorder or NULL_RECORDER).stage('plan_chunks'):
+        for db3_file, topic_id_dict in split_topic_ids:
+            for topic_name, topic_id in topic_id_dict.items():
+                for min_id, max_id, rowids, nbytes in plan_byte_chunks(db3_file, topic_id, chunk_bytes, start, end, min_interval):
+                    tasks.append((nbytes, db3_file, topic_name, topic_id, min_id, max_id, rowids))
+    # 最大的块最先提交：池中的工作者从共享队列中依次领取，最后剩下的都是小块，尾部的空闲时间最短
+    tasks.sort(key=lambda task: task[0], reverse=True)
+
+    counts = {topic_name: 0 for _, topic_id_dict in split_topic_ids for topic_name in topic_id_dict}
+    skipped = dict.fromkeys(counts, 0)
+    with executor_cls(max_workers=max_workers) as executor:
+        futures = {}
+        for nbytes, db3_file, topic_name, topic_id, min_id, max_id, rowids in tasks:
+            if 'image' in topic_name:
+                export_fn = export_camera_range
+                args = (db3_file, topic_id, topic_name, image_out, image_format, min_id, max_id)
+            else:
+                export_fn = export_lidar_range
+                args = (db3_file, topic_id, topic_name, pointcloud_out, output_format, min_id, max_id)
+            kwargs = {'resume': resume, 'rowids': rowids, 'memory_budget': task_budget}
+            if recorder is not None and executor_type == 'process':
+                future = executor.submit(_run_instrumented, export_fn, args, kwargs, recorder.profile_stage)
+            else:
+                future = executor.submit(export_fn, *args, recorder=recorder, **kwargs)
+            futures[future] = (topic_name, nbytes)
+
+        # 汇总阶段：按完成顺序收集结果，统计每个 topic 的导出数量，进度条按已完成的字节数前进
+        with tqdm(total=sum(task[0] for task in tasks), unit='B', unit_scale=True, unit_divisor=1024,
+                  desc="Processing all chunks") as progress:
+            for future in as_completed(futures):
+                topic_name, nbytes = futures[future]
+                result = future.result()
+                if recorder is not None and executor_type == 'process':
+                    result, snapshot = result
+                    recorder.merge(snapshot)
+                count, skipped_count = result
+                counts[topic_name] += count
+                skipped[topic_name] += skipped_count
+                progress.update(nbytes)
+
+    for topic_name, count in counts.items():
+        if skipped[topic_name]:
+            print(f"{topic_name}: 导出 {count} 个文件，跳过已完成的 {skipped[topic_name]} 条消息")
+        else:
+            print(f"{topic_name}: 导出 {count} 个文件")
+    return counts
@@ -0,0 +1,115 @@
+# 多激光雷达点云融合：按 extrinsics.yaml 中的外参把每个雷达的点云变换到参考坐标系（top 雷达坐标系），
+# 写入一次性分配好的输出数组，并用 uint8 的 source 列记录每个点来自哪个雷达。
+# 以前的 np.vstack 直接把各雷达坐标系下的点拼在一起，几何上是错的，而且会多分配一次内存。
+# 平移量未标定（translation: null）的雷达不会被当成平移为 0：载入时给出警告（strict=True 时报错）。
+import os
+import warnings
+import numpy as np
+import yaml
+
+from calibration import make_transforms, TransformTree
+
+DEFAULT_EXTRINSICS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extrinsics.yaml')
+
+# 合并点云的字段：x, y, z, intensity 与单个雷达的输出一致，source 为来源雷达编号
+FUSED_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('intensity', '<f4'), ('source', 'u1')])
+
+# 旋转矩阵允许的最大正交误差（标定结果只保留了有限位小数）
+ORTHOGONALITY_TOLERANCE = 1e-2
+
+
+def make_transform(rotation, translation):
+    """
+    由 3x3 旋转矩阵和平移向量构建 4x4 齐次变换矩阵。旋转矩阵会被投影到最近的正交矩阵上。
+    """
+    rotation = np.asarray(rotation, dtype=np.float64)
+    translation = np.asarray(translation, dtype=np.float64)
+    if rotation.shape != (3, 3) or translation.shape != (3,):
+        raise ValueError(f"外参形状错误: rotation {rotation.shape}, translation {translation.shape}")
+    error = np.abs(rotation @ rotation.T - np.eye(3)).max()
+    if error > ORTHOGONALITY_TOLERANCE or np.linalg.det(rotation) <= 0:
+        raise ValueError(f"不是有效的旋转矩阵（正交误差 {error:.3g}）:\n{rotation}")
+    u, _, vt = np.linalg.svd(rotation)
+    return make_transforms(u @ vt, translation)
+
+
+def load_extrinsics(extrinsics_file=DEFAULT_EXTRINSICS_FILE, strict=False):
+    """
+    读取外参配置。translation 为 null 或没有填写表示平移量未标定。
+    参数:
+        strict: 为 True 时有未标定平移量的雷达直接报错；为 False 时给出警告，这些雷达只做旋转
+    返回:
+        {topic_name: (source, 4x4 变换矩阵)}，变换把雷达坐标系下的点变换到参考坐标系
+    """
+    with open(extrinsics_file, 'r') as f:
+        config = yaml.safe_load(f)
+
+    extrinsics = {}
+    sources = set()
+    unknown = []
+    for topic_name, lidar in config['lidars'].items():
+        source = int(lidar['source'])
+        if not 0 <= source <= 255 or source in sources:
+            raise ValueError(f"{topic_name} 的 source 编号 {source} 无效或重复")
+        sources.add(source)
+        translation = lidar.get('translation')
+        if translation is None:
+            unknown.append(topic_name)
+        try:
+            transform = make_transform(lidar['rotation'], np.zeros(3) if translation is None else translation)
+        except ValueError as e:
+            raise ValueError(f"{extrinsics_file} 中 {topic_name} 的外参无效: {e}") from e
+        extrinsics[topic_name] = (source, transform)
+
+    if unknown:
+        message = f"{extrinsics_file} 中这些雷达的平移量未标定（translation 为 null）: {unknown}"
+        if strict:
+            raise ValueError(message)
+        warnings.warn(message + "，合并点云中它们只做旋转，位置会偏差一个未知的安装距离", stacklevel=2)
+    return extrinsics
+
+
+def fuse_pointclouds(clouds, extrinsics):
+    """
+    把多个雷达的点云变换到参考坐标系并合并，每帧只分配一次输出数组。
+    参数:
+        clouds: [(topic_name, points)]，points 为 (N, 4) 的 float32 数组（x, y, z, intensity）
+        extrinsics: load_extrinsics 的返回值
+    返回:
+        FUSED_DTYPE 的结构化数组（x, y, z, intensity, source）
+    """
+    missing = [topic_name for topic_name, _ in clouds if topic_name not in extrinsics]
+    if missing:
+        raise ValueError(f"外参配置中没有这些雷达: {missing}")
+
+    total = sum(points.shape[0] for _, points in clouds)
+    fused = np.empty(total, dtype=FUSED_DTYPE)
+    # x, y, z 在结构化数组中是连续的三个 float32，可以看作一个 (N, 3) 的跨步视图，直接作为矩阵乘法的输出
+    xyz = np.ndarray((total, 3), dtype='<f4', buffer=fused, strides=(FUSED_DTYPE.itemsize, 4))
+
+    start = 0
+    for topic_name, points in clouds:
+        source, transform = extrinsics[topic_name]
+        end = start + points.shape[0]
+        rotation = transform[:3, :3].astype(np.float32)
+        translation = transform[:3, 3].astype(np.float32)
+        np.matmul(points[:, :3], rotation.T, out=xyz[start:end])
+        xyz[start:end] += translation
+        fused['intensity'][start:end] = points[:, 3]
+        fused['source'][start:end] = source
+        start = end
+    return fused
+
+
+def load_transform_tree(extrinsics_file=DEFAULT_EXTRINSICS_FILE):
+    """
+    把外参配置载入 calibration.TransformTree：根坐标系为配置中的 reference_frame，每个雷达 topic 是它的子坐标系。
+    组合后的 雷达 -> 雷达 / 雷达 -> 参考坐标系 变换由 TransformTree 缓存。
+    """
+    with open(extrinsics_file, 'r') as f:
+        reference_frame = yaml.safe_load(f)['reference_frame']
+    tree = TransformTree(reference_frame)
+    for topic_name, (_, transform) in load_extrinsics(extrinsics_file).items():
+        if topic_name != reference_frame:
+            tree.set_transform(topic_name, reference_frame, transform)
+    return tree
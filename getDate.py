@@ -1,6 +1,6 @@
 import sqlite3  
 import cv2
-import numpy as np
+from image_io import decode_image
 
 def export_data_column(db3_file, table_name, column_name, topic_id):  
     conn = sqlite3.connect(db3_file)  
@@ -17,28 +17,15 @@ def export_data_column(db3_file, table_name, column_name, topic_id):
         print(f"Processing record ID: {record_id}, data type: {type(data)}")  # 确认数据类型为 bytes
         # print(data[:50])
         # break
-        # 将字节数据转换为 NumPy 数组
-        np_data = np.frombuffer(data, np.uint8)
-
-        # 查找JPEG文件头
-        start_idx = np_data.tobytes().find(b'\xff\xd8')
-        end_idx = np_data.tobytes().rfind(b'\xff\xd9') + 2
+        # 按 CDR 解析 CompressedImage（或原始 Image）并解码，得到 BGR 图像
+        image = decode_image(data)
         
-        if start_idx != -1 and end_idx != -1:
-            # 提取JPEG数据部分
-            jpeg_data = np_data[start_idx:end_idx]
-            image = cv2.imdecode(jpeg_data, cv2.IMREAD_COLOR)  
-            
-            if image is not None:
-                output_filename = f'./images/image_{record_id}.png'
-                # 转换 BGR 到 RGB
-                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                cv2.imwrite(output_filename, image_rgb)  # 保存为PNG 
-                print(f"Image saved successfully as {output_filename}, size: {image.shape[1]}x{image.shape[0]}")
-            else:
-                print(f"Failed to decode image for record ID {record_id}")
+        if image is not None:
+            output_filename = f'./images/image_{record_id}.png'
+            cv2.imwrite(output_filename, image)  # 保存为PNG 
+            print(f"Image saved successfully as {output_filename}, size: {image.shape[1]}x{image.shape[0]}")
         else:
-            print(f"JPEG markers not found for record ID {record_id}")
+            print(f"Failed to decode image for record ID {record_id}")
   
     conn.close()  
   
@@ -1,21 +1,6 @@
 import sqlite3
-import struct
-import numpy as np
 import open3d as o3d
-
-def parse_pointcloud2(data):
-    header_size = 56  # ROS2中Header的长度
-    point_step = 16   # 假设每个点包含XYZ和intensity（4个float）
-    num_points = (len(data) - header_size) // point_step
-    
-    points = []
-    for i in range(num_points):
-        offset = header_size + i * point_step
-        # 假设点云数据是小端（<）并包含4个float字段：x, y, z, intensity
-        intensity, x, y, z  = struct.unpack_from('<ffff', data, offset)
-        points.append([x, y, z, intensity])
-    
-    return np.array(points)
+from pointcloud2 import pointcloud2_to_xyzi
 
 def export_lidar_data(db3_file, table_name, column_name, topic_id):
     conn = sqlite3.connect(db3_file)
@@ -29,7 +14,7 @@ def export_lidar_data(db3_file, table_name, column_name, topic_id):
         record_id, data = row
         print(f"正在处理记录ID: {record_id}, 数据类型: {type(data)}")
         if isinstance(data, bytes):
-            points = parse_pointcloud2(data)
+            points = pointcloud2_to_xyzi(data)
             print(f"从记录ID {record_id} 中解析出 {points.shape[0]} 个点")
             
             if points.size > 0:
@@ -1,21 +1,6 @@
 import sqlite3
-import struct
-import numpy as np
 import open3d as o3d  # 可视化和处理点云（需要安装 open3d）
-
-def parse_pointcloud2(data):
-    header_size = 56  # ROS2中Header的长度，通常是56字节
-    point_step = 16   # 每个点的数据长度（假设为XYZI）
-    num_points = (len(data) - header_size) // point_step
-    
-    points = []
-    for i in range(num_points):
-        offset = header_size + i * point_step
-        # 假设点云数据是小端（<）并包含4个float字段：x, y, z, intensity
-        x, y, z, intensity = struct.unpack_from('<ffff', data, offset)
-        points.append([x, y, z, intensity])
-    
-    return np.array(points)
+from pointcloud2 import pointcloud2_to_xyzi
 
 def export_lidar_data(db3_file, table_name, column_name, topic_id):
     conn = sqlite3.connect(db3_file)
@@ -30,7 +15,7 @@ def export_lidar_data(db3_file, table_name, column_name, topic_id):
         print(f"Processing record ID: {record_id}, data type: {type(data)}")
 
         if isinstance(data, bytes):
-            points = parse_pointcloud2(data)
+            points = pointcloud2_to_xyzi(data)
             print(f"Parsed {points.shape[0]} points from record ID {record_id}")
             
             if points.size > 0:
@@ -1,15 +1,6 @@
 import sqlite3
-import struct
-import numpy as np
 import open3d as o3d
-
-def parse_fixed_format_pointcloud(data, point_step, num_points):
-    points = []
-    for i in range(num_points):
-        offset = i * point_step
-        x, y, z, intensity = struct.unpack_from('ffff', data, offset)
-        points.append([x, y, z])
-    return np.array(points)
+from pointcloud2 import pointcloud2_to_xyzi
 
 def export_lidar_data(db3_file, table_name, column_name, topic_id):
     conn = sqlite3.connect(db3_file)
@@ -23,12 +14,8 @@ def export_lidar_data(db3_file, table_name, column_name, topic_id):
         record_id, data = row
         print(f"Processing record ID: {record_id}, data type: {type(data)}, data size: {len(data)} bytes")
 
-        # 假设点云数据的格式是固定的
-        header_size = 56
-        point_step = 16  # 4个float32: x, y, z, intensity
-        num_points = (len(data) - header_size) // point_step
-
-        points = parse_fixed_format_pointcloud(data[header_size:], point_step, num_points)
+        # 按消息头部中的 fields / point_step 解析，只保留 XYZ
+        points = pointcloud2_to_xyzi(data)[:, :3]
 
         if points.size > 0:
             point_cloud = o3d.geometry.PointCloud()
@@ -1,23 +1,7 @@
 import sqlite3
-import struct
 import numpy as np
 import open3d as o3d
-
-def parse_pointcloud2(data, height, width, point_step, fields):
-    points = []
-    for row in range(height):
-        for col in range(width):
-            offset = row * width * point_step + col * point_step
-            point = []
-            for field in fields:
-                field_offset = offset + field['offset']
-                if field['datatype'] == 7:  # FLOAT32
-                    value = struct.unpack_from('f', data, field_offset)[0]
-                # 其他数据类型可以在这里扩展
-                point.append(value)
-            points.append(point)
-    
-    return np.array(points)
+from pointcloud2 import parse_pointcloud2_header, pointcloud2_to_xyzi
 
 def export_lidar_data(db3_file, table_name, column_name, topic_id):
     conn = sqlite3.connect(db3_file)
@@ -31,26 +15,21 @@ def export_lidar_data(db3_file, table_name, column_name, topic_id):
         record_id, data = row
         print(f"Processing record ID: {record_id}, data type: {type(data)}, data size: {len(data)} bytes")
 
-        header_size = 56  # 确定的头部长度
-        height, width, point_step, row_step = 15750, 5, 16, 80
-        
-        fields = [
-            {'name': 'x', 'offset': 0, 'datatype': 7, 'count': 1},
-            {'name': 'y', 'offset': 4, 'datatype': 7, 'count': 1},
-            {'name': 'z', 'offset': 8, 'datatype': 7, 'count': 1},
-            {'name': 'intensity', 'offset': 12, 'datatype': 7, 'count': 1}
-        ]
-        
+        # height, width, point_step, row_step 和 fields 都从消息头部读取
+        header = parse_pointcloud2_header(data)
+        print(f"height: {header['height']}, width: {header['width']}, point_step: {header['point_step']}, row_step: {header['row_step']}")
+        print(f"fields: {header['fields']}")
+
         # 解析点云数据
-        points = parse_pointcloud2(data[header_size:], height, width, point_step, fields)
+        points = pointcloud2_to_xyzi(data, header)
         print(f"Parsed points shape: {points.shape}")
         
         if points.size > 0:
             point_cloud = o3d.geometry.PointCloud()
-            point_cloud.points = o3d.utility.Vector3dVector(points[:, 1:4])  # 使用 XYZ 坐标
+            point_cloud.points = o3d.utility.Vector3dVector(points[:, :3])  # 使用 XYZ 坐标
             
             # 将 intensity 转换为颜色（灰度）
-            intensity_normalized = (points[:, 0:1] - points[:, 0:1].min()) / (points[:, 0:1].max() - points[:, 0:1].min())
+            intensity_normalized = (points[:, 3:4] - points[:, 3:4].min()) / (points[:, 3:4].max() - points[:, 3:4].min())
             colors = np.repeat(intensity_normalized, 3, axis=1)  # 将 intensity 重复三次，作为 RGB 三个通道的值
             point_cloud.colors = o3d.utility.Vector3dVector(colors)
 
@@ -1,17 +1,14 @@
 import sqlite3
-import numpy as np
 import open3d as o3d
+from pointcloud2 import pointcloud2_to_xyzi
 
-def extract_pointcloud_from_data(data, num_points):
-    # 获取最后 m 个点的数据
-    point_data = data[-num_points*16:]
-    
-    # 将二进制数据转换为 float32 数组，并 reshape 成 (n, 4) 形状
-    points = np.frombuffer(point_data, dtype=np.float32).reshape(-1, 4)
+def extract_pointcloud_from_data(data):
+    # 根据消息头部解析点云，得到 (n, 4) 的 x, y, z, intensity 数组
+    points = pointcloud2_to_xyzi(data)
     print(points)
     return points
 
-def export_lidar_data(db3_file, table_name, column_name, topic_id, num_points):
+def export_lidar_data(db3_file, table_name, column_name, topic_id):
     conn = sqlite3.connect(db3_file)
     cursor = conn.cursor()
 
@@ -23,7 +20,7 @@ def export_lidar_data(db3_file, table_name, column_name, topic_id, num_points):
         record_id, data = row
         print(f"Processing record ID: {record_id}, data type: {type(data)}, data size: {len(data)} bytes")
 
-        points = extract_pointcloud_from_data(data, num_points)
+        points = extract_pointcloud_from_data(data)
         print(f"Parsed points shape: {points.shape}")
         
         if points.size > 0:
@@ -46,5 +43,4 @@ def export_lidar_data(db3_file, table_name, column_name, topic_id, num_points):
 # 使用示例
 db3_file = 'mini_0.db3'  # 你的 .db3 文件路径
 topic_id = 2  # 激光雷达数据对应的 topic_id
-num_points = 10000  # 你预计每帧点云的点数，根据你的数据调整
-export_lidar_data(db3_file, 'messages', 'data', topic_id, num_points)
+export_lidar_data(db3_file, 'messages', 'data', topic_id)
@@ -1,42 +1,8 @@
 import sqlite3
-import struct
-import numpy as np
+from pointcloud2 import pointcloud2_to_xyzi
+from pcd_io import save_pointcloud
 
-def parse_pointcloud2(data):
-    header_size = 56  # ROS2中Header的长度
-    point_step = 16   # 假设每个点包含XYZ和intensity（4个float）
-    num_points = (len(data) - header_size) // point_step
-    points = []
-    for i in range(num_points):
-        offset = header_size + i * point_step
-        # 假设点云数据是小端（<）并包含4个float字段：x, y, z, intensity
-        intensity, x, y, z  = struct.unpack_from('<ffff', data, offset)
-        points.append([x, y, z, intensity])
-    
-    return np.array(points)
-
-def save_pcd(points, filename):
-    num_points = points.shape[0]
-    header = (
-        f"# .PCD v0.7 - Point Cloud Data file format\n"
-        f"VERSION 0.7\n"
-        f"FIELDS x y z intensity\n"
-        f"SIZE 4 4 4 4\n"
-        f"TYPE F F F F\n"
-        f"COUNT 1 1 1 1\n"
-        f"WIDTH {num_points}\n"
-        f"HEIGHT 1\n"
-        f"VIEWPOINT 0 0 0 1 0 0 0\n"
-        f"POINTS {num_points}\n"
-        f"DATA ascii\n"
-    )
-    
-    with open(filename, 'w') as f:
-        f.write(header)
-        for point in points:
-            f.write(f"{point[0]} {point[1]} {point[2]} {point[3]}\n")
-
-def export_lidar_data(db3_file, table_name, column_name, topic_id):
+def export_lidar_data(db3_file, table_name, column_name, topic_id, output_format='binary'):
     conn = sqlite3.connect(db3_file)
     cursor = conn.cursor()
 
@@ -49,12 +15,11 @@ def export_lidar_data(db3_file, table_name, column_name, topic_id):
         print(f"正在处理记录ID: {record_id}, 数据类型: {type(data)}")
         if isinstance(data, bytes):
             print("data is bytes ")
-            points = parse_pointcloud2(data)
+            points = pointcloud2_to_xyzi(data)
             print(f"从记录ID {record_id} 中解析出 {points.shape[0]} 个点")
             
             if points.size > 0:
-                output_filename = f'./pointclouds/pointcloud_{topic_id}_{record_id}.pcd'
-                save_pcd(points, output_filename)
+                output_filename = save_pointcloud(points, f'./pointclouds/pointcloud_{topic_id}_{record_id}', output_format)
                 print(f"点云成功保存为 {output_filename}, 点数: {points.shape[0]}")
             else:
                 print(f"无法解析记录ID {record_id} 的点云")
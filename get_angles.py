@@ -1,60 +1,10 @@
 # 根据输入的旋转矩阵，计算对应的欧拉角（Z-Y-X顺序）。
 
 import numpy as np
+from calibration import rotation_matrix_to_euler_angles
 
-def rotation_matrix_to_euler_angles(R):
-    """
-    将旋转矩阵转换为欧拉角（Z-Y-X顺序）。
-    参数:
-        R: 3x3的旋转矩阵
-    返回:
-        欧拉角（roll, pitch, yaw），单位为弧度
-    """
-    assert R.shape == (3, 3), "输入的旋转矩阵必须是3x3的矩阵"
-    
-    sy = np.sqrt(R[0, 0] ** 2 + R[1, 0] ** 2)
-
-    singular = sy < 1e-6
-
-    if not singular:
-        roll = np.arctan2(R[2, 1], R[2, 2])
-        pitch = np.arctan2(-R[2, 0], sy)
-        yaw = np.arctan2(R[1, 0], R[0, 0])
-    else:
-        roll = np.arctan2(-R[1, 2], R[1, 1])
-        pitch = np.arctan2(-R[2, 0], sy)
-        yaw = 0
-
-    return roll, pitch, yaw
-
-import numpy as np
-
-def rotation_matrix_to_euler_angles_xyz(R):
-    """
-    将旋转矩阵转换为欧拉角（X-Y-Z顺序）。
-    参数:
-        R: 3x3的旋转矩阵
-    返回:
-        欧拉角（roll, pitch, yaw），单位为弧度
-    """
-    assert R.shape == (3, 3), "输入的旋转矩阵必须是3x3的矩阵"
-    
-    # 判断奇异性
-    sy = np.sqrt(R[0, 0] ** 2 + R[0, 1] ** 2)
-    
-    singular = sy < 1e-6
-
-    if not singular:
-        roll = np.arctan2(R[2, 1], R[2, 2])
-        pitch = np.arctan2(-R[2, 0], sy)
-        yaw = np.arctan2(R[1, 0], R[0, 0])
-    else:
-        roll = np.arctan2(-R[1, 2], R[1, 1])
-        pitch = np.arctan2(-R[2, 0], sy)
-        yaw = 0
-
-    return roll, pitch, yaw
-
+# 旋转矩阵 -> 欧拉角的转换在 calibration.py 中，支持 (N, 3, 3) 的批量输入，order 可选 'ZYX' 或 'XYZ'。
+# 注意：原来的 rotation_matrix_to_euler_angles_xyz 实际套用的是 ZYX 的公式，下面 "back 24" 的注释结果是用它算的。
 
 
 # 示例旋转矩阵
@@ -92,7 +42,7 @@ R = np.array([[0.999986,0.00523596,0],
 # Yaw (Z-axis rotation): -0.09424776301714366
 
 # 计算欧拉角
-# roll, pitch, yaw = rotation_matrix_to_euler_angles(R)
+# roll, pitch, yaw = rotation_matrix_to_euler_angles(R, order='ZYX')
 
 # print("Roll (X-axis rotation):", roll)
 # print("Pitch (Y-axis rotation):", pitch)
@@ -120,8 +70,9 @@ R = np.array([[0.999989,-0.00467932,4.02439e-05],
 # Roll (X-axis rotation): 0.0086001761763938
 # Pitch (Y-axis rotation): -0.0
 # Yaw (Z-axis rotation): 0.004679507317702825
-# 计算欧拉角
-roll, pitch, yaw = rotation_matrix_to_euler_angles_xyz(R)
+# 计算欧拉角；上面记录的结果都是 'ZYX' 顺序，需要 X-Y-Z 顺序的欧拉角时改成 'XYZ'
+order = 'ZYX'
+roll, pitch, yaw = rotation_matrix_to_euler_angles(R, order=order)
 
 print("Roll (X-axis rotation):", roll)
 print("Pitch (Y-axis rotation):", pitch)
@@ -1,108 +1,55 @@
-import sqlite3
-import struct
-import numpy as np
 import os 
-import cv2
 import time
-from tqdm import tqdm
+from bag_reader import connect_readonly, ensure_topic_timestamp_index, select_timestamps
+from bag_index import load_bag_index, topic_entry
+from export_workers import export_lidar_range, export_camera_range, sensor_output_dir
+from instrumentation import Recorder
 
-def parse_pointcloud2(data):
-    header_size = 56  # ROS2中Header的长度
-    point_step = 16   # 假设每个点包含XYZ和intensity（4个float）
-    num_points = (len(data) - header_size) // point_step
-    points = []
-    for i in range(num_points):
-        offset = header_size + i * point_step
-        # 假设点云数据是小端（<）并包含4个float字段：x, y, z, intensity
-        intensity, x, y, z  = struct.unpack_from('<ffff', data, offset)
-        points.append([x, y, z, intensity])
-    
-    return np.array(points)
-
-def save_pcd(points, filename):
-    num_points = points.shape[0]
-    header = (
-        f"# .PCD v0.7 - Point Cloud Data file format\n"
-        f"VERSION 0.7\n"
-        f"FIELDS x y z intensity\n"
-        f"SIZE 4 4 4 4\n"
-        f"TYPE F F F I\n"
-        f"COUNT 1 1 1 1\n"
-        f"WIDTH {num_points}\n"
-        f"HEIGHT 1\n"
-        f"VIEWPOINT 0 0 0 1 0 0 0\n"
-        f"POINTS {num_points}\n"
-        f"DATA ascii\n"
-    )
-    
-    with open(filename, 'w') as f:
-        f.write(header)
-        for point in points:
-            f.write(f"{point[0]} {point[1]} {point[2]} {point[3]}\n")
-
-def export_lidar_data(cursor, table_name, column_name, column_stamp, topic_id, lidar_name, out_file='./pointcloud'):
-    lidar_name = lidar_name.split("/")[-1]
-    output_file = os.path.join(out_file, lidar_name)
-    # 检查目录是否存在，如果不存在则创建  
-    if not os.path.exists(output_file):  
-        os.makedirs(output_file)  
-
-    query = f"SELECT id, {column_name}, {column_stamp} FROM {table_name} WHERE topic_id = {topic_id};"
-    cursor.execute(query)
-    rows = cursor.fetchall()
+# 每个 topic 用一条 读取 → 解码 → 写出 流水线导出（见 pipeline.py）：解码线程数等于 CPU 核数，写出使用单独的线程池
+decode_workers = os.cpu_count()
+write_workers = 4
+# 每条流水线中同时存在的数据量上限（字节），见 pipeline.MemoryBudget
+memory_budget = 512 << 20
+# 各阶段（SQLite 读取、解析/解码、写出）的耗时和字节数统计，见 instrumentation.py；Recorder(profile_stage='parse_pointcloud') 可以剖析单个阶段
+recorder = Recorder()
 
-    for row in tqdm(rows, desc=f'Processing Lidar {lidar_name}'):
-        record_id, data, timestamp = row
-        if isinstance(data, bytes):
-            points = parse_pointcloud2(data)
-            if points.size > 0:
-                output_filename = os.path.join(output_file, f'{lidar_name}_{timestamp}.pcd')
-                save_pcd(points, output_filename)
-            else:
-                print(f"无法解析记录ID {record_id} 的点云")
-        else:
-            print(f"记录ID {record_id} 的数据不是字节格式。")
+def select_rowids(db3_file, topic_id, start=None, end=None, min_interval=None):
+    # 在缓存索引上按时间范围和抽帧间隔选出要导出的消息 id；不筛选时返回 None（按 id 顺序导出全部消息）
+    entry = topic_entry(load_bag_index(db3_file), topic_id)
+    if start is None and end is None and not min_interval:
+        return None, len(entry['timestamps'])
+    rowids = entry['rowids'][select_timestamps(entry['timestamps'], start, end, min_interval)]
+    return rowids.tolist(), len(rowids)
 
-def export_data_column(cursor, table_name, column_name, column_stamp, topic_id, carm_name, out_file = './images'):
-    
-    carm_name = carm_name.split("/")[-1]
-    output_file = os.path.join(out_file, carm_name)
-    # 检查目录是否存在，如果不存在则创建  
-    if not os.path.exists(output_file):  
-        os.makedirs(output_file)  
-
-    query = f"SELECT id, {column_name}, {column_stamp} FROM {table_name} WHERE topic_id = {topic_id};"
-    cursor.execute(query)
-    rows = cursor.fetchall()  
-  
-    for row in tqdm(rows, desc=f'Processing Camera {carm_name}'):  
-        record_id, data, timestamp = row
-        np_data = np.frombuffer(data, np.uint8)
+def export_lidar_data(db3_file, table_name, column_name, column_stamp, topic_id, lidar_name, out_file='./pointcloud', output_format='binary',
+                      start=None, end=None, min_interval=None):
+    rowids, total = select_rowids(db3_file, topic_id, start, end, min_interval)
+    return export_lidar_range(db3_file, topic_id, lidar_name, out_file, output_format,
+                              table_name=table_name, column_name=column_name, column_stamp=column_stamp,
+                              decode_workers=decode_workers, write_workers=write_workers,
+                              desc=f'Processing Lidar {lidar_name.split("/")[-1]}', total=total, rowids=rowids, recorder=recorder,
+                              memory_budget=memory_budget)
 
-        start_idx = np_data.tobytes().find(b'\xff\xd8')
-        end_idx = np_data.tobytes().rfind(b'\xff\xd9') + 2
-        
-        if start_idx != -1 and end_idx != -1:
-            jpeg_data = np_data[start_idx:end_idx]
-            image = cv2.imdecode(jpeg_data, cv2.IMREAD_COLOR)  
+def export_data_column(db3_file, table_name, column_name, column_stamp, topic_id, carm_name, out_file = './images', image_format='png',
+                       start=None, end=None, min_interval=None):
+    rowids, total = select_rowids(db3_file, topic_id, start, end, min_interval)
+    return export_camera_range(db3_file, topic_id, carm_name, out_file, image_format,
+                               table_name=table_name, column_name=column_name, column_stamp=column_stamp,
+                               decode_workers=decode_workers, write_workers=write_workers,
+                               desc=f'Processing Camera {carm_name.split("/")[-1]}', total=total, rowids=rowids, recorder=recorder,
+                               memory_budget=memory_budget)
   
-            if image is not None:
-                output_filename = os.path.join(output_file, f'{carm_name}_{timestamp}.png')
-                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                cv2.imwrite(output_filename, image_rgb)
-            else:
-                print(f"Failed to decode image for record ID {record_id}")
-        else:
-            print(f"JPEG markers not found for record ID {record_id}")
-  
-def get_topic_id(cursor, topic_name_list):
+def get_topic_id(db3_file, topic_name_list):
     results_dict = {}
+    conn = connect_readonly(db3_file)
+    cursor = conn.cursor()
     for topic_name in topic_name_list:
         query = "SELECT id FROM topics WHERE name = ?;"
         cursor.execute(query, (topic_name,))
         result = cursor.fetchone()
         results_dict[topic_name] = result[0]
     
+    conn.close()
     if results_dict:
         return results_dict
     else:
@@ -127,19 +74,29 @@ topic_name_list =[
             '/image5',
             '/image6',
             ]
+# 只导出一段时间（纳秒时间戳，闭区间）并按最小间隔（秒）抽帧，None 表示不限制
+start, end, min_interval = None, None, None
 
-conn = sqlite3.connect(db3_file)  
-cursor = conn.cursor()  
+# 导出按消息 id 读取，不需要 (topic_id, timestamp) 索引；需要时设成 'sidecar'（在旁边的副本上建索引），
+# 'inplace' 会修改原始数据包，只在明确需要时使用
+index_mode = 'none'
+db3_file = ensure_topic_timestamp_index(db3_file, index_mode=index_mode)
 
-topic_id_dict = get_topic_id(cursor, topic_name_list)
+topic_id_dict = get_topic_id(db3_file, topic_name_list)
 print(topic_id_dict)
+# 输出目录提前全部创建好
+for sensor_topic_name in topic_id_dict:
+    sensor_output_dir('./calib_lidar2img/004/images' if 'image' in sensor_topic_name else './calib_lidar2img/004/pointclouds', sensor_topic_name)
 for sensor_topic_name, sensor_topic_id in topic_id_dict.items():
     if 'image' in sensor_topic_name:
-        export_data_column(cursor, 'messages', 'data','timestamp', sensor_topic_id, sensor_topic_name, out_file='./calib_lidar2img/004/images' )
+        export_data_column(db3_file, 'messages', 'data','timestamp', sensor_topic_id, sensor_topic_name, out_file='./calib_lidar2img/004/images',
+                           start=start, end=end, min_interval=min_interval)
     else:
-        export_lidar_data(cursor, 'messages', 'data','timestamp', sensor_topic_id, sensor_topic_name, out_file='./calib_lidar2img/004/pointclouds')
-
-conn.close()
+        export_lidar_data(db3_file, 'messages', 'data','timestamp', sensor_topic_id, sensor_topic_name, out_file='./calib_lidar2img/004/pointclouds',
+                          start=start, end=end, min_interval=min_interval)
 
 end_time = time.time()
 print(f"Total time taken: {end_time - start_time:.2f} seconds")
+recorder.print_summary()
+recorder.dump_json('./calib_lidar2img/004/stage_stats.json')
+recorder.dump_chrome_trace('./calib_lidar2img/004/trace.json')
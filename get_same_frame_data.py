@@ -1,199 +1,274 @@
 # 从ros2 录制的数据包里面，解析出图像和点云数据，并找到时间戳最近的不同传感器帧，如果超过不同传感器之间的时间戳差值超过阈值，就跳过。
 # 同时设置了保存时间间隔，每隔0.33秒保存一次。
-import sqlite3
+# 保存目录下的导出清单（export_manifest.py）记录每一帧中已经完成的输出，中断后重新运行只补齐没有完成的部分。
+# output_layout='shards' 时不再每帧建一个目录，而是把每帧的所有输出和元数据打包追加到大小有上限的 tar 分片中（见 shard_io.py）。
 import numpy as np
 import os
-import cv2
 import time
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor
-from numba import jit
-
-@jit(nopython=True)
-def parse_pointcloud2(data):
-    header_size = 56  # ROS2中Header的长度
-    point_step = 16   # 假设每个点包含XYZ和intensity（4个float）
-    num_points = (len(data) - header_size) // point_step
-    points = np.empty((num_points, 4), dtype=np.float32)
-    
-    for i in range(num_points):
-        offset = header_size + i * point_step
-        # 手动解析4个float字段：x, y, z, intensity
-        intensity = np.frombuffer(data[offset:offset+4], dtype=np.float32)[0]
-        x = np.frombuffer(data[offset+4:offset+8], dtype=np.float32)[0]
-        y = np.frombuffer(data[offset+8:offset+12], dtype=np.float32)[0]
-        z = np.frombuffer(data[offset+12:offset+16], dtype=np.float32)[0]
-        
-        points[i, 0] = x
-        points[i, 1] = y
-        points[i, 2] = z
-        points[i, 3] = intensity
-    
-    return points
-
-def save_pcd(points, filename):
-    num_points = points.shape[0]
-    header = (
-        f"# .PCD v0.7 - Point Cloud Data file format\n"
-        f"VERSION 0.7\n"
-        f"FIELDS x y z intensity\n"
-        f"SIZE 4 4 4 4\n"
-        f"TYPE F F F F\n"
-        f"COUNT 1 1 1 1\n"
-        f"WIDTH {num_points}\n"
-        f"HEIGHT 1\n"
-        f"VIEWPOINT 0 0 0 1 0 0 0\n"
-        f"POINTS {num_points}\n"
-        f"DATA ascii\n"
-    )
-    
-    with open(filename, 'w') as f:
-        f.write(header)
-        for point in points:
-            f.write(f"{point[0]} {point[1]} {point[2]} {point[3]}\n")
-
-def save_image(image, filename):
-    cv2.imwrite(filename, image)
-
-def extract_timestamps(cursor, table_name, column_stamp, topic_id):
-    query = f"SELECT {column_stamp} FROM {table_name} WHERE topic_id = {topic_id};"
-    cursor.execute(query)
-    timestamps = [row[0] for row in cursor.fetchall()]
-    return sorted(timestamps)  # 返回排序后的时间戳列表
-
-def find_closest_timestamp(target_timestamp, timestamps, threshold):
-    closest_timestamp = None
-    min_diff = float('inf')
-    
-    for timestamp in timestamps:
-        diff = abs(target_timestamp - timestamp)
-        print(f"diff: {diff}")
-        if diff < min_diff:
-            min_diff = diff
-            closest_timestamp = timestamp
-
-    return closest_timestamp if min_diff <= threshold else None
-
-def export_sensor_data(cursor, table_name, column_name, column_stamp, topic_id, timestamp, sensor_type):
-    query = f"SELECT {column_name} FROM {table_name} WHERE topic_id = {topic_id} AND {column_stamp} = {timestamp};"
-    cursor.execute(query)
+from pointcloud2 import pointcloud2_to_xyzi
+from pcd_io import save_pointcloud, encode_pointcloud
+from bag_reader import BagReader, spacing_indices, select_timestamps, find_closest_indices
+from image_io import prepare_image, write_image, encode_image
+from export_manifest import ExportManifest
+from atomic_io import remove_stale_tmp
+from pipeline import run_pipeline, DEFAULT_MEMORY_BUDGET
+from extrinsics import DEFAULT_EXTRINSICS_FILE, load_extrinsics, fuse_pointclouds
+from instrumentation import Recorder, NULL_RECORDER
+from shard_io import ShardWriter, DEFAULT_SHARD_BYTES, json_member
+
+COMBINED_TOPIC = 'combined_pointclouds'
+# 'folders' 每帧一个目录、每个输出一个文件；'shards' 每帧作为一个样本追加到 tar 分片中
+OUTPUT_LAYOUTS = ('folders', 'shards')
+
+def fetch_sensor_data(cursor, table_name, column_name, record_id):
+    # 读取阶段：按消息 id（主键）取出原始数据，不解码，也不需要 (topic_id, timestamp) 索引
+    cursor.execute(f"SELECT {column_name} FROM {table_name} WHERE id = ?;", (record_id,))
     data = cursor.fetchone()
-    
     if data and isinstance(data[0], bytes):
-        if sensor_type == 'lidar':
-            return parse_pointcloud2(data[0])
-        elif sensor_type == 'camera':
-            np_data = np.frombuffer(data[0], np.uint8)
-            start_idx = np_data.tobytes().find(b'\xff\xd8')
-            end_idx = np_data.tobytes().rfind(b'\xff\xd9') + 2
-            
-            if start_idx != -1 and end_idx != -1:
-                jpeg_data = np_data[start_idx:end_idx]
-                image = cv2.imdecode(jpeg_data, cv2.IMREAD_COLOR)
-                if image is not None:
-                    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                    return image_rgb
+        return data[0]
     return None
 
-def get_topic_id(db3_file, topic_name_list):
-    results_dict = {}
-    conn = sqlite3.connect(db3_file)
-    cursor = conn.cursor()
-
-    for topic_name in topic_name_list:
-        query = "SELECT id FROM topics WHERE name = ?;"
-        cursor.execute(query, (topic_name,))
-        result = cursor.fetchone()
-        if result:
-            results_dict[topic_name] = result[0]
-        else:
-            raise ValueError(f"无法找到指定的topic_name: {topic_name}")
-    
-    conn.close()
-    return results_dict
-
-def process_sensor_data(db3_file, topic_name_list, save_folder, time_threshold=500000000, save_interval=0.33):
-    conn = sqlite3.connect(db3_file)
-    cursor = conn.cursor()
-
-    topic_id_dict = get_topic_id(db3_file, topic_name_list)
-    print(topic_id_dict)
-    top_timestamps = extract_timestamps(cursor, 'messages', 'timestamp', topic_id_dict['/rslidar_points_top'])
-    print(f"共有{len(top_timestamps)}个时间戳")
-    print(top_timestamps)
-    last_save_time = 0    
-    for top_timestamp in top_timestamps:
-        if top_timestamp - last_save_time < save_interval * 1e9:
-            continue
-        closest_timestamps = {}
+def decode_sensor_data(data, sensor_type, image_format='png'):
+    # 解码阶段：点云返回 (N, 4) 数组；相机返回 image_io.prepare_image 的结果，
+    # image_format 为 'jpg' 且消息是 CompressedImage 时是原始压缩数据（不解码），否则是解码后的 BGR 图像
+    if sensor_type == 'lidar':
+        return pointcloud2_to_xyzi(data)
+    return prepare_image(data, image_format)
 
-        all_within_threshold = True  # 是否所有topic的时间戳都在阈值范围内
-        combined_points = []
+def process_sensor_data(bag_path, topic_name_list, save_folder, time_threshold=500000000, save_interval=0.33, output_format='binary', image_format='png', resume=True,
+                        decode_workers=None, write_workers=4, extrinsics_file=DEFAULT_EXTRINSICS_FILE, start=None, end=None,
+                        recorder=None, memory_budget=DEFAULT_MEMORY_BUDGET, output_layout='folders', shard_bytes=DEFAULT_SHARD_BYTES):
+    """
+    bag_path 可以是单个 .db3 文件，也可以是包含 metadata.yaml 的数据包目录。
+    多个分片的时间戳会合并成一个按时间排序的视图，跨分片边界的帧也能同步上。
+    image_format 为 'jpg' 时相机图像直接写出原始 JPEG，不解码。
+    resume 为 True 时，清单中按 (topic, 帧时间戳) 记录的输出已经完成就不再读取和保存，
+    整帧都完成时直接跳过；为 False 时全部重新导出。
+    选中的帧交给 读取 → 解码 → 写出 流水线处理（见 pipeline.py），decode_workers 默认等于 CPU 核数。
+    合并点云按 extrinsics_file 中的外参变换到 top 雷达坐标系后再合并，并带有 uint8 的 source 列（见 extrinsics.py）。
+    start, end 给定时只处理 top 时间戳在 [start, end] 范围内（纳秒）的帧，只加载这段时间附近的时间戳；
+    save_interval 是相邻两个保存帧之间的最小间隔（秒，见 bag_reader.spacing_indices），在时间戳数组上完成，
+    没有选中的帧不会读取消息数据。
+    recorder（见 instrumentation.py）记录时间戳加载、匹配以及流水线各阶段的耗时、字节数和队列深度。
+    memory_budget 限制流水线中同时存在的原始消息、解码结果和合并点云的总字节数（见 pipeline.MemoryBudget），
+    读取线程在额度不足时等待，峰值内存不随帧数和点云大小增长。
+    output_layout 为 'shards' 时每帧的所有雷达、相机、合并点云和一个 JSON 元数据打包成一个样本，
+    顺序追加到 save_folder 下不超过 shard_bytes 的 tar 分片中（见 shard_io.py）；分片写完后整帧才记入清单，
+    中断后重新运行会重做没有写进完整分片的帧。
+    """
+    if output_layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"output_layout 只能是 {OUTPUT_LAYOUTS}，实际为 {output_layout}")
+    sharded = output_layout == 'shards'
+    recorder = recorder or NULL_RECORDER
+    bag = BagReader(bag_path)
+    print(bag.split_files)
 
-        # 遍历所有topic，找到与top_timestamp最接近的时间戳
-        for topic_name, topic_id in topic_id_dict.items():
+    # 每个topic只读取一次时间戳（各分片并行读取），并对所有top帧一次性完成最近邻匹配
+    # 其它 topic 多取阈值范围内的余量，范围边界上的帧也能匹配到
+    with recorder.stage('load_timestamps'):
+        timestamps_by_topic = bag.load_timestamps(topic_name_list,
+                                                  start=None if start is None else start - time_threshold,
+                                                  end=None if end is None else end + time_threshold)
+    top_timestamps, top_splits = timestamps_by_topic['/rslidar_points_top']
+    in_range = select_timestamps(top_timestamps, start, end)
+    top_timestamps, top_splits = top_timestamps[in_range], top_splits[in_range]
+    print(f"共有{len(top_timestamps)}个时间戳")
+
+    with recorder.stage('match_timestamps'):
+        closest_by_topic = {}
+        all_within_threshold = np.ones(top_timestamps.shape, dtype=bool)  # 是否所有topic的时间戳都在阈值范围内
+        for topic_name, (timestamps, splits) in timestamps_by_topic.items():
             print(f"正在处理{topic_name}")
             if topic_name == '/rslidar_points_top':
-                closest_timestamps['/rslidar_points_top'] = top_timestamp
-                # continue
-            closest_timestamp = find_closest_timestamp(top_timestamp, extract_timestamps(cursor, 'messages', 'timestamp', topic_id), time_threshold)
-            print(f"top_timestamp: {top_timestamp}, closest_timestamp: {closest_timestamp}")
-            if closest_timestamp is None:
-                all_within_threshold = False
-                break
-            closest_timestamps[topic_name] = closest_timestamp
-        
-        if all_within_threshold:
-            print("here is closet timestamps: ",closest_timestamps)
-            
+                closest_by_topic[topic_name] = (top_timestamps, top_splits)
+                continue
+            indices, within_threshold = find_closest_indices(top_timestamps, timestamps, time_threshold)
+            if timestamps.size:
+                closest_by_topic[topic_name] = (timestamps[indices], splits[indices])
+            else:
+                closest_by_topic[topic_name] = (np.zeros_like(top_timestamps), np.zeros_like(top_splits))
+            all_within_threshold &= within_threshold
+    print(f"共有{int(all_within_threshold.sum())}个时间戳所有topic都在阈值范围内")
+
+    manifest = ExportManifest(save_folder) if resume else None
+    lidar_topics = [topic_name for topic_name in closest_by_topic if 'rslidar' in topic_name]
+    extrinsics = load_extrinsics(extrinsics_file)
+    missing = [topic_name for topic_name in lidar_topics if topic_name not in extrinsics]
+    if missing:
+        raise ValueError(f"{extrinsics_file} 中没有这些雷达的外参: {missing}")
+
+    def is_done(topic_name, top_timestamp):
+        return manifest is not None and manifest.is_done(topic_name, top_timestamp)
+
+    # 先按阈值和保存间隔选出要保存的帧（向量化），并一次性创建好所有帧的输出目录
+    candidates = np.flatnonzero(all_within_threshold)
+    selected = candidates[spacing_indices(top_timestamps[candidates], save_interval)]
+    frames = []
+    skipped_frames = 0
+    for i in selected.tolist():
+        top_timestamp = int(top_timestamps[i])
+        # 清单中每个输出的键为 (topic, top_timestamp)：同一条消息可能被相邻的两帧同时选中，按帧记录才不会混淆
+        pending = [topic_name for topic_name in closest_by_topic if not is_done(topic_name, top_timestamp)]
+        combined_pending = bool(lidar_topics) and not is_done(COMBINED_TOPIC, top_timestamp)
+        if not pending and not combined_pending:
+            skipped_frames += 1
+            continue
+        if sharded:
+            # 分片中一帧是一个整体，没有完成就整帧重做
+            pending, combined_pending = list(closest_by_topic), bool(lidar_topics)
+        if combined_pending:
+            # 合并点云需要这一帧所有雷达的数据
+            pending += [topic_name for topic_name in lidar_topics if topic_name not in pending]
+        frames.append((i, top_timestamp, pending, combined_pending))
+
+    if sharded:
+        os.makedirs(save_folder, exist_ok=True)
+        remove_stale_tmp(save_folder)
+    else:
+        for _, top_timestamp, _, _ in frames:
             # 将同一时间戳的数据保存到一个文件夹中，以top_timestamp为文件名
             output_folder_same_frame = os.path.join(save_folder, str(top_timestamp))
             os.makedirs(output_folder_same_frame, exist_ok=True)
-            for topic_name, timestamp in closest_timestamps.items():
-                sensor_type = 'lidar' if 'rslidar' in topic_name else 'camera'
-                sensor_data = export_sensor_data(cursor, 'messages', 'data', 'timestamp', topic_id_dict[topic_name], timestamp, sensor_type)
-                sensor_name = topic_name.split('/')[-1]
-
-                if sensor_type == 'lidar' and sensor_data is not None:
-                    combined_points.append(sensor_data)
-                    # output_folder = os.path.join(save_folder, sensor_name)
-                    # os.makedirs(output_folder, exist_ok=True)
-                    output_filename = os.path.join(output_folder_same_frame, f'{sensor_name}_{timestamp}.pcd')
-                    save_pcd(sensor_data, output_filename)
-                elif sensor_type == 'camera' and sensor_data is not None:
-                    # output_folder = os.path.join(save_folder, sensor_name)
-                    # os.makedirs(output_folder, exist_ok=True)
-                    output_filename = os.path.join(output_folder_same_frame, f'{sensor_name}_{timestamp}.png')
-                    save_image(sensor_data, output_filename)
-
-            if combined_points:
-                combined_points = np.vstack(combined_points)  # 合并所有点云数据
-                # output_folder = os.path.join(save_folder, 'combined_pointclouds')
-                # os.makedirs(output_folder, exist_ok=True)
-                combined_filename = os.path.join(output_folder_same_frame, 'combined_pointclouds_'+f'{top_timestamp}.pcd')
-                save_pcd(combined_points, combined_filename)
-            
-            last_save_time = top_timestamp
-
-    conn.close()
+            remove_stale_tmp(output_folder_same_frame)
+    if skipped_frames:
+        print(f"跳过 {skipped_frames} 个已经完成的帧")
+
+    def message_rowid(topic_name, split_index, timestamp):
+        # 在分片的缓存索引（见 bag_index.py）中按时间戳查出消息 id
+        topic = bag.split_index(split_index)['topics'][topic_name]
+        return int(topic['rowids'][np.searchsorted(topic['timestamps'], timestamp)])
+
+    def read_frames():
+        # 读取阶段（流水线的读取线程）：按帧取出各 topic 的原始数据，各分片的连接在这个线程中打开和关闭
+        try:
+            for i, top_timestamp, pending, combined_pending in frames:
+                closest_timestamps = {topic_name: int(closest_by_topic[topic_name][0][i]) for topic_name in pending}
+                print("here is closet timestamps: ",closest_timestamps)
+                messages = []
+                for topic_name, timestamp in closest_timestamps.items():
+                    split_index = int(closest_by_topic[topic_name][1][i])
+                    cursor = bag.connection(split_index).cursor()
+                    data = fetch_sensor_data(cursor, 'messages', 'data', message_rowid(topic_name, split_index, timestamp))
+                    messages.append((topic_name, timestamp, data))
+                yield top_timestamp, messages, combined_pending
+        finally:
+            bag.close()
+
+    def decode_frame(frame):
+        # 解码阶段：解析点云、解码图像并合并点云，每个输出生成一个写出任务
+        top_timestamp, messages, combined_pending = frame
+        output_folder_same_frame = os.path.join(save_folder, str(top_timestamp))
+        tasks = []
+        combined_points = []
+        for topic_name, timestamp, data in messages:
+            if data is None:
+                continue
+            sensor_type = 'lidar' if 'rslidar' in topic_name else 'camera'
+            sensor_data = decode_sensor_data(data, sensor_type, image_format)
+            if sensor_data is None:
+                continue
+            sensor_name = topic_name.split('/')[-1]
+            if sensor_type == 'lidar':
+                combined_points.append((topic_name, sensor_data))
+                if is_done(topic_name, top_timestamp) and not sharded:
+                    continue
+            tasks.append((topic_name, top_timestamp, sensor_type, sensor_data,
+                          os.path.join(output_folder_same_frame, f'{sensor_name}_{timestamp}')))
+        if combined_pending and combined_points:
+            fused_points = fuse_pointclouds(combined_points, extrinsics)  # 变换到 top 雷达坐标系后合并
+            tasks.append((COMBINED_TOPIC, top_timestamp, 'lidar', fused_points,
+                          os.path.join(output_folder_same_frame, 'combined_pointclouds_'+f'{top_timestamp}')))
+        return tasks
+
+    def encode_frame(frame):
+        # 分片模式的解码阶段：解析、编码好整帧的所有输出（PCD / 图像编码都在解码线程中并行完成），生成一个写出任务
+        top_timestamp, messages, _ = frame
+        members = []
+        topics = []
+        metadata = {'top_timestamp': top_timestamp, 'timestamps': {}, 'files': {}}
+        for topic_name, _, sensor_type, sensor_data, _ in decode_frame(frame):
+            if sensor_type == 'lidar':
+                extension, chunks = encode_pointcloud(sensor_data, output_format)
+            else:
+                encoded = encode_image(sensor_data)
+                if encoded is None:
+                    continue
+                extension, payload = encoded
+                chunks = [payload]
+            suffix = f"{topic_name.split('/')[-1]}.{extension}"
+            members.append((suffix, chunks))
+            topics.append(topic_name)
+            metadata['files'][topic_name] = suffix
+        for topic_name, timestamp, data in messages:
+            if data is not None:
+                metadata['timestamps'][topic_name] = timestamp
+        members.append(('json', json_member(metadata)))
+        return [(top_timestamp, members, topics)]
+
+    frame_topics = {}
+
+    def write_sample(task):
+        # 分片模式的写出阶段：整帧顺序追加到当前分片，分片写完后才记入清单（见 on_shard_closed）
+        top_timestamp, members, topics = task
+        frame_topics[str(top_timestamp)] = topics
+        shard_writer.write_sample(top_timestamp, members)
+
+    def on_shard_closed(shard_file, keys):
+        if manifest is not None:
+            manifest.mark_done_many([(topic_name, int(key), shard_file) for key in keys for topic_name in frame_topics.pop(key)])
+
+    def write_output(task):
+        # 写出阶段：保存文件（先写临时文件再改名），然后记录到清单
+        topic_name, top_timestamp, sensor_type, sensor_data, filename_stem = task
+        if sensor_type == 'lidar':
+            output_filename = save_pointcloud(sensor_data, filename_stem, output_format)
+        else:
+            output_filename = write_image(sensor_data, filename_stem)
+        if manifest is not None and output_filename:
+            manifest.mark_done(topic_name, top_timestamp, output_filename)
+        return output_filename
+
+    shard_writer = ShardWriter(save_folder, shard_bytes, on_shard_closed=on_shard_closed) if sharded else None
+    try:
+        run_pipeline(read_frames(), encode_frame if sharded else decode_frame, write_sample if sharded else write_output,
+                     decode_workers, write_workers, desc='Saving frames', total=len(frames), recorder=recorder,
+                     stage_names=('fetch_frame', 'decode_frame', 'write_output'), memory_budget=memory_budget)
+        if shard_writer is not None:
+            shard_writer.close()
+    except BaseException:
+        if shard_writer is not None:
+            shard_writer.abort()
+        raise
+    finally:
+        if manifest is not None:
+            manifest.close()
 
 # 使用示例
-db3_file = './004/004_0.db3'
-topic_name_list = [
-    '/rslidar_points_right', 
-    '/rslidar_points_left',
-    '/rslidar_points_top',
-    '/rslidar_points_prev',
-    '/rslidar_points_back',
-    '/image0',
-    '/image1',
-    '/image2',
-    '/image3',
-    '/image4',
-    '/image5',
-    '/image6',
-]
-save_folder = './calib_lidar2img/004_3'
-
-# 处理数据
-process_sensor_data(db3_file, topic_name_list, save_folder, time_threshold=30000000, save_interval=0.33)  # 50ms的时间阈值
+if __name__ == '__main__':
+    bag_path = './004'  # 数据包目录（包含 metadata.yaml 和 004_0.db3, 004_1.db3, ...），也可以直接写单个 .db3 文件
+    topic_name_list = [
+        '/rslidar_points_right', 
+        '/rslidar_points_left',
+        '/rslidar_points_top',
+        '/rslidar_points_prev',
+        '/rslidar_points_back',
+        '/image0',
+        '/image1',
+        '/image2',
+        '/image3',
+        '/image4',
+        '/image5',
+        '/image6',
+    ]
+    save_folder = './calib_lidar2img/004_3'
+
+    # 处理数据，并记录各阶段的耗时（profile_stage='decode_frame' 时会额外保存该阶段的 cProfile 结果）
+    # 加上 output_layout='shards' 时输出为 save_folder/shard-*.tar（每个分片不超过 shard_bytes），不再每帧一个目录
+    recorder = Recorder(profile_stage=None)
+    process_sensor_data(bag_path, topic_name_list, save_folder, time_threshold=30000000, save_interval=0.33,  # 50ms的时间阈值
+                        recorder=recorder)
+    recorder.print_summary()
+    recorder.dump_json(os.path.join(save_folder, 'stage_stats.json'))
+    recorder.dump_chrome_trace(os.path.join(save_folder, 'trace.json'))
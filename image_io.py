@@ -0,0 +1,130 @@
+# 相机图像的导出：
+#   'jpg' —— 直通模式，直接把 CompressedImage 里的压缩数据写出，不解码、不转换颜色、不重新编码；
+#   'png' —— 解码后保存为 PNG。cv2.imdecode 得到的就是 BGR，cv2.imwrite 也按 BGR 写，不需要再做颜色转换。
+# 消息按 CDR 解析（见 image_msgs.py），同时支持 sensor_msgs/CompressedImage 和原始的 sensor_msgs/Image。
+# 文件先写到临时文件再改名（见 atomic_io.py），中途中断不会留下写了一半的图像。
+import os
+import cv2
+import numpy as np
+
+from atomic_io import write_bytes
+
+from image_msgs import parse_compressed_image, parse_image_message, image_to_array
+
+IMAGE_FORMATS = ('png', 'jpg')
+
+
+def compressed_extension(image_format):
+    """
+    根据 CompressedImage.format（如 'jpeg'、'png'、'bgr8; jpeg compressed bgr8'）选择直通模式的扩展名。
+    """
+    return 'png' if 'png' in image_format.lower() else 'jpg'
+
+
+def compressed_payload(data):
+    """
+    返回 CompressedImage 消息中的压缩数据（memoryview，不拷贝），不是 CompressedImage 时返回 None。
+    """
+    try:
+        return parse_compressed_image(data)['data']
+    except ValueError:
+        return None
+
+
+def decode_image(data):
+    """
+    解码图像消息，返回 BGR 的 numpy 数组，失败时返回 None。
+    """
+    try:
+        message_type, msg = parse_image_message(data)
+    except ValueError:
+        return None
+
+    if message_type == 'compressed':
+        return cv2.imdecode(np.frombuffer(msg['data'], np.uint8), cv2.IMREAD_COLOR)
+
+    image = image_to_array(msg)
+    if msg['encoding'] == 'rgb8':
+        return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    if msg['encoding'] == 'rgba8':
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2BGR)
+    return image
+
+
+def prepare_image(data, image_format='png'):
+    """
+    解码阶段：按 image_format 准备要写出的图像，不写文件。
+    返回:
+        (extension, payload)：'jpg' 直通时 payload 是压缩数据（memoryview），否则是解码后的 BGR 数组；
+        解码失败时返回 None
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"不支持的图像输出格式: {image_format}，可选 {IMAGE_FORMATS}")
+
+    if image_format == 'jpg':
+        try:
+            msg = parse_compressed_image(data)
+        except ValueError:
+            msg = None
+        if msg is not None:
+            return compressed_extension(msg['format']), msg['data']
+
+    image = decode_image(data)
+    if image is None:
+        return None
+    return 'png', image
+
+
+def encode_image(prepared):
+    """
+    编码 prepare_image 的结果，不写文件（用于打包进分片，见 shard_io.py）。
+    返回:
+        (extension, 编码后的字节)，编码失败时返回 None
+    """
+    extension, payload = prepared
+    if isinstance(payload, np.ndarray):
+        ok, encoded = cv2.imencode(f'.{extension}', payload)
+        if not ok:
+            return None
+        return extension, encoded
+    return extension, payload
+
+
+def write_image(prepared, filename_stem):
+    """
+    写出阶段：写出 prepare_image 的结果，自动添加扩展名，返回实际写出的文件名（失败时返回 None）。
+    """
+    encoded = encode_image(prepared)
+    if encoded is None:
+        return None
+    extension, payload = encoded
+    filename = f"{filename_stem}.{extension}"
+    write_bytes(filename, payload)
+    return filename
+
+
+def save_compressed_image(data, filename_stem, image_format='png'):
+    """
+    按 image_format 保存消息中的图像，自动添加扩展名。
+    参数:
+        data: 消息的原始字节
+        filename_stem: 不带扩展名的输出路径
+        image_format: 'jpg'（直通，不解码）或 'png'。原始 Image 消息没有压缩数据可以直通，总是保存为 PNG
+    返回:
+        实际写出的文件名，失败时返回 None
+    """
+    prepared = prepare_image(data, image_format)
+    if prepared is None:
+        return None
+    return write_image(prepared, filename_stem)
+
+
+def save_image_array(image, filename):
+    """
+    按 filename 的扩展名编码 BGR 图像并原子地写出，返回 filename，编码失败时返回 None。
+    """
+    ok, encoded = cv2.imencode(os.path.splitext(filename)[1], image)
+    if not ok:
+        return None
+    write_bytes(filename, encoded)
+    return filename
@@ -0,0 +1,113 @@
+# sensor_msgs/CompressedImage 和 sensor_msgs/Image 的 CDR 解析。
+# 按消息定义依次读取 header.stamp、frame_id、format/encoding 和 data 的长度前缀，
+# 图像数据以 memoryview 切片返回，不拷贝，也不再在整块数据里搜索 JPEG 标记
+# （EXIF 缩略图里嵌入的 0xFFD8 / 0xFFD9 会让标记搜索截错位置）。
+import numpy as np
+
+from cdr import CdrReader, CdrWriter
+
+# sensor_msgs/Image 的 encoding -> (numpy dtype, 通道数)
+IMAGE_ENCODINGS = {
+    'mono8': ('u1', 1),
+    '8UC1': ('u1', 1),
+    'bgr8': ('u1', 3),
+    'rgb8': ('u1', 3),
+    '8UC3': ('u1', 3),
+    'bgra8': ('u1', 4),
+    'rgba8': ('u1', 4),
+    '8UC4': ('u1', 4),
+    'mono16': ('u2', 1),
+    '16UC1': ('u2', 1),
+}
+
+
+def _check_end(reader, message_type):
+    # 序列化的消息在 data 之后最多只有对齐用的填充字节
+    trailing = len(reader.data) - reader.offset
+    if not 0 <= trailing < 4:
+        raise ValueError(f"数据不是 {message_type} 消息（末尾多出 {trailing} 字节）")
+
+
+def parse_compressed_image(data):
+    """
+    解析 sensor_msgs/CompressedImage。
+    返回:
+        dict，包含 stamp（纳秒）, frame_id, format, data（压缩数据的 memoryview，不拷贝）
+    """
+    reader = CdrReader(data)
+    stamp, frame_id = reader.header()
+    image_format = reader.string()
+    start, length = reader.byte_sequence()
+    _check_end(reader, 'CompressedImage')
+    return {
+        'stamp': stamp,
+        'frame_id': frame_id,
+        'format': image_format,
+        'data': reader.data[start:start + length],
+    }
+
+
+def parse_image(data):
+    """
+    解析 sensor_msgs/Image。
+    返回:
+        dict，包含 stamp, frame_id, height, width, encoding, is_bigendian, step, data（memoryview，不拷贝）
+    """
+    reader = CdrReader(data)
+    stamp, frame_id = reader.header()
+    height = reader.uint32()
+    width = reader.uint32()
+    encoding = reader.string()
+    is_bigendian = reader.bool()
+    step = reader.uint32()
+    start, length = reader.byte_sequence()
+    _check_end(reader, 'Image')
+    if length < height * step:
+        raise ValueError(f"Image 数据长度 {length} 小于 height * step = {height * step}")
+    return {
+        'stamp': stamp,
+        'frame_id': frame_id,
+        'height': height,
+        'width': width,
+        'encoding': encoding,
+        'is_bigendian': is_bigendian,
+        'step': step,
+        'data': reader.data[start:start + length],
+    }
+
+
+def serialize_compressed_image(data, stamp, frame_id, image_format='jpeg'):
+    """
+    将压缩后的图像数据序列化为 CDR 格式的 CompressedImage 消息，主要用于生成测试数据。
+    """
+    writer = CdrWriter()
+    writer.header(stamp, frame_id)
+    writer.string(image_format)
+    writer.byte_sequence(data)
+    return writer.getvalue()
+
+
+def parse_image_message(data):
+    """
+    自动识别 CompressedImage 或 Image 消息并解析，返回 (message_type, dict)，
+    message_type 为 'compressed' 或 'raw'。
+    """
+    try:
+        return 'compressed', parse_compressed_image(data)
+    except ValueError:
+        pass
+    return 'raw', parse_image(data)
+
+
+def image_to_array(msg):
+    """
+    将 parse_image 的结果转换为 (height, width[, channels]) 的 numpy 数组（零拷贝视图）。
+    """
+    if msg['encoding'] not in IMAGE_ENCODINGS:
+        raise ValueError(f"不支持的图像编码: {msg['encoding']}")
+    dtype, channels = IMAGE_ENCODINGS[msg['encoding']]
+    dtype = np.dtype(dtype).newbyteorder('>' if msg['is_bigendian'] else '<')
+    row_items = msg['step'] // dtype.itemsize
+    rows = np.frombuffer(msg['data'], dtype=dtype, count=msg['height'] * row_items).reshape(msg['height'], row_items)
+    image = rows[:, :msg['width'] * channels]
+    return image.reshape(msg['height'], msg['width'], channels) if channels > 1 else image
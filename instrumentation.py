@@ -0,0 +1,294 @@
+# 分阶段的性能统计：记录每个阶段（SQLite 读取、点云解析、图像解码、PNG 编码、写文件……）的
+# 墙钟时间、CPU 时间、调用次数、输入/输出字节数，流水线各队列的深度，计量值（例如在途字节数）的最大值，
+# 以及进程的峰值内存（RSS）。
+# 结果可以导出为 JSON 汇总，或 Chrome trace 格式（chrome://tracing、Perfetto 可直接打开，每个线程一行）。
+# profile_stage 指定某个阶段时，用 cProfile 剖析该阶段（同一时刻只剖析一次调用，避免多个线程同时启用 profiler）。
+#
+#   recorder = Recorder(profile_stage='decode')
+#   export_bag(..., recorder=recorder)
+#   recorder.dump_json('stats.json'); recorder.dump_chrome_trace('trace.json'); recorder.dump_profile('decode.prof')
+#
+# 不传 recorder 的地方使用 NULL_RECORDER，所有方法都是空操作，没有额外开销。
+# 进程池中的任务各自记录，用 snapshot() 取出可 pickle 的结果，由主进程 merge() 汇总；
+# trace 的时间戳直接使用 time.perf_counter()（系统范围的单调时钟），不同进程的事件可以对齐。
+import os
+import sys
+import json
+import time
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import resource  # Windows 上没有
+except ImportError:
+    resource = None
+
+# Chrome trace 中最多保留的事件数，超过后只更新汇总统计
+DEFAULT_MAX_EVENTS = 200000
+
+
+def payload_nbytes(obj):
+    """
+    估算一个数据对象的字节数：bytes / memoryview / numpy 数组取实际大小，tuple / list 逐项相加，其它对象计为 0。
+    """
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sum(payload_nbytes(item) for item in obj)
+    return 0
+
+
+def file_nbytes(filename):
+    """
+    已写出文件的大小，filename 不是有效路径时返回 0。
+    """
+    if isinstance(filename, str):
+        try:
+            return os.path.getsize(filename)
+        except OSError:
+            return 0
+    return 0
+
+
+def peak_rss():
+    """
+    当前进程（以及已结束的子进程）的峰值常驻内存，单位为字节；平台不支持时返回 None。
+    """
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 的单位是 KiB，macOS 上是字节
+    scale = 1 if sys.platform == 'darwin' else 1024
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(self_rss, children_rss) * scale
+
+
+class StageSpan:
+    """
+    一次阶段调用，在 with 块内可以补充输出字节数和处理的消息数。
+    """
+    __slots__ = ('bytes_in', 'bytes_out', 'count')
+
+    def __init__(self, bytes_in=0):
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.count = 1
+
+
+class Recorder:
+    """
+    线程安全的分阶段统计。
+
+    参数:
+        trace: 是否记录 Chrome trace 事件
+        max_events: 最多保留的 trace 事件数
+        profile_stage: 用 cProfile 剖析的阶段名（可选）
+    """
+
+    def __init__(self, trace=True, max_events=DEFAULT_MAX_EVENTS, profile_stage=None):
+        self.trace = trace
+        self.max_events = max_events
+        self.profile_stage = profile_stage
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._queues = {}
+        self._gauges = {}
+        self._events = []
+        self._peak_rss = peak_rss()
+        self._profiler = cProfile.Profile() if profile_stage else None
+        self._profile_lock = threading.Lock()
+        self._profile_stats = None
+
+    @contextmanager
+    def stage(self, name, bytes_in=0):
+        """
+        记录一次阶段调用：with recorder.stage('decode', nbytes) as span: ...; span.bytes_out = ...
+        """
+        span = StageSpan(bytes_in)
+        profiling = name == self.profile_stage and self._profile_lock.acquire(blocking=False)
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        if profiling:
+            self._profiler.enable()
+        try:
+            yield span
+        finally:
+            if profiling:
+                self._profiler.disable()
+                self._profile_lock.release()
+            wall = time.perf_counter() - start_wall
+            cpu = time.thread_time() - start_cpu
+            self._add(name, span, wall, cpu, start_wall)
+
+    def _add(self, name, span, wall, cpu, start_wall):
+        with self._lock:
+            stats = self._stages.setdefault(name, {'calls': 0, 'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                   'max_wall_s': 0.0, 'bytes_in': 0, 'bytes_out': 0})
+            stats['calls'] += 1
+            stats['count'] += span.count
+            stats['wall_s'] += wall
+            stats['cpu_s'] += cpu
+            stats['max_wall_s'] = max(stats['max_wall_s'], wall)
+            stats['bytes_in'] += span.bytes_in
+            stats['bytes_out'] += span.bytes_out
+            if self.trace and len(self._events) < self.max_events:
+                self._events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                                     'ts': start_wall * 1e6, 'dur': wall * 1e6,
+                                     'args': {'bytes_in': span.bytes_in, 'bytes_out': span.bytes_out}})
+
+    def queue_depth(self, name, depth):
+        """
+        记录某个队列当前的深度（流水线每次放入数据时调用）。
+        """
+        with self._lock:
+            stats = self._queues.setdefault(name, {'samples': 0, 'total': 0, 'max': 0})
+            stats['samples'] += 1
+            stats['total'] += depth
+            stats['max'] = max(stats['max'], depth)
+            if self.trace and len(self._events) < self.max_events:
+                self._events.append({'name': name, 'ph': 'C', 'pid': os.getpid(),
+                                     'ts': time.perf_counter() * 1e6, 'args': {'depth': depth}})
+
+    def gauge(self, name, value):
+        """
+        记录一个计量值（例如流水线的在途字节数），汇总时只保留最大值。
+        """
+        with self._lock:
+            self._gauges[name] = max(self._gauges.get(name, value), value)
+            if self.trace and len(self._events) < self.max_events:
+                self._events.append({'name': name, 'ph': 'C', 'pid': os.getpid(),
+                                     'ts': time.perf_counter() * 1e6, 'args': {'value': value}})
+
+    def snapshot(self):
+        """
+        返回可 pickle 的统计结果（用于从进程池的任务中传回主进程）。
+        """
+        with self._lock:
+            profile_stats = None
+            if self._profiler is not None:
+                self._profiler.create_stats()
+                profile_stats = dict(self._profiler.stats)
+            return {
+                'stages': {name: dict(stats) for name, stats in self._stages.items()},
+                'queues': {name: dict(stats) for name, stats in self._queues.items()},
+                'gauges': dict(self._gauges),
+                'events': list(self._events),
+                'peak_rss': peak_rss(),
+                'profile': profile_stats,
+            }
+
+    def merge(self, snapshot):
+        """
+        合并另一个 Recorder 的 snapshot()。
+        """
+        with self._lock:
+            for name, other in snapshot['stages'].items():
+                stats = self._stages.setdefault(name, dict.fromkeys(other, 0))
+                for key, value in other.items():
+                    stats[key] = max(stats[key], value) if key.startswith('max') else stats[key] + value
+            for name, other in snapshot['queues'].items():
+                stats = self._queues.setdefault(name, dict.fromkeys(other, 0))
+                for key, value in other.items():
+                    stats[key] = max(stats[key], value) if key == 'max' else stats[key] + value
+            for name, value in snapshot['gauges'].items():
+                self._gauges[name] = max(self._gauges.get(name, value), value)
+            if self.trace:
+                self._events.extend(snapshot['events'][:max(0, self.max_events - len(self._events))])
+            if snapshot['peak_rss'] is not None:
+                self._peak_rss = max(self._peak_rss or 0, snapshot['peak_rss'])
+            if snapshot['profile']:
+                self._merge_profile(snapshot['profile'])
+
+    def _merge_profile(self, stats):
+        # pstats.Stats 可以从带有 stats 属性的对象载入
+        holder = type('ProfileStats', (), {'create_stats': lambda self: None, 'stats': stats})()
+        if self._profile_stats is None:
+            self._profile_stats = pstats.Stats(holder)
+        else:
+            self._profile_stats.add(holder)
+
+    def summary(self):
+        """
+        返回汇总统计：每个阶段的调用次数、消息数、墙钟/CPU 时间、输入/输出字节数和 MB/秒，队列深度，
+        计量值的最大值，峰值 RSS。
+        """
+        with self._lock:
+            stages = {}
+            for name, stats in self._stages.items():
+                stages[name] = dict(stats)
+                stages[name]['mb_per_s'] = (max(stats['bytes_in'], stats['bytes_out']) / 1e6 / stats['wall_s']
+                                            if stats['wall_s'] > 0 else None)
+            queues = {name: {'max': stats['max'], 'mean': stats['total'] / stats['samples'] if stats['samples'] else 0.0}
+                      for name, stats in self._queues.items()}
+            gauges = {name: {'max': value} for name, value in self._gauges.items()}
+            rss = peak_rss()
+            if self._peak_rss is not None:
+                rss = max(rss or 0, self._peak_rss)
+        return {'stages': stages, 'queues': queues, 'gauges': gauges, 'peak_rss_bytes': rss}
+
+    def dump_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def dump_chrome_trace(self, filename):
+        """
+        导出 Chrome trace（JSON 对象格式），汇总统计放在 metadata 中。
+        """
+        with self._lock:
+            events = list(self._events)
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'metadata': self.summary()}, f)
+
+    def dump_profile(self, filename):
+        """
+        保存 profile_stage 的 cProfile 结果（可以用 pstats 或 snakeviz 查看）。没有剖析到任何调用时返回 False。
+        """
+        if self._profiler is None:
+            return False
+        self._profiler.create_stats()
+        stats = pstats.Stats(self._profiler) if self._profiler.stats else None
+        if self._profile_stats is not None:
+            stats = self._profile_stats if stats is None else stats.add(self._profile_stats)
+        if stats is None:
+            return False
+        stats.dump_stats(filename)
+        return True
+
+    def print_summary(self):
+        summary = self.summary()
+        for name, stats in summary['stages'].items():
+            rate = f", {stats['mb_per_s']:.1f} MB/s" if stats['mb_per_s'] else ''
+            print(f"{name}: {stats['count']} 条, 墙钟 {stats['wall_s']:.2f}s, CPU {stats['cpu_s']:.2f}s{rate}")
+        for name, stats in summary['queues'].items():
+            print(f"队列 {name}: 最大深度 {stats['max']}, 平均深度 {stats['mean']:.1f}")
+        for name, stats in summary['gauges'].items():
+            print(f"{name}: 最大 {stats['max']}")
+        if summary['peak_rss_bytes'] is not None:
+            print(f"峰值 RSS: {summary['peak_rss_bytes'] / 2 ** 20:.0f} MiB")
+
+
+class NullRecorder:
+    """
+    不记录任何东西的 Recorder，没有传入 recorder 时使用。
+    """
+
+    @contextmanager
+    def stage(self, name, bytes_in=0):
+        yield StageSpan(bytes_in)
+
+    def queue_depth(self, name, depth):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+
+NULL_RECORDER = NullRecorder()
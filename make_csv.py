@@ -1,21 +1,19 @@
-import pandas as pd
+from can_export import export_can_log
 
-# 读取txt文件中的n数据
-with open('can.txt', 'r') as file:
-    lines = file.readlines()
-# 解析每一行，去掉换行符并按空格分隔
-# for line in lines:
-#     if line.strip().split()[16] == '03':
-#         print(line.strip().split()[51:59])  
-    
+# 直接从 .db3 中分块解码CAN报文，按时间顺序流式写入 Parquet（每块一个 row group），
+# 不再经过 can.txt 的文本中转，也不再整表载入 pandas 再写 Excel（Excel 最多约 100 万行）
+db3_file = 'canOnly_1.db3'
+topic_id = 1
 
+# 需要的信号在这里配置（起始位、位长、字节序、缩放、偏移），每块报文一次向量化解码
+# 原来按 split()[16] == '03' 筛选报文，取 split()[51:59] 的 8 个字节，对应 can_id == 0x03
+signals = {
+    # 'speed': {'can_id': 0x03, 'start_bit': 0, 'length': 16, 'byteorder': 'little', 'scale': 0.01, 'offset': 0},
+}
 
-parsed_data = [line.strip().split() for line in lines]
-print(parsed_data)
-# 将解析后的数据转换为DataFrame
-df = pd.DataFrame(parsed_data)
+rows = export_can_log(db3_file, topic_id, 'can.parquet', signals=signals, output_format='parquet')
+print(f"数据已成功保存为can.parquet，共 {rows} 条报文")
 
-# 保存为Excel文件
-df.to_excel('output.xlsx', index=False, header=False)
-
-print("数据已成功保存为output.xlsx")
+# 按时间范围读取时只会读入相关的 row group，例如：
+# table = read_can_log('can.parquet', start=1700000000000000000, end=1700000010000000000)
+# df = table.to_pandas()
@@ -0,0 +1,303 @@
+# 点云文件读写：PCD（ascii / binary / binary_compressed）以及 KITTI 风格的 .bin。
+# binary 模式下整块内存一次写入，不再逐点格式化浮点数。
+# 读取不依赖 open3d：binary PCD 和 .bin 直接以 np.memmap 映射为结构化数组（零拷贝、可随机访问），
+# 保留文件中的全部字段（包括 intensity），不会像 o3d.io.read_point_cloud 那样转成 float64 坐标并丢掉其它字段。
+# 所有文件都先写到临时文件再改名（见 atomic_io.py），中途中断不会留下写了一半的点云文件。
+# encode_pointcloud 只编码不写文件，返回字节块列表，打包进分片（见 shard_io.py）时使用。
+import io
+import os
+import numpy as np
+
+from atomic_io import atomic_write
+
+try:
+    import lzf  # binary_compressed 需要 python-lzf
+except ImportError:
+    lzf = None
+
+OUTPUT_FORMATS = ('ascii', 'binary', 'binary_compressed', 'bin')
+
+# numpy dtype.kind -> PCD TYPE
+PCD_TYPES = {'f': 'F', 'i': 'I', 'u': 'U'}
+# PCD TYPE -> numpy dtype.kind
+PCD_KINDS = {pcd_type: kind for kind, pcd_type in PCD_TYPES.items()}
+DEFAULT_FIELDS = ('x', 'y', 'z', 'intensity')
+
+
+def _as_structured(points):
+    """
+    将 (N, k) 的普通数组或结构化数组统一转换为紧凑排列（无填充字节、小端）的结构化数组。
+    """
+    if points.dtype.names is None:
+        points = np.asarray(points)
+        if points.ndim != 2 or points.shape[1] > len(DEFAULT_FIELDS):
+            raise ValueError(f"点云数组形状应为 (N, 3) 或 (N, 4)，实际为 {points.shape}")
+        base = points.dtype.newbyteorder('<') if points.dtype.kind == 'f' else np.dtype('<f4')
+        dtype = np.dtype([(name, base) for name in DEFAULT_FIELDS[:points.shape[1]]])
+        # 连续的 (N, k) 同类型数组可以直接重新解释为结构化数组，不需要拷贝
+        return np.ascontiguousarray(points, dtype=base).view(dtype).reshape(-1)
+
+    packed = np.dtype([(name, points.dtype[name].newbyteorder('<')) for name in points.dtype.names])
+    if points.dtype == packed and points.flags['C_CONTIGUOUS']:
+        return points
+    out = np.empty(points.shape[0], dtype=packed)
+    for name in packed.names:
+        out[name] = points[name]
+    return out
+
+
+def _pcd_header(cloud, data_format):
+    fields, sizes, types, counts = [], [], [], []
+    for name in cloud.dtype.names:
+        field_dtype = cloud.dtype[name]
+        base = field_dtype.base
+        if base.kind not in PCD_TYPES:
+            raise ValueError(f"字段 {name} 的类型 {base} 无法写入PCD")
+        fields.append(name)
+        sizes.append(str(base.itemsize))
+        types.append(PCD_TYPES[base.kind])
+        counts.append(str(int(np.prod(field_dtype.shape)) if field_dtype.shape else 1))
+    num_points = cloud.shape[0]
+    return (
+        f"# .PCD v0.7 - Point Cloud Data file format\n"
+        f"VERSION 0.7\n"
+        f"FIELDS {' '.join(fields)}\n"
+        f"SIZE {' '.join(sizes)}\n"
+        f"TYPE {' '.join(types)}\n"
+        f"COUNT {' '.join(counts)}\n"
+        f"WIDTH {num_points}\n"
+        f"HEIGHT 1\n"
+        f"VIEWPOINT 0 0 0 1 0 0 0\n"
+        f"POINTS {num_points}\n"
+        f"DATA {data_format}\n"
+    )
+
+
+def pcd_chunks(points, data_format='binary'):
+    """
+    把点云编码成 PCD 文件的内容，不写文件。
+    参数:
+        points: (N, 3)/(N, 4) 数组（列为 x, y, z[, intensity]）或结构化数组（按字段名写出）
+        data_format: 'ascii'、'binary' 或 'binary_compressed'
+    返回:
+        依次拼接即为完整文件的字节块列表（binary 模式下点数据是数组内存的 memoryview，不拷贝）
+    """
+    if data_format not in ('ascii', 'binary', 'binary_compressed'):
+        raise ValueError(f"不支持的PCD数据格式: {data_format}")
+    cloud = _as_structured(points)
+    header = _pcd_header(cloud, data_format).encode('ascii')
+
+    if data_format == 'ascii':
+        text = io.BytesIO()
+        columns = [cloud[name].reshape(cloud.shape[0], -1) for name in cloud.dtype.names]
+        np.savetxt(text, np.hstack(columns), fmt='%.8g')
+        return [header, text.getbuffer()]
+
+    if data_format == 'binary':
+        return [header, memoryview(cloud).cast('B')]
+
+    # binary_compressed：数据按字段（列）排列后做 LZF 压缩，前面是压缩后大小和原始大小
+    if lzf is None:
+        raise ImportError("写出 binary_compressed 格式需要安装 python-lzf：pip install python-lzf")
+    raw = b''.join(np.ascontiguousarray(cloud[name]).tobytes() for name in cloud.dtype.names)
+    compressed = lzf.compress(raw, len(raw) + len(raw) // 16 + 64) if raw else b''
+    return [header, np.array([len(compressed), len(raw)], dtype='<u4').tobytes(), compressed]
+
+
+def save_pcd(points, filename, data_format='binary'):
+    """
+    保存为PCD文件。
+    参数:
+        points: (N, 3)/(N, 4) 数组（列为 x, y, z[, intensity]）或结构化数组（按字段名写出）
+        filename: 输出文件名
+        data_format: 'ascii'、'binary' 或 'binary_compressed'
+    """
+    chunks = pcd_chunks(points, data_format)
+    with atomic_write(filename) as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def bin_chunks(points):
+    """
+    把点云编码成 KITTI 风格 .bin 文件的内容（连续的 float32 x, y, z, intensity），返回字节块列表。
+    """
+    if points.dtype.names is not None:
+        cloud = points
+        points = np.zeros((cloud.shape[0], 4), dtype=np.float32)
+        for i, name in enumerate(DEFAULT_FIELDS):
+            if name in cloud.dtype.names:
+                points[:, i] = cloud[name]
+    return [memoryview(np.ascontiguousarray(points[:, :4], dtype='<f4')).cast('B')]
+
+
+def save_bin(points, filename):
+    """
+    保存为 KITTI 风格的 .bin 文件：连续的 float32 x, y, z, intensity，没有文件头。
+    """
+    chunks = bin_chunks(points)
+    with atomic_write(filename) as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def encode_pointcloud(points, output_format='binary'):
+    """
+    按 output_format 编码点云，不写文件（用于打包进分片，见 shard_io.py）。
+    返回:
+        (扩展名 'pcd' 或 'bin', 字节块列表)
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的点云输出格式: {output_format}，可选 {OUTPUT_FORMATS}")
+    if output_format == 'bin':
+        return 'bin', bin_chunks(points)
+    return 'pcd', pcd_chunks(points, output_format)
+
+
+def save_pointcloud(points, filename_stem, output_format='binary'):
+    """
+    按 output_format 保存点云，自动添加扩展名（.pcd 或 .bin）。
+    参数:
+        points: 点云数组
+        filename_stem: 不带扩展名的输出路径
+        output_format: OUTPUT_FORMATS 中的一种
+    返回:
+        实际写出的文件名
+    """
+    extension, chunks = encode_pointcloud(points, output_format)
+    filename = f"{filename_stem}.{extension}"
+    with atomic_write(filename) as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return filename
+
+
+def read_pcd_header(f):
+    """
+    读取PCD文件头（读到 DATA 行为止）。
+    参数:
+        f: 以二进制模式打开的文件对象，读完后位于数据段的起始位置
+    返回:
+        {关键字: 取值列表}，例如 header['FIELDS'] == ['x', 'y', 'z', 'intensity']
+    """
+    header = {}
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("PCD文件头不完整：没有找到 DATA 行")
+        line = line.decode('ascii').strip()
+        if not line or line.startswith('#'):
+            continue
+        key, *values = line.split()
+        header[key.upper()] = values
+        if key.upper() == 'DATA':
+            return header
+
+
+def pcd_dtype(header):
+    """
+    由PCD文件头构造紧凑排列的小端结构化 dtype。COUNT > 1 的字段为子数组，名为 '_' 的填充字段会被重命名为 '_0'、'_1' 等。
+    """
+    fields = header['FIELDS']
+    sizes = header.get('SIZE', ['4'] * len(fields))
+    types = header.get('TYPE', ['F'] * len(fields))
+    counts = header.get('COUNT', ['1'] * len(fields))
+    if not len(fields) == len(sizes) == len(types) == len(counts):
+        raise ValueError(f"PCD文件头中 FIELDS/SIZE/TYPE/COUNT 的个数不一致: {header}")
+
+    dtype = []
+    padding = 0
+    for name, size, pcd_type, count in zip(fields, sizes, types, counts):
+        if pcd_type not in PCD_KINDS:
+            raise ValueError(f"不支持的PCD字段类型: {pcd_type}")
+        if name == '_':
+            name = f'_{padding}'
+            padding += 1
+        base = np.dtype(f'<{PCD_KINDS[pcd_type]}{size}')
+        dtype.append((name, base) if int(count) == 1 else (name, base, (int(count),)))
+    return np.dtype(dtype)
+
+
+def read_pcd(filename, mmap=True):
+    """
+    读取PCD文件，不依赖 open3d。
+    参数:
+        filename: PCD文件名
+        mmap: binary 格式时是否以 np.memmap 只读映射（零拷贝），为 False 时读入内存
+    返回:
+        结构化数组，字段与文件中的 FIELDS 一致（x, y, z, intensity 等）
+    """
+    with open(filename, 'rb') as f:
+        header = read_pcd_header(f)
+        offset = f.tell()
+        dtype = pcd_dtype(header)
+        num_points = int(header['POINTS'][0]) if 'POINTS' in header else \
+            int(header['WIDTH'][0]) * int(header['HEIGHT'][0])
+        data_format = header['DATA'][0].lower()
+
+        if data_format == 'binary':
+            if num_points == 0 or not mmap:
+                return np.fromfile(f, dtype=dtype, count=num_points)
+            return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(num_points,))
+
+        if data_format == 'ascii':
+            return _parse_ascii_pcd(f.read(), dtype, num_points)
+
+        if data_format == 'binary_compressed':
+            if lzf is None:
+                raise ImportError("读取 binary_compressed 格式需要安装 python-lzf：pip install python-lzf")
+            compressed_size, raw_size = np.frombuffer(f.read(8), dtype='<u4')
+            raw = lzf.decompress(f.read(int(compressed_size)), int(raw_size)) if raw_size else b''
+            # 数据按字段（列）排列，逐列拷贝到按点排列的结构化数组中
+            cloud = np.empty(num_points, dtype=dtype)
+            start = 0
+            for name in dtype.names:
+                column = np.frombuffer(raw, dtype=dtype[name].base, count=num_points * max(1, int(np.prod(dtype[name].shape))),
+                                       offset=start)
+                cloud[name] = column.reshape(cloud[name].shape)
+                start += column.nbytes
+            return cloud
+
+    raise ValueError(f"不支持的PCD数据格式: {data_format}")
+
+
+def _parse_ascii_pcd(text, dtype, num_points):
+    # 整个数据段一次解析为浮点数，再按列拆到各字段，不逐行调用 np.loadtxt
+    values = np.fromstring(text.decode('ascii'), dtype=np.float64, sep=' ')
+    width = sum(max(1, int(np.prod(dtype[name].shape))) for name in dtype.names)
+    if values.size != num_points * width:
+        raise ValueError(f"ascii PCD 数据个数 {values.size} 与文件头 {num_points} x {width} 不一致")
+    values = values.reshape(num_points, width)
+    cloud = np.empty(num_points, dtype=dtype)
+    column = 0
+    for name in dtype.names:
+        count = max(1, int(np.prod(dtype[name].shape)))
+        cloud[name] = values[:, column:column + count].reshape(cloud[name].shape)
+        column += count
+    return cloud
+
+
+def read_bin(filename, mmap=True):
+    """
+    读取 KITTI 风格的 .bin 文件，返回 (x, y, z, intensity) 的 float32 结构化数组（默认以 np.memmap 映射）。
+    """
+    dtype = np.dtype([(name, '<f4') for name in DEFAULT_FIELDS])
+    if not mmap or os.path.getsize(filename) == 0:
+        return np.fromfile(filename, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode='r')
+
+
+def read_pointcloud(filename, mmap=True):
+    """
+    按扩展名读取 .pcd 或 .bin 点云文件，返回结构化数组。
+    """
+    if filename.endswith('.bin'):
+        return read_bin(filename, mmap)
+    return read_pcd(filename, mmap)
+
+
+def xyz_array(cloud, dtype=np.float32):
+    """
+    取出结构化点云数组的 x, y, z，返回 (N, 3) 数组。
+    """
+    return np.column_stack([np.asarray(cloud[name], dtype=dtype) for name in ('x', 'y', 'z')])
@@ -0,0 +1,215 @@
+# 分阶段的导出流水线：读取 → 解码 → 写出。
+#
+#   读取线程   依次迭代 source（一般是从 SQLite 流式读取消息的生成器），放入读取队列
+#   解码线程池 从读取队列取出数据并解码（点云解析、图像解码/解析、合并点云），结果放入写出队列
+#   写出线程池 从写出队列取出结果并写文件、记录导出清单
+#
+# 队列都有上限：写盘慢时解码线程会阻塞在写出队列上，解码慢时读取线程会阻塞在读取队列上（背压），
+# 内存占用不会随数据包大小增长；同时磁盘、CPU 和 SQLite 读取可以同时工作，而不是在一个循环里互相等待。
+# numpy 的向量化解析、cv2 的编解码和文件写入都会释放 GIL，所以这里用线程即可。
+# 队列按条数限制还不够：一条合并点云可能是几十 MB，一张图像只有几百 KB。给定 memory_budget 时，
+# 读取线程在放入新数据前要先申请字节额度，数据写出后才归还，三个阶段中同时存在的数据总量不超过预算（MemoryBudget）。
+# 传入 recorder（见 instrumentation.py）时记录三个阶段各自的耗时、字节数和两个队列的深度。
+import os
+import queue
+import threading
+from tqdm import tqdm
+
+from instrumentation import NULL_RECORDER, payload_nbytes, file_nbytes
+
+_DONE = object()
+
+# 默认的内存预算：流水线中同时存在的数据量上限
+DEFAULT_MEMORY_BUDGET = 256 << 20  # 256 MiB
+
+
+def _put(q, item, stop, recorder=NULL_RECORDER, queue_name=None):
+    # 队列满时阻塞，但出错停止时不再无限等待
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            if queue_name is not None:
+                recorder.queue_depth(queue_name, q.qsize())
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class MemoryBudget:
+    """
+    流水线中“在途”数据的字节额度。只有读取线程会因为额度不足而阻塞；解码和写出阶段只记账不等待，
+    这样不会出现各阶段互相等待额度的死锁。在途数据为 0 时总是允许放入，单条超过预算的消息也能处理。
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes, stop):
+        with self._cond:
+            while self.in_flight > 0 and self.in_flight + nbytes > self.max_bytes:
+                if stop.is_set():
+                    return False
+                self._cond.wait(timeout=0.1)
+            self._add(nbytes)
+            return True
+
+    def add(self, nbytes):
+        with self._cond:
+            self._add(nbytes)
+
+    def _add(self, nbytes):
+        self.in_flight += nbytes
+        self.peak = max(self.peak, self.in_flight)
+
+    def release(self, nbytes):
+        with self._cond:
+            self.in_flight -= nbytes
+            self._cond.notify_all()
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(source, decode, write, decode_workers=None, write_workers=4, queue_size=None, desc=None, total=None,
+                 recorder=None, stage_names=('read', 'decode', 'write'), memory_budget=None):
+    """
+    运行 读取 → 解码 → 写出 三段流水线，返回 write 的全部返回值（按完成顺序，None 不计入）。
+    参数:
+        source: 可迭代对象，在读取线程中迭代（生成器里打开的 SQLite 连接只在读取线程中使用）
+        decode: decode(item) -> 可迭代的写出任务（一条消息可以产生 0 个或多个输出，例如合并点云）
+        write: write(task) -> 结果，在写出线程中调用
+        decode_workers: 解码线程数，默认等于 CPU 核数
+        write_workers: 写出线程数
+        queue_size: 每个队列的上限，默认是对应阶段线程数的 4 倍
+        desc, total: 进度条的说明和总数（desc 为 None 时不显示进度条）
+        recorder: instrumentation.Recorder，记录各阶段的耗时、字节数和队列深度（可选）
+        stage_names: 三个阶段在统计中的名字，例如 ('sqlite_fetch', 'parse_pointcloud', 'write_pcd')
+        memory_budget: 读取、解码、写出三个阶段中同时存在的数据总字节数上限（可选，见 MemoryBudget）
+    """
+    recorder = recorder or NULL_RECORDER
+    read_stage, decode_stage, write_stage = stage_names
+    decode_workers = decode_workers or os.cpu_count()
+    read_queue = queue.Queue(maxsize=queue_size or 4 * decode_workers)
+    write_queue = queue.Queue(maxsize=queue_size or 4 * write_workers)
+    stop = threading.Event()
+    errors = []
+    results = []
+    lock = threading.Lock()
+    decoders_left = [decode_workers]
+    progress = tqdm(total=total, desc=desc) if desc is not None else None
+    budget = MemoryBudget(memory_budget) if memory_budget else None
+
+    def fail(e):
+        with lock:
+            errors.append(e)
+        stop.set()
+
+    def reader():
+        try:
+            items = iter(source)
+            while True:
+                # 读取阶段的耗时是从 source 取出下一条的时间（SQLite 查询和数据拷贝）
+                with recorder.stage(read_stage) as span:
+                    item = next(items, _DONE)
+                    if item is _DONE:
+                        span.count = 0
+                    else:
+                        span.bytes_out = payload_nbytes(item)
+                if item is _DONE:
+                    break
+                if budget is not None and not budget.acquire(span.bytes_out, stop):
+                    return
+                if not _put(read_queue, (item, span.bytes_out), stop, recorder, f'{read_stage}_queue'):
+                    return
+        except BaseException as e:
+            fail(e)
+        finally:
+            # 提前停止时也在读取线程中关闭生成器，让它在这个线程里关闭自己打开的连接
+            if hasattr(source, 'close'):
+                source.close()
+            for _ in range(decode_workers):
+                _put(read_queue, _DONE, stop)
+
+    def decoder():
+        try:
+            while True:
+                entry = _get(read_queue, stop)
+                if entry is _DONE:
+                    return
+                item, item_bytes = entry
+                with recorder.stage(decode_stage, item_bytes) as span:
+                    tasks = [(task, payload_nbytes(task)) for task in decode(item)]
+                    span.bytes_out = sum(task_bytes for _, task_bytes in tasks)
+                del item
+                if budget is not None:
+                    # 解码结果的额度先记上，再归还原始数据的额度
+                    budget.add(span.bytes_out)
+                    budget.release(item_bytes)
+                for task in tasks:
+                    if not _put(write_queue, task, stop, recorder, f'{write_stage}_queue'):
+                        return
+                if progress is not None:
+                    progress.update(1)
+        except BaseException as e:
+            fail(e)
+        finally:
+            # 最后一个结束的解码线程通知所有写出线程结束
+            with lock:
+                decoders_left[0] -= 1
+                last = decoders_left[0] == 0
+            if last:
+                for _ in range(write_workers):
+                    _put(write_queue, _DONE, stop)
+
+    def writer():
+        try:
+            while True:
+                entry = _get(write_queue, stop)
+                if entry is _DONE:
+                    return
+                task, task_bytes = entry
+                with recorder.stage(write_stage, task_bytes) as span:
+                    result = write(task)
+                    span.bytes_out = file_nbytes(result)
+                del task
+                if budget is not None:
+                    budget.release(task_bytes)
+                if result is not None:
+                    with lock:
+                        results.append(result)
+        except BaseException as e:
+            fail(e)
+
+    threads = [threading.Thread(target=reader, name='pipeline-reader', daemon=True)]
+    threads += [threading.Thread(target=decoder, name=f'pipeline-decode-{i}', daemon=True) for i in range(decode_workers)]
+    threads += [threading.Thread(target=writer, name=f'pipeline-write-{i}', daemon=True) for i in range(write_workers)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # 带超时地等待，主线程仍然可以响应 Ctrl+C
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        if progress is not None:
+            progress.close()
+
+    if budget is not None:
+        recorder.gauge('in_flight_bytes', budget.peak)
+    if errors:
+        # 任一阶段出错时所有线程都会停止，第一个异常在调用线程中重新抛出
+        raise errors[0]
+    return results
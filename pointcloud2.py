@@ -0,0 +1,151 @@
+# 根据消息中真实的 sensor_msgs/PointCloud2 头部（height, width, fields, point_step, row_step, is_bigendian）
+# 构建 NumPy 结构化 dtype，直接在原始字节上创建视图，不再逐点解析，也不再写死 header_size / point_step。
+import numpy as np
+
+from cdr import CdrReader, CdrWriter
+
+# sensor_msgs/PointField 中的 datatype 常量
+POINTFIELD_DATATYPES = {
+    1: 'i1',  # INT8
+    2: 'u1',  # UINT8
+    3: 'i2',  # INT16
+    4: 'u2',  # UINT16
+    5: 'i4',  # INT32
+    6: 'u4',  # UINT32
+    7: 'f4',  # FLOAT32
+    8: 'f8',  # FLOAT64
+}
+
+XYZI_FIELDS = ('x', 'y', 'z', 'intensity')
+# numpy dtype -> PointField datatype
+NUMPY_DATATYPES = {np.dtype(fmt).str[1:]: datatype for datatype, fmt in POINTFIELD_DATATYPES.items()}
+
+
+def parse_pointcloud2_header(data):
+    """
+    解析 CDR 序列化的 PointCloud2 消息头部。
+    参数:
+        data: 消息的原始字节（bytes 或 memoryview）
+    返回:
+        dict，包含 stamp, frame_id, height, width, fields, is_bigendian,
+        point_step, row_step, data_offset, data_length, is_dense
+    """
+    reader = CdrReader(data)
+    stamp, frame_id = reader.header()
+    height = reader.uint32()
+    width = reader.uint32()
+
+    fields = []
+    for _ in range(reader.uint32()):
+        name = reader.string()
+        offset = reader.uint32()
+        datatype = reader.uint8()
+        count = reader.uint32()
+        fields.append({'name': name, 'offset': offset, 'datatype': datatype, 'count': count})
+
+    is_bigendian = reader.bool()
+    point_step = reader.uint32()
+    row_step = reader.uint32()
+    data_offset, data_length = reader.byte_sequence()
+    is_dense = reader.bool() if reader.offset < len(reader.data) else False
+
+    return {
+        'stamp': stamp,
+        'frame_id': frame_id,
+        'height': height,
+        'width': width,
+        'fields': fields,
+        'is_bigendian': is_bigendian,
+        'point_step': point_step,
+        'row_step': row_step,
+        'data_offset': data_offset,
+        'data_length': data_length,
+        'is_dense': is_dense,
+    }
+
+
+def pointcloud2_dtype(fields, point_step, is_bigendian=False):
+    """
+    根据 PointField 列表构建结构化 dtype，itemsize 等于 point_step，字段之间的填充字节会被跳过。
+    """
+    byte_order = '>' if is_bigendian else '<'
+    names, formats, offsets = [], [], []
+    for field in fields:
+        if field['datatype'] not in POINTFIELD_DATATYPES:
+            raise ValueError(f"不支持的PointField数据类型: {field['datatype']} (字段 {field['name']})")
+        fmt = byte_order + POINTFIELD_DATATYPES[field['datatype']]
+        count = field.get('count', 1)
+        names.append(field['name'])
+        formats.append((fmt, (count,)) if count > 1 else fmt)
+        offsets.append(field['offset'])
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': point_step})
+
+
+def parse_pointcloud2(data, header=None):
+    """
+    将 PointCloud2 消息解析为结构化数组。
+    当每行没有填充字节时（row_step == width * point_step），返回的是原始字节上的零拷贝视图。
+    参数:
+        data: 消息的原始字节（bytes 或 memoryview）
+        header: 已经解析好的头部（可选），避免重复解析
+    返回:
+        形状为 (height * width,) 的结构化数组，字段名与消息中的 fields 一致
+    """
+    if header is None:
+        header = parse_pointcloud2_header(data)
+    dtype = pointcloud2_dtype(header['fields'], header['point_step'], header['is_bigendian'])
+    height, width = header['height'], header['width']
+    num_points = height * width
+    if num_points == 0:
+        return np.empty(0, dtype=dtype)
+
+    if header['row_step'] == width * header['point_step']:
+        return np.frombuffer(data, dtype=dtype, count=num_points, offset=header['data_offset'])
+
+    # 每行末尾有填充字节：按 (height, width) 的步长建立视图，再展平（此时会拷贝一次）
+    rows = np.ndarray(shape=(height, width), dtype=dtype, buffer=data,
+                      offset=header['data_offset'], strides=(header['row_step'], header['point_step']))
+    return rows.reshape(-1)
+
+
+def pointcloud2_to_xyzi(data, header=None):
+    """
+    将 PointCloud2 消息解析为 (N, 4) 的 float32 数组，列顺序为 x, y, z, intensity。
+    消息中没有 intensity 字段时该列填 0。
+    """
+    cloud = parse_pointcloud2(data, header)
+    points = np.zeros((cloud.shape[0], 4), dtype=np.float32)
+    for i, name in enumerate(XYZI_FIELDS):
+        if name in cloud.dtype.names:
+            points[:, i] = cloud[name]
+    return points
+
+
+def serialize_pointcloud2(cloud, stamp, frame_id):
+    """
+    将结构化数组序列化为 CDR 格式的 PointCloud2 消息（height = 1，小端），主要用于生成测试数据。
+    参数:
+        cloud: 结构化数组，每个字段对应一个 PointField
+        stamp: 纳秒时间戳
+        frame_id: 坐标系名称
+    返回:
+        bytes
+    """
+    cloud = np.ascontiguousarray(cloud)
+    writer = CdrWriter()
+    writer.header(stamp, frame_id)
+    writer.uint32(1)
+    writer.uint32(cloud.shape[0])
+    writer.uint32(len(cloud.dtype.names))
+    for name in cloud.dtype.names:
+        field_dtype, offset = cloud.dtype.fields[name][:2]
+        writer.string(name)
+        writer.uint32(offset)
+        writer.uint8(NUMPY_DATATYPES[field_dtype.base.newbyteorder('<').str[1:]])
+        writer.uint32(int(np.prod(field_dtype.shape)) if field_dtype.shape else 1)
+    writer.bool(False)
+    writer.uint32(cloud.dtype.itemsize)
+    writer.uint32(cloud.dtype.itemsize * cloud.shape[0])
+    writer.byte_sequence(cloud.view(np.uint8) if cloud.size else b'')
+    writer.bool(True)
+    return writer.getvalue()
@@ -0,0 +1,84 @@
+# 可视化用的点云加载与降采样：NaN / 范围过滤全部用布尔掩码向量化完成，多个文件合并到一次分配好的数组中；
+# 渲染前按点数预算做细节层次（LOD）降采样（体素降采样或随机抽样），几百万点的多雷达合并帧也能流畅交互。
+# 以前 VisualPCv2.get_pcd 逐点调用 np.isnan、逐点打印再 append 到列表，打开一帧要几分钟。
+import numpy as np
+
+from pcd_io import read_pointcloud, xyz_array
+
+# 渲染时默认的点数上限
+DEFAULT_POINT_BUDGET = 200000
+
+
+def read_points(filename):
+    """
+    读取一个点云文件（.pcd 或 .bin，不依赖 open3d），返回 (N, 3) 的 float32 坐标。
+    """
+    return xyz_array(read_pointcloud(filename))
+
+
+def filter_points(points, x_range=None, y_range=None, z_range=None):
+    """
+    去掉含 NaN 的点，并按坐标范围过滤。
+    参数:
+        points: (N, k) 数组，前三列为 x, y, z
+        x_range, y_range, z_range: (最小值, 最大值)，任一端为 None 表示不限制
+    返回:
+        过滤后的 (M, k) 数组
+    """
+    mask = ~np.isnan(points[:, :3]).any(axis=1)
+    for axis, value_range in enumerate((x_range, y_range, z_range)):
+        if value_range is None:
+            continue
+        low, high = value_range
+        if low is not None:
+            mask &= points[:, axis] >= low
+        if high is not None:
+            mask &= points[:, axis] <= high
+    return points[mask]
+
+
+def load_points(filename_list, x_range=None, y_range=None, z_range=None):
+    """
+    读取并过滤多个点云文件，合并为一个 (N, 3) 的 float32 数组（输出只分配一次）。
+    """
+    parts = [filter_points(read_points(filename), x_range, y_range, z_range) for filename in filename_list]
+    points = np.empty((sum(len(part) for part in parts), 3), dtype=np.float32)
+    start = 0
+    for part in parts:
+        points[start:start + len(part)] = part[:, :3]
+        start += len(part)
+    return points
+
+
+def voxel_downsample(points, voxel_size):
+    """
+    体素降采样：每个被占据的体素只保留其中的第一个点。
+    """
+    if len(points) == 0:
+        return points
+    voxels = np.floor((points[:, :3] - points[:, :3].min(axis=0)) / voxel_size).astype(np.int64)
+    # 把三维体素坐标压成一个 int64 键，用 np.unique 找出每个体素中的第一个点
+    dims = voxels.max(axis=0) + 1
+    keys = (voxels[:, 0] * dims[1] + voxels[:, 1]) * dims[2] + voxels[:, 2]
+    _, first = np.unique(keys, return_index=True)
+    return points[np.sort(first)]
+
+
+def decimate(points, max_points=DEFAULT_POINT_BUDGET, voxel_size=None, seed=0):
+    """
+    按点数预算降采样。
+    参数:
+        points: (N, k) 数组
+        max_points: 点数上限，为 None 时不限制
+        voxel_size: 给定时先做体素降采样（米），点数仍然超过预算时再随机抽样
+        seed: 随机抽样的种子，固定种子保证同一帧每次显示的点相同
+    返回:
+        降采样后的数组（保持原有顺序）
+    """
+    if voxel_size is not None:
+        points = voxel_downsample(points, voxel_size)
+    if max_points is None or len(points) <= max_points:
+        return points
+    rng = np.random.default_rng(seed)
+    keep = rng.choice(len(points), size=max_points, replace=False)
+    return points[np.sort(keep)]
@@ -1,83 +1,113 @@
-import sqlite3
-import cv2
-import numpy as np
 import os
+import numpy as np
+from image_io import save_compressed_image
+from bag_reader import connect_readonly, iter_messages_by_id, select_messages, find_closest_indices
+from bag_index import load_bag_index, topic_entry
+from pipeline import DEFAULT_MEMORY_BUDGET
+
+# 两阶段匹配：
+#   1. 只用时间戳和行号（缓存索引或只读 id/timestamp 的查询）在内存中一次性完成所有主相机帧的最近邻匹配；
+#   2. 按帧分批，用 WHERE id IN (...) 只读取匹配上的图像数据，边读边保存。
+#      每批的帧数由缓存索引中的消息大小决定：一批读取的图像数据合计不超过 memory_budget（至少一帧），最多 batch_size 帧。
+# 以前每个主相机帧、每个其他 topic 都要执行一次 ORDER BY ABS(timestamp - X) LIMIT 1，
+# 每次都带着 data 列把整个 topic 排序一遍，总开销随数据包长度平方增长；主相机的图像还会被一次性 fetchall 到内存中。
 
 class Db3ImageExtractor:
-    def __init__(self, db3_file, table_name='messages', column_name='data', output_folder='./images'):
+    def __init__(self, db3_file, table_name='messages', column_name='data', output_folder='./images', image_format='png',
+                 time_threshold=None, batch_size=64, memory_budget=DEFAULT_MEMORY_BUDGET):
         self.db3_file = db3_file
         self.table_name = table_name
         self.column_name = column_name
         self.output_folder = output_folder
-        self.conn = sqlite3.connect(db3_file)
-        self.cursor = self.conn.cursor()
-        
+        self.image_format = image_format  # 'jpg' 直接写出原始 JPEG，'png' 解码后保存
+        self.time_threshold = time_threshold  # 允许的最大时间差（纳秒），None 表示不限制
+        self.batch_size = batch_size  # 每批最多处理的主相机帧数
+        self.memory_budget = memory_budget  # 每批读取的图像数据合计字节数上限，None 表示只按帧数分批
+        self.conn = connect_readonly(db3_file)
+        self._bag_index = None  # 缓存索引，第一次用到时载入，所有 topic 共用
+
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
-    
+
     def __del__(self):
         self.conn.close()
 
     def extract_and_save_images(self, primary_topic_id, other_topic_ids):
-        primary_rows = self._get_records_for_topic(primary_topic_id)
-        
-        for primary_row in primary_rows:
-            primary_timestamp, primary_record_id, primary_data = primary_row
-            print(f"Processing primary record ID: {primary_record_id}, timestamp: {primary_timestamp}")
-            
-            # 保存主相机的图片
-            self._save_image(primary_data, f'{primary_timestamp}_{primary_topic_id}.png')
+        # 第一阶段：只用时间戳匹配
+        primary_timestamps, primary_rowids, frame_bytes = self._get_index_for_topic(primary_topic_id)
+        threshold = np.iinfo(np.int64).max if self.time_threshold is None else self.time_threshold
+        matches = {}
+        for other_topic_id in other_topic_ids:
+            timestamps, rowids, sizes = self._get_index_for_topic(other_topic_id)
+            indices, within_threshold = find_closest_indices(primary_timestamps, timestamps, threshold)
+            if timestamps.size:
+                matches[other_topic_id] = (timestamps[indices], rowids[indices], within_threshold)
+                if frame_bytes is not None and sizes is not None:
+                    frame_bytes = frame_bytes + np.where(within_threshold, sizes[indices], 0)
+            else:
+                matches[other_topic_id] = (None, None, within_threshold)
 
-            # 为每个其他的topic_id找到时间戳最接近的记录并保存
-            for other_topic_id in other_topic_ids:
-                other_row = self._get_closest_record_for_topic(other_topic_id, primary_timestamp)
-                
-                if other_row:
-                    other_timestamp, other_record_id, other_data, time_diff = other_row
-                    print(f"Matching record for topic {other_topic_id} found: record ID {other_record_id}, time difference: {time_diff}")
-                    self._save_image(other_data, f'{primary_timestamp}_{other_topic_id}.png')
-                else:
-                    print(f"No matching record found for topic {other_topic_id}")
-    
-    def _get_records_for_topic(self, topic_id):
-        query = f"SELECT timestamp, id, {self.column_name} FROM {self.table_name} WHERE topic_id = {topic_id};"
-        self.cursor.execute(query)
-        return self.cursor.fetchall()
+        # 第二阶段：按批读取匹配上的图像并保存
+        for start, stop in self._plan_batches(frame_bytes, len(primary_timestamps)):
+            batch = slice(start, stop)
+            wanted = set(primary_rowids[batch].tolist())
+            for _, rowids, within_threshold in matches.values():
+                if rowids is not None:
+                    wanted.update(rowids[batch][within_threshold[batch]].tolist())
+            blobs = {record_id: data for record_id, _, data in
+                     iter_messages_by_id(self.conn, sorted(wanted), self.table_name, self.column_name)}
 
-    def _get_closest_record_for_topic(self, topic_id, primary_timestamp):
-        query = f"""
-        SELECT timestamp, id, {self.column_name}, ABS(timestamp - {primary_timestamp}) as time_diff 
-        FROM {self.table_name} 
-        WHERE topic_id = {topic_id}
-        ORDER BY time_diff ASC LIMIT 1;
-        """
-        self.cursor.execute(query)
-        return self.cursor.fetchone()
+            for i in range(start, stop):
+                primary_timestamp, primary_record_id = int(primary_timestamps[i]), int(primary_rowids[i])
+                print(f"Processing primary record ID: {primary_record_id}, timestamp: {primary_timestamp}")
 
-    def _save_image(self, data, output_filename):
-        np_data = np.frombuffer(data, np.uint8)
-        
-        start_idx = np_data.tobytes().find(b'\xff\xd8')
-        end_idx = np_data.tobytes().rfind(b'\xff\xd9') + 2
-        
-        if start_idx != -1 and end_idx != -1:
-            jpeg_data = np_data[start_idx:end_idx]
-            image = cv2.imdecode(jpeg_data, cv2.IMREAD_COLOR)
-            
-            if image is not None:
-                output_path = os.path.join(self.output_folder, output_filename)
-                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                cv2.imwrite(output_path, image_rgb)
-                print(f"Image saved successfully as {output_path}, size: {image.shape[1]}x{image.shape[0]}")
-            else:
-                print(f"Failed to decode image for {output_filename}")
+                # 保存主相机的图片
+                self._save_image(blobs[primary_record_id], f'{primary_timestamp}_{primary_topic_id}')
+
+                # 为每个其他的topic_id保存时间戳最接近的记录
+                for other_topic_id, (timestamps, rowids, within_threshold) in matches.items():
+                    if within_threshold[i]:
+                        other_record_id = int(rowids[i])
+                        time_diff = abs(int(timestamps[i]) - primary_timestamp)
+                        print(f"Matching record for topic {other_topic_id} found: record ID {other_record_id}, time difference: {time_diff}")
+                        self._save_image(blobs[other_record_id], f'{primary_timestamp}_{other_topic_id}')
+                    else:
+                        print(f"No matching record found for topic {other_topic_id}")
+
+    def _get_index_for_topic(self, topic_id):
+        # 只取按时间排序的 (timestamps, rowids, sizes)，不读取图像数据；默认表名时直接用缓存索引（见 bag_index.py），
+        # 每个 .db3 只载入一次。其他表没有缓存索引，sizes 为 None，只按帧数分批
+        if self.table_name == 'messages':
+            if self._bag_index is None:
+                self._bag_index = load_bag_index(self.db3_file)
+            entry = topic_entry(self._bag_index, topic_id)
+            return entry['timestamps'], entry['rowids'], entry['sizes']
+        rowids, timestamps = select_messages(self.conn, topic_id, table_name=self.table_name)
+        return timestamps, rowids, None
+
+    def _plan_batches(self, frame_bytes, frame_count):
+        # 每批连续的若干帧：图像数据合计不超过 memory_budget（至少一帧），最多 batch_size 帧
+        start = 0
+        while start < frame_count:
+            stop = min(start + self.batch_size, frame_count)
+            if frame_bytes is not None and self.memory_budget:
+                within_budget = np.searchsorted(np.cumsum(frame_bytes[start:stop]), self.memory_budget, side='right')
+                stop = start + max(1, int(within_budget))
+            yield start, stop
+            start = stop
+
+    def _save_image(self, data, output_stem):
+        output_path = save_compressed_image(data, os.path.join(self.output_folder, output_stem), self.image_format)
+        if output_path is not None:
+            print(f"Image saved successfully as {output_path}")
         else:
-            print(f"JPEG markers not found for {output_filename}")
+            print(f"Failed to save image for {output_stem}")
 
 # 使用示例
-db3_file = 'mini_0.db3'
-primary_topic_id = 13
-other_topic_ids = [15, 16, 17, 18, 19]
+if __name__ == '__main__':
+    db3_file = 'mini_0.db3'
+    primary_topic_id = 13
+    other_topic_ids = [15, 16, 17, 18, 19]
 
-extractor = Db3ImageExtractor(db3_file)
-extractor.extract_and_save_images(primary_topic_id, other_topic_ids)
+    extractor = Db3ImageExtractor(db3_file)
+    extractor.extract_and_save_images(primary_topic_id, other_topic_ids)
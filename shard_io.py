@@ -0,0 +1,199 @@
+# 分片输出：把同步好的帧（所有雷达、所有相机、合并点云和元数据）按顺序追加到大小有上限的 tar 分片中，
+# 而不是每帧一个目录、每个传感器一个文件——一天的数据有几百万个小文件，rsync、ls 和数据加载都会非常慢。
+#
+#   save_folder/shard-000000.tar          WebDataset 风格：同一帧的文件名共用前缀 "<top_timestamp>."
+#   save_folder/shard-000000.index.json   每个成员在 tar 中的数据偏移和大小，可以不扫描整个 tar 直接随机读取
+#
+# 每帧的成员依次写成 tar 头 + 数据 + 512 字节对齐的填充，都是大块的顺序写入（文件使用大缓冲区），
+# 点云和图像的字节块（见 pcd_io.encode_pointcloud、image_io.encode_image）直接写入，不在内存中再拼接一次。
+# 分片先写到临时文件（见 atomic_io.py），写满 max_shard_bytes 或关闭时才改名成正式文件名，
+# 中途被打断只会留下 *.tmp；写完一个分片后通过 on_shard_closed 回调通知调用方（例如写入导出清单）。
+# 重新运行时从已有分片的最大编号之后继续编号，不会覆盖已经完成的分片。
+import os
+import re
+import json
+import time
+import tarfile
+import threading
+
+from atomic_io import temp_path, write_bytes
+
+SHARD_PREFIX = 'shard'
+# 每个分片的大小上限（字节）
+DEFAULT_SHARD_BYTES = 1 << 30  # 1 GiB
+# 写分片时的文件缓冲区大小
+WRITE_BUFFER_BYTES = 8 << 20  # 8 MiB
+
+_BLOCK = tarfile.BLOCKSIZE
+_RECORD = tarfile.RECORDSIZE
+
+
+def shard_name(prefix, number):
+    return f'{prefix}-{number:06d}.tar'
+
+
+def index_name(shard_file):
+    return shard_file[:-len('.tar')] + '.index.json'
+
+
+def _chunk_nbytes(chunk):
+    return memoryview(chunk).nbytes
+
+
+def _next_shard_number(out_dir, prefix):
+    pattern = re.compile(rf'{re.escape(prefix)}-(\d+)\.tar$')
+    numbers = [int(match.group(1)) for match in map(pattern.match, os.listdir(out_dir)) if match]
+    return max(numbers) + 1 if numbers else 0
+
+
+class ShardWriter:
+    """
+    按样本追加写 tar 分片，线程安全（多个写出线程共用一个 ShardWriter，写入时串行）。
+
+    参数:
+        out_dir: 输出目录
+        max_shard_bytes: 单个分片的大小上限，超过时开始写下一个分片（单个样本超过上限时独占一个分片）
+        prefix: 分片文件名前缀
+        on_shard_closed: on_shard_closed(shard_file, keys) 在分片改名完成后调用，keys 为分片中各样本的 key
+    """
+
+    def __init__(self, out_dir, max_shard_bytes=DEFAULT_SHARD_BYTES, prefix=SHARD_PREFIX, on_shard_closed=None):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.max_shard_bytes = max_shard_bytes
+        self.prefix = prefix
+        self.on_shard_closed = on_shard_closed
+        self.shard_files = []
+        self._number = _next_shard_number(out_dir, prefix)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        self._shard_file = os.path.join(self.out_dir, shard_name(self.prefix, self._number))
+        self._number += 1
+        self._file = open(temp_path(self._shard_file), 'wb', buffering=WRITE_BUFFER_BYTES)
+        self._offset = 0
+        self._index = {}
+
+    def _close_shard(self):
+        # tar 结尾是两个全零块，整个文件再补齐到 RECORDSIZE 的整数倍（和 tarfile 写出的一致）
+        end = self._offset + 2 * _BLOCK
+        self._file.write(b'\0' * (2 * _BLOCK + (-end) % _RECORD))
+        self._file.close()
+        self._file = None
+        write_bytes(index_name(self._shard_file), json.dumps(self._index).encode('utf-8'))
+        os.replace(temp_path(self._shard_file), self._shard_file)
+        self.shard_files.append(self._shard_file)
+        if self.on_shard_closed is not None:
+            self.on_shard_closed(self._shard_file, list(self._index))
+
+    def _write_member(self, name, chunks, mtime):
+        size = sum(_chunk_nbytes(chunk) for chunk in chunks)
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = mtime
+        info.mode = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+        self._file.write(header)
+        data_offset = self._offset + len(header)
+        for chunk in chunks:
+            self._file.write(chunk)
+        self._file.write(b'\0' * ((-size) % _BLOCK))
+        self._offset = data_offset + size + (-size) % _BLOCK
+        return data_offset, size
+
+    def write_sample(self, key, members):
+        """
+        追加一个样本。
+        参数:
+            key: 样本的 key（例如 top 时间戳），不能包含 '.'
+            members: {后缀: 字节块列表} 或 [(后缀, 字节块列表), ...]，
+                     例如 {'rslidar_points_top.pcd': [...], 'image0.jpg': [...], 'json': [...]}，tar 中的文件名为 "<key>.<后缀>"
+        返回:
+            样本所在的分片文件名（分片要等到写满或 close() 之后才会出现）
+        """
+        key = str(key)
+        members = dict(members)
+        if '.' in key:
+            raise ValueError(f"样本的 key 不能包含 '.'：{key}")
+        sample_bytes = sum(_chunk_nbytes(chunk) + 2 * _BLOCK for chunks in members.values() for chunk in chunks)
+        mtime = int(time.time())
+        with self._lock:
+            if self._file is not None and self._offset > 0 and self._offset + sample_bytes > self.max_shard_bytes:
+                self._close_shard()
+            if self._file is None:
+                self._open()
+            self._index[key] = {suffix: self._write_member(f'{key}.{suffix}', chunks, mtime)
+                                for suffix, chunks in members.items()}
+            return self._shard_file
+
+    def close(self):
+        """
+        写完并改名当前分片。
+        """
+        with self._lock:
+            if self._file is not None:
+                self._close_shard()
+
+    def abort(self):
+        """
+        出错时丢弃还没写完的分片（只删除临时文件，已经完成的分片保留）。
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                os.remove(temp_path(self._shard_file))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def json_member(obj):
+    """
+    把元数据编码成 JSON 成员的字节块列表。
+    """
+    return [json.dumps(obj, ensure_ascii=False).encode('utf-8')]
+
+
+def load_shard_index(shard_file):
+    """
+    读取分片的索引：{key: {后缀: (数据偏移, 大小)}}。
+    """
+    with open(index_name(shard_file), 'rb') as f:
+        return {key: {suffix: tuple(entry) for suffix, entry in members.items()}
+                for key, members in json.load(f).items()}
+
+
+def read_member(shard_file, offset, size):
+    """
+    按索引中的偏移和大小直接读取一个成员的数据。
+    """
+    with open(shard_file, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def iter_samples(shard_file):
+    """
+    顺序读取一个分片，按样本依次产生 (key, {后缀: bytes})，不需要索引文件。
+    """
+    key, sample = None, {}
+    with tarfile.open(shard_file, 'r|') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            member_key, _, suffix = member.name.partition('.')
+            if member_key != key and sample:
+                yield key, sample
+                sample = {}
+            key = member_key
+            sample[suffix] = tar.extractfile(member).read()
+    if sample:
+        yield key, sample
@@ -0,0 +1,242 @@
+# 生成合成的 rosbag2 (sqlite3) 数据包，用于基准测试和复现性能数据。
+# 点云是按线束扫描生成的 PointCloud2（x, y, z, intensity，float32），图像是真实 JPEG 编码的 CompressedImage，
+# 消息大小和真实录制的数据接近；同时写出 metadata.yaml，可以直接交给 BagReader / export_bag / process_sensor_data。
+import os
+import argparse
+import sqlite3
+import cv2
+import numpy as np
+import yaml
+
+from pointcloud2 import serialize_pointcloud2
+from image_msgs import serialize_compressed_image
+
+LIDAR_NAMES = ('top', 'left', 'right', 'prev', 'back')
+POINTCLOUD2_TYPE = 'sensor_msgs/msg/PointCloud2'
+COMPRESSED_IMAGE_TYPE = 'sensor_msgs/msg/CompressedImage'
+CAN_TYPE = 'can_msgs/msg/Frame'
+XYZI_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('intensity', '<f4')])
+START_TIME = 1700000000 * 1000000000
+
+
+def lidar_topics(num_lidars):
+    names = [LIDAR_NAMES[i] if i < len(LIDAR_NAMES) else f'lidar{i}' for i in range(num_lidars)]
+    return [f'/rslidar_points_{name}' for name in names]
+
+
+def camera_topics(num_cameras):
+    return [f'/image{i}' for i in range(num_cameras)]
+
+
+def synthetic_sweep(rng, points_per_sweep, rings=32):
+    """
+    生成一帧 (points_per_sweep,) 的结构化点云：按线束和方位角均匀扫描，距离带噪声。
+    """
+    index = np.arange(points_per_sweep)
+    azimuth = 2 * np.pi * (index // rings) / max(points_per_sweep // rings, 1)
+    elevation = np.deg2rad(np.linspace(-25.0, 15.0, rings))[index % rings]
+    distance = rng.uniform(2.0, 80.0, points_per_sweep).astype(np.float32)
+    cloud = np.empty(points_per_sweep, dtype=XYZI_DTYPE)
+    cloud['x'] = distance * np.cos(elevation) * np.cos(azimuth)
+    cloud['y'] = distance * np.cos(elevation) * np.sin(azimuth)
+    cloud['z'] = distance * np.sin(elevation)
+    cloud['intensity'] = rng.integers(0, 256, points_per_sweep)
+    return cloud
+
+
+def synthetic_jpegs(rng, image_size, count, jpeg_quality):
+    """
+    生成 count 张编码好的 JPEG（渐变背景 + 噪声 + 色块），压缩后大小和真实相机图像接近。
+    """
+    width, height = image_size
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)
+    jpegs = []
+    for _ in range(count):
+        image = np.empty((height, width, 3), dtype=np.float32)
+        image[..., 0] = x[None, :]
+        image[..., 1] = y[:, None]
+        image[..., 2] = rng.uniform(0, 255)
+        image += rng.normal(0, 12, size=(height, width, 1)).astype(np.float32)
+        for _ in range(20):
+            x0, y0 = rng.integers(0, width), rng.integers(0, height)
+            image[y0:y0 + height // 8, x0:x0 + width // 8] = rng.uniform(0, 255, 3)
+        ok, encoded = cv2.imencode('.jpg', np.clip(image, 0, 255).astype(np.uint8),
+                                   [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        jpegs.append(encoded.tobytes())
+    return jpegs
+
+
+def _create_tables(conn, timestamp_index=True):
+    conn.execute("CREATE TABLE topics (id INTEGER PRIMARY KEY, name TEXT NOT NULL, type TEXT NOT NULL, "
+                 "serialization_format TEXT NOT NULL, offered_qos_profiles TEXT NOT NULL);")
+    conn.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY, topic_id INTEGER NOT NULL, "
+                 "timestamp INTEGER NOT NULL, data BLOB NOT NULL);")
+    if timestamp_index:
+        conn.execute("CREATE INDEX timestamp_idx ON messages (timestamp ASC);")
+
+
+def write_synthetic_bag(bag_dir, num_lidars=5, points_per_sweep=57600, num_cameras=7, duration=10.0,
+                        lidar_hz=10.0, camera_hz=10.0, image_size=(1920, 1080), jpeg_quality=90,
+                        num_splits=1, seed=0):
+    """
+    生成一个合成的 rosbag2 数据包目录（metadata.yaml + bag_0.db3, bag_1.db3, ...）。
+    参数:
+        bag_dir: 输出目录（已存在的 .db3 会被覆盖）
+        num_lidars: 激光雷达个数，topic 名为 /rslidar_points_top, _left, ...
+        points_per_sweep: 每帧点云的点数
+        num_cameras: 相机个数，topic 名为 /image0, /image1, ...
+        duration: 录制时长（秒）
+        lidar_hz, camera_hz: 点云 / 图像的频率
+        image_size: (宽, 高)
+        jpeg_quality: JPEG 压缩质量
+        num_splits: 分片个数，消息按时间均分到各分片
+        seed: 随机种子，相同参数生成的数据包完全一致
+    返回:
+        dict，数据包的配置和统计信息（topic 列表、消息数、总字节数）
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(bag_dir, exist_ok=True)
+    bag_name = os.path.basename(os.path.normpath(bag_dir))
+
+    topics = [(name, POINTCLOUD2_TYPE) for name in lidar_topics(num_lidars)]
+    topics += [(name, COMPRESSED_IMAGE_TYPE) for name in camera_topics(num_cameras)]
+
+    # 点云和图像各预先生成一小组数据循环使用，只改时间戳，避免生成数据的时间远超过写库的时间
+    sweeps = [synthetic_sweep(rng, points_per_sweep) for _ in range(4)]
+    jpegs = {name: synthetic_jpegs(rng, image_size, 4, jpeg_quality) for name in camera_topics(num_cameras)}
+
+    # 所有消息按时间排序；每个传感器带一个固定偏移（最多 20 ms）和少量抖动，模拟各传感器之间不完全同步
+    events = []
+    for topic_id, (name, msg_type) in enumerate(topics, 1):
+        hz = lidar_hz if msg_type == POINTCLOUD2_TYPE else camera_hz
+        count = int(duration * hz)
+        phase = rng.uniform(0, 2e7)
+        jitter = rng.normal(0, 1e6, count)
+        stamps = START_TIME + (np.arange(count) * 1e9 / hz + phase + jitter).astype(np.int64)
+        events += [(int(stamp), topic_id, k) for k, stamp in enumerate(stamps)]
+    events.sort()
+
+    split_files = [f'{bag_name}_{i}.db3' for i in range(num_splits)]
+    split_events = np.array_split(np.arange(len(events)), num_splits)
+    total_bytes = 0
+    counts = {name: 0 for name, _ in topics}
+    for split_file, event_indices in zip(split_files, split_events):
+        path = os.path.join(bag_dir, split_file)
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        _create_tables(conn)
+        conn.executemany("INSERT INTO topics VALUES (?, ?, ?, 'cdr', '');",
+                         [(topic_id, name, msg_type) for topic_id, (name, msg_type) in enumerate(topics, 1)])
+        rows = []
+        for event_index in event_indices.tolist():
+            stamp, topic_id, k = events[event_index]
+            name, msg_type = topics[topic_id - 1]
+            frame_id = name.strip('/')
+            if msg_type == POINTCLOUD2_TYPE:
+                data = serialize_pointcloud2(sweeps[k % len(sweeps)], stamp, frame_id)
+            else:
+                data = serialize_compressed_image(jpegs[name][k % len(jpegs[name])], stamp, frame_id)
+            rows.append((topic_id, stamp, data))
+            counts[name] += 1
+            total_bytes += len(data)
+            if len(rows) >= 200:
+                conn.executemany("INSERT INTO messages (topic_id, timestamp, data) VALUES (?, ?, ?);", rows)
+                rows = []
+        conn.executemany("INSERT INTO messages (topic_id, timestamp, data) VALUES (?, ?, ?);", rows)
+        conn.commit()
+        conn.close()
+
+    metadata = {
+        'rosbag2_bagfile_information': {
+            'version': 4,
+            'storage_identifier': 'sqlite3',
+            'relative_file_paths': split_files,
+            'duration': {'nanoseconds': int(duration * 1e9)},
+            'starting_time': {'nanoseconds_since_epoch': events[0][0] if events else START_TIME},
+            'message_count': len(events),
+            'topics_with_message_count': [
+                {'topic_metadata': {'name': name, 'type': msg_type, 'serialization_format': 'cdr',
+                                    'offered_qos_profiles': ''},
+                 'message_count': counts[name]}
+                for name, msg_type in topics],
+            'compression_format': '',
+            'compression_mode': '',
+        }
+    }
+    with open(os.path.join(bag_dir, 'metadata.yaml'), 'w') as f:
+        yaml.safe_dump(metadata, f, sort_keys=False)
+
+    return {
+        'bag_dir': bag_dir,
+        'num_lidars': num_lidars,
+        'points_per_sweep': points_per_sweep,
+        'num_cameras': num_cameras,
+        'duration': duration,
+        'lidar_hz': lidar_hz,
+        'camera_hz': camera_hz,
+        'image_size': list(image_size),
+        'num_splits': num_splits,
+        'seed': seed,
+        'topics': [name for name, _ in topics],
+        'message_count': len(events),
+        'total_bytes': total_bytes,
+    }
+
+
+def write_synthetic_can(db3_file, count, message_bytes=64, hz=1000.0, timestamp_index=True, seed=0):
+    """
+    生成只有一个 CAN topic（topic_id 为 1）的 .db3，用于测量长时间 canOnly 数据包的解码速度和内存。
+    每条消息 message_bytes 字节，报文 id 和数据在 can_decoder.DEFAULT_CAN_LAYOUT 的位置上。
+    参数:
+        db3_file: 输出文件（已存在时覆盖）
+        count: 消息条数
+        message_bytes: 每条消息的字节数，不能小于 59
+        hz: 报文频率，时间戳带少量抖动，写入顺序和时间顺序不完全一致
+        timestamp_index: 是否建立 rosbag2 默认的 timestamp_idx（旧版本录制的数据包没有这个索引）
+        seed: 随机种子
+    返回:
+        dict，消息数和总字节数
+    """
+    if message_bytes < 59:
+        raise ValueError(f'message_bytes 不能小于 59：{message_bytes}')
+    rng = np.random.default_rng(seed)
+    if os.path.exists(db3_file):
+        os.remove(db3_file)
+    conn = sqlite3.connect(db3_file)
+    try:
+        _create_tables(conn, timestamp_index)
+        conn.execute("INSERT INTO topics VALUES (1, '/can_data', ?, 'cdr', '');", (CAN_TYPE,))
+        chunk = 100000
+        for start in range(0, count, chunk):
+            n = min(chunk, count - start)
+            raw = rng.integers(0, 256, (n, message_bytes), dtype=np.uint8)
+            raw[:, 16] = rng.integers(0, 8, n)
+            stamps = START_TIME + ((np.arange(start, start + n) + rng.normal(0, 0.3, n)) * 1e9 / hz).astype(np.int64)
+            conn.executemany("INSERT INTO messages (topic_id, timestamp, data) VALUES (1, ?, ?);",
+                             zip(stamps.tolist(), map(bytes, raw)))
+        conn.commit()
+    finally:
+        conn.close()
+    return {'db3_file': db3_file, 'message_count': count, 'total_bytes': count * message_bytes}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成合成的 rosbag2 (sqlite3) 数据包')
+    parser.add_argument('bag_dir')
+    parser.add_argument('--lidars', type=int, default=5, help='激光雷达个数')
+    parser.add_argument('--points', type=int, default=57600, help='每帧点云的点数')
+    parser.add_argument('--cameras', type=int, default=7, help='相机个数')
+    parser.add_argument('--duration', type=float, default=10.0, help='录制时长（秒）')
+    parser.add_argument('--lidar-hz', type=float, default=10.0)
+    parser.add_argument('--camera-hz', type=float, default=10.0)
+    parser.add_argument('--image-size', type=int, nargs=2, default=(1920, 1080), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--splits', type=int, default=1, help='分片个数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    info = write_synthetic_bag(args.bag_dir, args.lidars, args.points, args.cameras, args.duration,
+                               args.lidar_hz, args.camera_hz, tuple(args.image_size), num_splits=args.splits,
+                               seed=args.seed)
+    print(f"已生成 {info['bag_dir']}：{info['message_count']} 条消息，共 {info['total_bytes'] / 1e6:.1f} MB")
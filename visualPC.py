@@ -3,6 +3,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
+from pointcloud_view import read_points, filter_points, decimate, DEFAULT_POINT_BUDGET
+
 def plot_point_cloud(x, y, z, color='r', marker='o', xlabel='X Axis', ylabel='Y Axis', zlabel='Z Axis'):
     """
     Plots a 3D point cloud.
@@ -41,33 +43,24 @@ def plot_point_cloud(x, y, z, color='r', marker='o', xlabel='X Axis', ylabel='Y
 # z = [5, 6, 7, 8, 9]
 # plot_point_cloud(x, y, z)
 
-def visualize_point_cloud(pcd_filename):
+def visualize_point_cloud(pcd_filename, max_x=5, max_points=DEFAULT_POINT_BUDGET, voxel_size=None):
     # 读取点云文件
-    point_cloud = o3d.io.read_point_cloud(pcd_filename)
+    points = read_points(pcd_filename)
     
-    if len(point_cloud.points) == 0:
+    if len(points) == 0:
         print("Point cloud is empty!")
         return
 
-    # 转换点云点为numpy数组
-    points = np.asarray(point_cloud.points)
-    
-    # 过滤掉包含NaN值的点
-    valid_mask = ~np.isnan(points).any(axis=1)
-    filtered_points = points[valid_mask]
-
+    # 过滤掉包含NaN值的点，以及x轴大于max_x的点（向量化掩码）
+    filtered_points = filter_points(points, x_range=(None, max_x))
     print(f"Number of valid points: {len(filtered_points)}")
-    # 打印每个点的坐标
-    for i, point in enumerate(filtered_points):
-        print(f"Point {i}: x={point[0]}, y={point[1]}, z={point[2]}")
-    
-    # 做一个过滤，如果x轴大于5的点，就不显示
-    filtered_points = filtered_points[filtered_points[:, 0] <= 5]
-    
+
+    # 按点数预算降采样，几百万点的合并帧也能流畅交互
+    filtered_points = decimate(filtered_points, max_points, voxel_size)
         
     if len(filtered_points) > 0:
-        # 将点云中心移动到原点附近
-        point_cloud.points = o3d.utility.Vector3dVector(filtered_points)
+        point_cloud = o3d.geometry.PointCloud()
+        point_cloud.points = o3d.utility.Vector3dVector(filtered_points.astype(np.float64))
 
         # 将点云的颜色设置为红色
         point_cloud.paint_uniform_color([1, 0, 0])
@@ -94,5 +87,6 @@ def visualize_point_cloud(pcd_filename):
 
 
 # 使用示例
-pcd_filename = 'pointclouds/pointcloud_1_16.pcd'  # 替换为实际的PCD文件名
-visualize_point_cloud(pcd_filename)
+if __name__ == '__main__':
+    pcd_filename = 'pointclouds/pointcloud_1_16.pcd'  # 替换为实际的PCD文件名
+    visualize_point_cloud(pcd_filename)